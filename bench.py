@@ -0,0 +1,383 @@
+# bench.py (Micro-benchmarks dos caminhos mais usados do protocolo)
+
+import argparse
+import contextlib
+import inspect
+import json
+import platform
+import random
+import socket
+import sys
+import threading
+import time
+
+import game
+import ser_server
+from p2p_crypto import SessionCipher, generate_keypair
+from p2p_protocol import decode_message, encode_message
+from ser_conexao import ConexaoSaida, agrupar
+from ser_protocolo import (codificar_json, QUADRO_PLA, quadro_resultado, quadro_mat, quadro_end,
+                           LeitorQuadros, CODEC_JSON, CODEC_BINARIO)
+from ser_ranking import RankingFragmentado
+
+BENCHMARKS = {}  # nome -> função que prepara o cenário e retorna o que será medido
+TOLERANCIA_PADRAO = 0.15  # Lentidão relativa ao baseline a partir da qual o benchmark falha
+TAMANHOS_RANKING = (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6)
+
+
+def benchmark(nome):
+    """Registra uma função sem argumentos como benchmark."""
+    def registrar(funcao):
+        BENCHMARKS[nome] = lambda: funcao
+        return funcao
+    return registrar
+
+
+def benchmark_preparado(nome):
+    """
+    Registra uma função de preparação: ela monta o cenário (fora da medição)
+    e retorna a função sem argumentos a ser medida. Só roda se o benchmark
+    for selecionado. Se o cenário altera algum estado global, a preparação
+    pode ser um gerador que entrega a função com yield e restaura o estado
+    depois (em um finally), quando a medição termina.
+    """
+    def registrar(preparar):
+        BENCHMARKS[nome] = preparar
+        return preparar
+    return registrar
+
+
+def medir(funcao, tempo_minimo=0.2):
+    """Executa `funcao` repetidamente e retorna o melhor tempo por chamada, em nanossegundos."""
+    repeticoes = 1
+    while True:
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        decorrido = time.perf_counter() - inicio
+        if decorrido >= tempo_minimo:
+            break
+        repeticoes *= 2
+    melhor = decorrido
+    for _ in range(2):
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor / repeticoes * 1e9
+
+
+# --- Serialização dos quadros de uma rodada (PLA para os dois + resultado) ---
+@benchmark('rodada.json_dumps')
+def _rodada_json():
+    return [codificar_json('PLA'),
+            codificar_json('PLA'),
+            codificar_json('WIN', {"jogada_oponente": 'sci'}),
+            codificar_json('LOS', {"jogada_oponente": 'roc'})]
+
+
+@benchmark('rodada.cache')
+def _rodada_cache():
+    return [QUADRO_PLA,
+            QUADRO_PLA,
+            quadro_resultado('WIN', 'sci'),
+            quadro_resultado('LOS', 'roc')]
+
+
+# Os dois benchmarks de partida codificam os mesmos quadros (e retornam os
+# bytes, para conferir que são idênticos): o END é codificado uma vez e o
+# mesmo quadro vai para os dois jogadores, como em jogar_partida, então a
+# diferença entre eles é só a do cache
+@benchmark('partida.json_dumps')
+def _partida_json():
+    quadros = [codificar_json('MAT', {"oponente": 'Alice'}), codificar_json('MAT', {"oponente": 'Gabriel'})]
+    for _ in range(3):
+        quadros += _rodada_json()
+    quadros.append(codificar_json('END', {"mensagem": 'O vencedor da partida foi Gabriel!'}))
+    return quadros
+
+
+@benchmark('partida.cache')
+def _partida_cache():
+    quadros = [quadro_mat('Alice'), quadro_mat('Gabriel')]
+    for _ in range(3):
+        quadros += _rodada_cache()
+    quadros.append(quadro_end('O vencedor da partida foi Gabriel!'))
+    return quadros
+
+
+# --- Codecs: bytes e tempo de decodificação de uma partida completa ---
+def fluxo_partida(codec):
+    """Bytes trocados por um jogador em uma partida: servidor -> cliente e cliente -> servidor."""
+    servidor = [codec.quadro_mat('Alice')]
+    cliente = [codec.codificar('CON', {"nome": 'Gabriel'})]
+    for jogada, resultado in (('ROC', 'WIN'), ('PAP', 'TIE'), ('SCI', 'LOS')):
+        servidor += [codec.quadro_pla, codec.quadro_resultado(resultado, 'sci')]
+        cliente.append(codec.codificar(jogada))
+    servidor.append(codec.quadro_end('O vencedor da partida foi Gabriel!'))
+    cliente.append(codec.codificar('QUI'))
+    return b''.join(servidor), b''.join(cliente)
+
+
+FLUXOS = {codec.nome: fluxo_partida(codec) for codec in (CODEC_JSON, CODEC_BINARIO)}
+
+
+def _decodificar(fluxo):
+    LeitorQuadros().alimentar(fluxo)
+
+
+for _codec in (CODEC_JSON, CODEC_BINARIO):
+    benchmark(f'codificar_partida.{_codec.nome}')(lambda codec=_codec: fluxo_partida(codec))
+    benchmark(f'decodificar_partida.{_codec.nome}')(lambda fluxo=b''.join(FLUXOS[_codec.nome]): _decodificar(fluxo))
+
+
+# --- Regras do jogo ---
+_JOGADAS_SERVIDOR = [(a, b) for a in ('roc', 'pap', 'sci', 'TIMEOUT') for b in ('roc', 'pap', 'sci', 'TIMEOUT')]
+_JOGADAS_P2P = [(a, b) for a in 'PAT' for b in 'PAT']
+
+
+@benchmark('determinar_vencedor.16_combinacoes')
+def _determinar_vencedor():
+    for jogada1, jogada2 in _JOGADAS_SERVIDOR:
+        ser_server.determinar_vencedor(jogada1, 'j1', jogada2, 'j2')
+
+
+@benchmark('game.determine_winner.9_combinacoes')
+def _determine_winner():
+    for jogada1, jogada2 in _JOGADAS_P2P:
+        game.determine_winner(jogada1, jogada2)
+
+
+# O nome não muda com o caminho usado (NumPy ou inteiros do Python), para a
+# comparação com o baseline não tratar o benchmark como novo: o caminho vai
+# no campo "backend_rodadas" do JSON, e comparar() avisa se ele mudou
+BACKEND_RODADAS = 'numpy' if game.numpy else 'python'
+
+
+@benchmark_preparado('game.resolve_rounds.1000000_rodadas')
+def _resolve_rounds():
+    gerador = random.Random(0)
+    jogadas1 = game.encode_moves(gerador.choice(('roc', 'pap', 'sci', 'TIMEOUT')) for _ in range(10 ** 6))
+    jogadas2 = game.encode_moves(gerador.choice(('roc', 'pap', 'sci', 'TIMEOUT')) for _ in range(10 ** 6))
+    return lambda: game.resolve_rounds(jogadas1, jogadas2)
+
+
+# --- Serialização de enviar_comando (sem rede) ---
+class SocketNulo:
+    """Destino de envio que descarta os bytes: mede só a codificação do servidor."""
+
+    def __init__(self, codec):
+        self.codec = codec
+
+    def sendall(self, dados):
+        pass
+
+
+for _codec in (CODEC_JSON, CODEC_BINARIO):
+    benchmark(f'enviar_comando.{_codec.nome}')(
+        lambda sock=SocketNulo(_codec): ser_server.enviar_comando(sock, 'MAT', {"oponente": 'Alice'}))
+
+
+# --- Enquadramento da leitura do servidor (lidar_com_cliente) ---
+def fluxo_cliente(codec, mensagens=1000):
+    """Jogadas e pedidos de ranking de um cliente, como o servidor os recebe."""
+    comandos = [('ROC', {}), ('PAP', {}), ('SCI', {}), ('RAN', {"nome": 'Gabriel', "limit": 10})]
+    return b''.join(codec.codificar(*comandos[i % len(comandos)]) for i in range(mensagens))
+
+
+def _enquadrar(fluxo, tamanho_leitura=4096):
+    leitor = LeitorQuadros()
+    visao = memoryview(fluxo)
+    for inicio in range(0, len(fluxo), tamanho_leitura):
+        leitor.alimentar(visao[inicio:inicio + tamanho_leitura])
+
+
+for _codec in (CODEC_JSON, CODEC_BINARIO):
+    benchmark(f'enquadramento.{_codec.nome}_1000_mensagens')(
+        lambda fluxo=fluxo_cliente(_codec): _enquadrar(fluxo))
+
+
+# --- RAN com rankings grandes ---
+def _preparar_ranking(tamanho):
+    def preparar():
+        aleatorio = random.Random(tamanho)
+        ranking = RankingFragmentado(ser_server.FRAGMENTOS_RANKING)
+        ranking.carregar((f"jogador{i}", aleatorio.randrange(tamanho // 10 + 1)) for i in range(tamanho))
+        sock = SocketNulo(CODEC_JSON)
+        payload = {"nome": f"jogador{tamanho // 2}", "limit": ser_server.RANKING_LIMITE_PADRAO,
+                   "offset": tamanho // 2}
+        # enviar_ranking_para_cliente consulta o ranking global do servidor
+        anterior, ser_server.ranking = ser_server.ranking, ranking
+        try:
+            yield lambda: ser_server.enviar_ranking_para_cliente(sock, payload)
+        finally:
+            ser_server.ranking = anterior
+    return preparar
+
+
+for _tamanho in TAMANHOS_RANKING:
+    benchmark_preparado(f'enviar_ranking.{_tamanho}_jogadores')(_preparar_ranking(_tamanho))
+
+
+# --- GameState do P2P ---
+def _estado_exemplo():
+    estado = game.GameState()
+    estado.player1_score, estado.player2_score = 2, 1
+    estado.player1_choice, estado.player2_choice = 'P', 'T'
+    estado.round_complete = True
+    return estado
+
+
+benchmark('game.GameState.to_json')(lambda estado=_estado_exemplo(): estado.to_json())
+benchmark('game.GameState.from_json')(lambda texto=_estado_exemplo().to_json(): game.GameState.from_json(texto))
+
+
+# --- Quadros do P2P: envelope antigo x cifragem autenticada da sessão ---
+_REVELACAO = {'type': 'reveal', 'round': 12, 'choice': 'A', 'nonce': '9f2c4e7a1b3d5f60718293a4b5c6d7e8'}
+
+
+@benchmark('p2p.envelope_antigo.enviar_receber')
+def _envelope_antigo(mensagem=_REVELACAO, chave="super_secret_p2p_key"):
+    # O que cada mensagem custava antes: JSON duas vezes, "cifra" de texto e hash SHA-256 em hexadecimal
+    json_mensagem = json.dumps(mensagem)
+    quadro = json.dumps({'encrypted_data': game.encrypt_message(json_mensagem, chave),
+                         'hash': game.generate_hash(json_mensagem)}).encode('utf-8')
+    envelope = json.loads(quadro.decode('utf-8'))
+    recebida = game.decrypt_message(envelope.get('encrypted_data'), chave)
+    if game.generate_hash(recebida) != envelope.get('hash'):
+        raise ValueError("hash não corresponde")
+    return json.loads(recebida)
+
+
+def _par_de_sessoes():
+    privada1, publica1 = generate_keypair()
+    privada2, publica2 = generate_keypair()
+    return (SessionCipher(privada1, publica1, publica2, b'chave'),
+            SessionCipher(privada2, publica2, publica1, b'chave'))
+
+
+@benchmark_preparado('p2p.quadro_cifrado.enviar_receber')
+def _quadro_cifrado():
+    envio, recebimento = _par_de_sessoes()
+    def enviar_receber(mensagem=_REVELACAO):
+        return decode_message(recebimento.open(envio.seal(encode_message(mensagem))))
+    return enviar_receber
+
+
+benchmark('p2p.troca_de_chaves')(_par_de_sessoes)
+
+
+# --- Escritas (syscalls de envio) por partida no motor de threads ---
+def escritas_por_partida(intervalo=0.005):
+    """
+    Reproduz os envios de uma partida a um jogador (com as mesmas pausas
+    relativas e o mesmo agrupamento de jogar_partida) por um socket local.
+    Retorna (quadros enviados, sendall feitos pela ConexaoSaida); antes da
+    coalescência, cada quadro custava um sendall.
+    """
+    servidor, cliente = socket.socketpair()
+    leitura = threading.Thread(target=lambda: [None for _ in iter(lambda: cliente.recv(65536), b'')])
+    leitura.start()
+    conn = ConexaoSaida(servidor, 'bench')
+    conn.sendall(CODEC_JSON.quadro_mat('Alice'))
+    quadros = 1
+    for rodada in range(1, 4):
+        time.sleep(intervalo)
+        conn.sendall(CODEC_JSON.quadro_pla)
+        time.sleep(intervalo)
+        with agrupar(conn) if rodada == 3 else contextlib.nullcontext():
+            conn.sendall(CODEC_JSON.quadro_resultado('WIN', 'sci'))
+            if rodada == 3:
+                conn.sendall(CODEC_JSON.quadro_end('O vencedor da partida foi Gabriel!'))
+                quadros += 1
+        quadros += 2
+    conn.close()
+    leitura.join()
+    cliente.close()
+    return quadros, conn.escritas
+
+
+def medir_cenario(preparar, medicao=medir):
+    """Prepara o cenário, mede a função dele e desfaz o que a preparação alterou (ver benchmark_preparado)."""
+    cenario = preparar()
+    if not inspect.isgenerator(cenario):
+        return medicao(cenario)
+    with contextlib.closing(cenario):
+        return medicao(next(cenario))
+
+
+def executar(filtro=None):
+    """Roda os benchmarks cujo nome contém `filtro` e retorna {nome: ns/op}."""
+    resultados = {}
+    for nome, preparar in BENCHMARKS.items():
+        if filtro and filtro not in nome:
+            continue
+        resultados[nome] = medir_cenario(preparar)
+        print(f"{nome:<40} {resultados[nome]:>14.1f} ns/op", flush=True)
+    return resultados
+
+
+def comparar(resultados, baseline, tolerancia=TOLERANCIA_PADRAO):
+    """
+    Compara com um baseline ({nome: ns/op}) e retorna os nomes que ficaram
+    mais lentos que (1 + tolerancia) vezes o tempo de referência.
+    """
+    regressoes = []
+    print(f"\n{'benchmark':<40} {'baseline':>12} {'atual':>12} {'variação':>9}")
+    for nome, atual in resultados.items():
+        referencia = baseline.get(nome)
+        if not referencia:
+            print(f"{nome:<40} {'-':>12} {atual:>12.1f}    (novo)")
+            continue
+        variacao = atual / referencia - 1
+        marca = ''
+        if variacao > tolerancia:
+            regressoes.append(nome)
+            marca = '  <-- REGRESSÃO'
+        print(f"{nome:<40} {referencia:>12.1f} {atual:>12.1f} {variacao:>+8.1%}{marca}")
+    return regressoes
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Micro-benchmarks do protocolo e das regras do jogo.")
+    parser.add_argument('--filtro', default=None, help="roda só os benchmarks cujo nome contém este texto")
+    parser.add_argument('--json', default=None, help="grava os resultados (ns/op) neste arquivo JSON")
+    parser.add_argument('--comparar', default=None, metavar='BASELINE',
+                        help="compara com um JSON gravado antes por --json e falha se algo ficar mais lento")
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA_PADRAO,
+                        help="lentidão relativa aceita antes de acusar regressão (0.15 = 15%%)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    resultados = executar(args.filtro)
+    if not args.filtro:
+        for nome_codec, (servidor, cliente) in FLUXOS.items():
+            print(f"bytes por partida ({nome_codec}): servidor->cliente={len(servidor)} cliente->servidor={len(cliente)}")
+        quadros, escritas = escritas_por_partida()
+        print(f"envios por partida e jogador: quadros={quadros} sendall={escritas}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as arquivo:
+            json.dump({"python": platform.python_version(), "maquina": platform.machine(),
+                       "backend_rodadas": BACKEND_RODADAS, "resultados": resultados},
+                      arquivo, indent=2, sort_keys=True)
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as arquivo:
+            gravado = json.load(arquivo)
+        baseline = gravado["resultados"]
+        if gravado.get("backend_rodadas", BACKEND_RODADAS) != BACKEND_RODADAS:
+            print(f"AVISO: o baseline resolveu as rodadas com '{gravado['backend_rodadas']}' e esta execução "
+                  f"com '{BACKEND_RODADAS}'; a variação de game.resolve_rounds inclui a troca de caminho.")
+        regressoes = comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\nFALHA: {len(regressoes)} benchmark(s) mais de {args.tolerancia:.0%} mais lentos "
+                  f"que o baseline: {', '.join(regressoes)}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nOK: nenhum benchmark passou de {args.tolerancia:.0%} acima do baseline.")
+
+
+if __name__ == "__main__":
+    main()
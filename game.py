@@ -1,9 +1,102 @@
 # game.py (Conteúdo essencial para ser importado)
 
 import random
+from array import array
 
 # --- Lógica do Jogo ---
 
+# Jogadas codificadas como inteiros pequenos. Aceita as letras do P2P
+# ('P', 'A', 'T') e os nomes do servidor ('roc', 'pap', 'sci'); qualquer
+# outra coisa (inclusive None) conta como TIMEOUT, que sempre perde.
+ROCK, PAPER, SCISSORS, TIMEOUT = range(4)
+MOVE_CODES = {'P': ROCK, 'A': PAPER, 'T': SCISSORS, 'roc': ROCK, 'pap': PAPER, 'sci': SCISSORS,
+              'TIMEOUT': TIMEOUT}
+
+# Resultado de cada rodada (código do jogador 1 * 4 + código do jogador 2):
+# 0 empate (ou os dois em TIMEOUT), 1 vence o jogador 1, -1 vence o jogador 2
+OUTCOME_TABLE = (
+    #  ROCK PAPER SCI TIMEOUT   (jogador 2)
+    0, -1, 1, 1,    # ROCK
+    1, 0, -1, 1,    # PAPER
+    -1, 1, 0, 1,    # SCISSORS
+    -1, -1, -1, 0,  # TIMEOUT
+)
+# A mesma tabela para bytes.translate (-1 vira 255, que array('b') lê como -1)
+_OUTCOME_BYTES = bytes(resultado & 0xFF for resultado in OUTCOME_TABLE).ljust(256, b'\0')
+
+try:
+    import numpy
+    _OUTCOME_ARRAY = numpy.array(OUTCOME_TABLE, dtype=numpy.int8)
+except ImportError:  # NumPy é opcional: sem ele, resolve_rounds usa aritmética de inteiros grandes
+    numpy = None
+
+
+def encode_move(move):
+    return MOVE_CODES.get(move, TIMEOUT)
+
+
+def encode_moves(moves):
+    """Codifica uma sequência de jogadas em bytes (um código por jogada)."""
+    return bytes(map(encode_move, moves))
+
+
+def resolve_round(move1_code, move2_code):
+    """Resultado (0, 1 ou -1) de uma rodada entre duas jogadas já codificadas."""
+    return OUTCOME_TABLE[move1_code << 2 | move2_code]
+
+
+# Resultado por par de jogadas não codificadas, para o caminho de uma rodada só
+_OUTCOMES_BY_MOVES = {(move1, move2): OUTCOME_TABLE[code1 << 2 | code2]
+                      for move1, code1 in MOVE_CODES.items() for move2, code2 in MOVE_CODES.items()}
+
+
+def resolve_moves(move1, move2):
+    """
+    Resultado (0, 1 ou -1) de uma rodada entre duas jogadas não codificadas.
+    Uma jogada desconhecida conta como TIMEOUT: perde para qualquer jogada
+    válida e empata com outra desconhecida. (Antes da tabela, ela perdia ou
+    ganhava conforme o lado: 'roc' contra 'xyz' dava vitória ao 'xyz'.)
+    """
+    outcome = _OUTCOMES_BY_MOVES.get((move1, move2))
+    if outcome is None:
+        outcome = OUTCOME_TABLE[encode_move(move1) << 2 | encode_move(move2)]
+    return outcome
+
+
+def _uint8(moves):
+    # O NumPy trata bytes como um escalar; o buffer é lido sem cópia
+    if isinstance(moves, (bytes, bytearray, memoryview)):
+        return numpy.frombuffer(moves, dtype=numpy.uint8)
+    return numpy.asarray(moves, dtype=numpy.uint8)
+
+
+def resolve_rounds(moves1, moves2):
+    """
+    Resolve muitas rodadas de uma vez. Recebe duas sequências de mesmo
+    tamanho com jogadas codificadas (bytes/bytearray de encode_moves, listas
+    ou arrays NumPy) e retorna os resultados (0, 1 ou -1) na mesma ordem:
+    um array int8 do NumPy, ou um array('b') quando o NumPy não está
+    instalado.
+    """
+    if len(moves1) != len(moves2):
+        raise ValueError("as duas sequências de jogadas devem ter o mesmo tamanho")
+    if numpy is not None:
+        indices = _uint8(moves1) << 2
+        indices |= _uint8(moves2)
+        return _OUTCOME_ARRAY[indices]
+
+    # Sem NumPy: cada sequência vira um inteiro com um código por byte. Como os
+    # códigos são menores que 4, (a << 2) + b cabe em cada byte sem "vai um", e
+    # o índice da tabela de todas as rodadas sai em poucas operações em C.
+    tamanho = len(moves1)
+    primeiro = int.from_bytes(bytes(moves1), 'little')
+    segundo = int.from_bytes(bytes(moves2), 'little')
+    indices = ((primeiro << 2) + segundo).to_bytes(tamanho, 'little')
+    resultados = array('b')
+    resultados.frombytes(indices.translate(_OUTCOME_BYTES))
+    return resultados
+
+
 def determine_winner(player_choice_char, opponent_choice_char):
     """
     Determina o vencedor da rodada.
@@ -12,15 +105,9 @@ def determine_winner(player_choice_char, opponent_choice_char):
         0 para Empate
         1 para Jogador 1 (você) vence
         -1 para Jogador 2 (oponente) vence
+    Jogadas desconhecidas seguem a regra de resolve_moves.
     """
-    if player_choice_char == opponent_choice_char:
-        return 0
-    elif (player_choice_char == 'P' and opponent_choice_char == 'T') or \
-         (player_choice_char == 'A' and opponent_choice_char == 'P') or \
-         (player_choice_char == 'T' and opponent_choice_char == 'A'):
-        return 1
-    else:
-        return -1
+    return resolve_moves(player_choice_char, opponent_choice_char)
 
 # Mapeamentos para exibir as escolhas
 CHOICE_MAPPING = {'P': 'Pedra ✊', 'A': 'Papel ✋', 'T': 'Tesoura ✌️'}
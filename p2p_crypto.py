@@ -0,0 +1,131 @@
+# p2p_crypto.py (Chaves de sessão e cifragem autenticada dos quadros P2P, só com a biblioteca padrão)
+
+import hashlib
+import hmac
+import secrets
+import struct
+
+# Grupo MODP de 2048 bits (RFC 3526, grupo 14), com gerador 2
+MODP_2048_PRIME = int(
+    'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD'
+    'EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+    'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F'
+    '83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+    'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA0510'
+    '15728E5A8AACAA68FFFFFFFFFFFFFFFF', 16)
+GENERATOR = 2
+PUBLIC_KEY_SIZE = 256  # Bytes da chave pública (big-endian)
+PRIVATE_KEY_BITS = 256  # Expoente de 256 bits: ~128 bits de segurança, como o próprio grupo
+KEY_INFO = b'ppt-p2p v1'  # Contexto da derivação de chaves (muda se o formato mudar)
+TAG_SIZE = 16
+BLOCK_SIZE = 64  # Bytes de fluxo de chave por chamada do BLAKE2b
+SEQUENCE = struct.Struct('!Q')
+COUNTERS = [counter.to_bytes(4, 'big') for counter in range(16)]  # Contadores de bloco dos quadros comuns
+
+
+class AuthenticationError(Exception):
+    """Quadro com tag inválida, fora de sequência ou repetido: adulterado, reenviado ou com a chave errada."""
+
+
+def generate_keypair():
+    """Par (privada, pública) efêmero de Diffie-Hellman; um novo a cada sessão."""
+    private = secrets.randbits(PRIVATE_KEY_BITS) | 1 << (PRIVATE_KEY_BITS - 1)
+    return private, pow(GENERATOR, private, MODP_2048_PRIME)
+
+
+def encode_public(public):
+    return public.to_bytes(PUBLIC_KEY_SIZE, 'big')
+
+
+def decode_public(data):
+    """Valida a chave pública do oponente: valores triviais (1, p-1) forçariam um segredo previsível."""
+    if len(data) != PUBLIC_KEY_SIZE:
+        raise AuthenticationError(f"chave pública de {len(data)} bytes (esperado {PUBLIC_KEY_SIZE})")
+    public = int.from_bytes(data, 'big')
+    if not 1 < public < MODP_2048_PRIME - 1:
+        raise AuthenticationError("chave pública do oponente fora do grupo")
+    return public
+
+
+def hkdf(secret, salt, info, length):
+    """HKDF-SHA256 (RFC 5869): extração e expansão."""
+    prk = hmac.digest(salt or bytes(32), secret, 'sha256')
+    output, block = b'', b''
+    for counter in range(1, -(-length // 32) + 1):
+        block = hmac.digest(prk, block + info + bytes((counter,)), 'sha256')
+        output += block
+    return output[:length]
+
+
+class SessionCipher:
+    """
+    Cifragem autenticada dos quadros de uma sessão. Cada quadro selado é
+    sequência (8 bytes) + texto cifrado + tag (16 bytes):
+
+    - o texto é combinado (XOR) com um fluxo de chave gerado pelo BLAKE2b
+      com chave, em modo contador, sobre (sequência, bloco);
+    - a tag é o BLAKE2b com outra chave sobre a sequência e o texto cifrado
+      (cifra-depois-autentica);
+    - cada sentido da conexão tem as suas duas chaves e a sua sequência, e
+      só é aceito o quadro com a sequência seguinte à do último recebido,
+      o que rejeita reenvios, reordenação e quadros suprimidos.
+
+    As chaves vêm de um Diffie-Hellman efêmero, derivadas com HKDF usando a
+    chave pré-compartilhada como sal: quem não a conhece (um intermediário
+    trocando as chaves públicas) chega a chaves diferentes, e o primeiro
+    quadro já falha na verificação.
+    """
+
+    def __init__(self, private, public, peer_public, psk=b''):
+        if public == peer_public:
+            raise AuthenticationError("o oponente devolveu a nossa própria chave pública")
+        secret = pow(peer_public, private, MODP_2048_PRIME).to_bytes(PUBLIC_KEY_SIZE, 'big')
+        # Os papéis saem da ordem das chaves públicas, então os dois lados rodam o mesmo código
+        first, second = sorted((public, peer_public))
+        keys = hkdf(secret, psk, KEY_INFO + encode_public(first) + encode_public(second), 4 * 32)
+        outgoing, incoming = (keys[:64], keys[64:]) if public == first else (keys[64:], keys[:64])
+        # Objetos já inicializados com a chave: copy() evita reprocessar o bloco da chave a cada uso
+        self.send_stream = hashlib.blake2b(key=outgoing[:32])
+        self.send_mac = hashlib.blake2b(key=outgoing[32:], digest_size=TAG_SIZE)
+        self.recv_stream = hashlib.blake2b(key=incoming[:32])
+        self.recv_mac = hashlib.blake2b(key=incoming[32:], digest_size=TAG_SIZE)
+        self.send_sequence = 0
+        self.recv_sequence = 0
+
+    @staticmethod
+    def _xor_stream(stream, sequence, data):
+        size = len(data)
+        keystream = []
+        for counter in range(-(-size // BLOCK_SIZE)):
+            block = stream.copy()
+            block.update(sequence)
+            block.update(COUNTERS[counter] if counter < len(COUNTERS) else counter.to_bytes(4, 'big'))
+            keystream.append(block.digest())
+        keystream = keystream[0] if len(keystream) == 1 else b''.join(keystream)
+        return (int.from_bytes(data, 'big') ^ int.from_bytes(keystream[:size], 'big')).to_bytes(size, 'big')
+
+    def seal(self, plaintext):
+        """Cifra e autentica o próximo quadro a enviar (chamar na ordem de envio)."""
+        self.send_sequence += 1
+        sequence = SEQUENCE.pack(self.send_sequence)
+        ciphertext = self._xor_stream(self.send_stream, sequence, plaintext)
+        mac = self.send_mac.copy()
+        mac.update(sequence)
+        mac.update(ciphertext)
+        return sequence + ciphertext + mac.digest()
+
+    def open(self, frame):
+        """Confere e decifra o próximo quadro recebido; AuthenticationError se não conferir."""
+        if len(frame) < SEQUENCE.size + TAG_SIZE:
+            raise AuthenticationError("quadro curto demais")
+        sequence, ciphertext, tag = frame[:SEQUENCE.size], frame[SEQUENCE.size:-TAG_SIZE], frame[-TAG_SIZE:]
+        mac = self.recv_mac.copy()
+        mac.update(sequence)
+        mac.update(ciphertext)
+        if not hmac.compare_digest(mac.digest(), tag):
+            raise AuthenticationError("tag inválida (mensagem adulterada ou chave pré-compartilhada diferente)")
+        (number,) = SEQUENCE.unpack(sequence)
+        if number != self.recv_sequence + 1:
+            raise AuthenticationError(f"quadro {number} fora de sequência (esperado {self.recv_sequence + 1})")
+        self.recv_sequence = number
+        return self._xor_stream(self.recv_stream, sequence, ciphertext)
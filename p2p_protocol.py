@@ -0,0 +1,350 @@
+# p2p_protocol.py (Protocolo do modo P2P: quadros com tamanho e rodadas com commit-reveal)
+
+import os
+import secrets
+import socket
+import struct
+import sys
+import threading
+
+from game import determine_winner, CHOICE_MAPPING, generate_hash
+from p2p_crypto import (AuthenticationError, SessionCipher, decode_public, encode_public,
+                        generate_keypair)
+
+FRAME_HEADER = struct.Struct('!I')  # Tamanho do corpo, em bytes, antes de cada quadro
+MAX_FRAME_SIZE = 64 * 1024
+ROUNDS_IN_FLIGHT = 8  # Rodadas já jogadas por você e ainda não resolvidas
+QUIT_TIMEOUT = 5.0  # Segundos esperando as rodadas em andamento ao sair
+VALID_CHOICES = ('P', 'A', 'T')
+
+# Chave pré-compartilhada: entra na derivação das chaves de cada sessão (ver
+# p2p_crypto). Com a chave padrão, a sessão é cifrada mas não autenticada;
+# combinem uma chave própria na variável P2P_CHAVE para barrar intermediários.
+PSK_VARIABLE = 'P2P_CHAVE'
+ENCRYPTION_KEY = os.environ.get(PSK_VARIABLE, "super_secret_p2p_key")
+
+# Ao conectar, cada lado envia a sua chave pública de Diffie-Hellman em um
+# quadro; depois disso, todo quadro vai selado (ver SessionCipher).
+# Mensagens (uma por quadro; no código, dicts, e na rede, structs de tamanho fixo):
+#   {'type': 'commit', 'round': n, 'hash': H}                 H = commitment(n, jogada, nonce)
+#   {'type': 'reveal', 'round': n, 'choice': c, 'nonce': x}  só depois de receber o commit do oponente
+#   {'type': 'quit'}
+# Cada lado envia o commit assim que escolhe e revela quando tem os dois
+# commits da rodada: ninguém vê a jogada do outro antes de se comprometer
+# com a sua, e ninguém espera o outro para jogar as próximas rodadas.
+
+
+COMMIT, REVEAL, QUIT = 1, 2, 3
+COMMIT_MESSAGE = struct.Struct('!BI32s')  # Tipo, rodada, compromisso (SHA-256)
+REVEAL_MESSAGE = struct.Struct('!BIc16s')  # Tipo, rodada, jogada ('P', 'A' ou 'T'), nonce
+NONCE_SIZE = 16
+
+
+class ProtocolError(Exception):
+    """O oponente enviou algo que o protocolo não permite (quadro inválido, revelação falsa...)."""
+
+
+def encode_message(message):
+    kind = message['type']
+    if kind == 'commit':
+        return COMMIT_MESSAGE.pack(COMMIT, message['round'], bytes.fromhex(message['hash']))
+    if kind == 'reveal':
+        return REVEAL_MESSAGE.pack(REVEAL, message['round'], message['choice'].encode('ascii'),
+                                   bytes.fromhex(message['nonce']))
+    if kind == 'quit':
+        return bytes((QUIT,))
+    raise ValueError(f"mensagem desconhecida: {kind!r}")
+
+
+def decode_message(data):
+    kind = data[0] if data else None
+    if kind == COMMIT and len(data) == COMMIT_MESSAGE.size:
+        _, round_number, digest = COMMIT_MESSAGE.unpack(data)
+        return {'type': 'commit', 'round': round_number, 'hash': digest.hex()}
+    if kind == REVEAL and len(data) == REVEAL_MESSAGE.size:
+        _, round_number, choice, nonce = REVEAL_MESSAGE.unpack(data)
+        return {'type': 'reveal', 'round': round_number, 'choice': choice.decode('ascii'), 'nonce': nonce.hex()}
+    if kind == QUIT and len(data) == 1:
+        return {'type': 'quit'}
+    raise ProtocolError(f"mensagem inválida ({len(data)} bytes, tipo {kind})")
+
+
+def send_frame(sock, data):
+    sock.sendall(FRAME_HEADER.pack(len(data)) + data)
+
+
+def recv_exact(sock, size):
+    """Lê exatamente `size` bytes; None se a conexão fechar antes do primeiro byte."""
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        count = sock.recv_into(view[received:])
+        if not count:
+            if received:
+                raise ConnectionError("conexão encerrada no meio de um quadro")
+            return None
+        received += count
+    return bytes(buffer)
+
+
+class StreamTransport:
+    """Quadros com tamanho sobre uma conexão TCP (o outro transporte é p2p_udp.DatagramTransport)."""
+
+    def __init__(self, sock):
+        self.sock = sock
+        # Commits e revelações são quadros pequenos enviados em sequência: o Nagle só os atrasaria
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def send_frame(self, data):
+        send_frame(self.sock, data)
+
+    def recv_frame(self):
+        return recv_frame(self.sock)
+
+    def close(self):
+        self.sock.close()
+
+
+def recv_frame(sock):
+    """Lê um quadro inteiro (sem o cabeçalho); None se o oponente fechou a conexão."""
+    header = recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (size,) = FRAME_HEADER.unpack(header)
+    if size > MAX_FRAME_SIZE:
+        raise ProtocolError(f"quadro de {size} bytes excede o limite de {MAX_FRAME_SIZE}")
+    body = recv_exact(sock, size)
+    if body is None:
+        raise ConnectionError("conexão encerrada no meio de um quadro")
+    return body
+
+
+class Channel:
+    """
+    Mensagens em quadros (de um StreamTransport ou de um DatagramTransport),
+    cifrados e autenticados com as chaves da sessão. handshake() precisa
+    ser chamado antes de tudo.
+    """
+
+    def __init__(self, transport, key=ENCRYPTION_KEY):
+        self.transport = transport
+        self.key = key.encode('utf-8') if isinstance(key, str) else key
+        self.cipher = None
+        self.send_lock = threading.Lock()  # send() é chamado pela thread de entrada e pela de rede
+
+    def handshake(self):
+        """Troca chaves públicas efêmeras com o oponente e deriva as chaves da sessão."""
+        private, public = generate_keypair()
+        self.transport.send_frame(encode_public(public))
+        frame = self.transport.recv_frame()
+        if frame is None:
+            raise ConnectionError("o oponente desconectou durante a troca de chaves")
+        self.cipher = SessionCipher(private, public, decode_public(frame), self.key)
+
+    def send(self, message):
+        data = encode_message(message)
+        with self.send_lock:  # Selar e enviar juntos: as sequências saem na ordem em que foram geradas
+            self.transport.send_frame(self.cipher.seal(data))
+
+    def receive(self):
+        frame = self.transport.recv_frame()
+        if frame is None:
+            return None
+        return decode_message(self.cipher.open(frame))
+
+
+def commitment(round_number, choice, nonce):
+    """Compromisso com a jogada; o número da rodada impede reaproveitar uma revelação antiga."""
+    return generate_hash(f"{round_number}:{choice}:{nonce}")
+
+
+class CommitRevealSession:
+    """
+    Estado de uma sessão P2P entre dois jogadores. `play` pode ser chamado
+    várias vezes seguidas (até `window` rodadas à frente das resolvidas), e
+    as rodadas são resolvidas em ordem, pela thread que executa `run`,
+    conforme as revelações do oponente chegam.
+    """
+
+    def __init__(self, channel, window=ROUNDS_IN_FLIGHT, on_result=None):
+        self.channel = channel
+        self.window = window
+        self.on_result = on_result  # on_result(rodada, sua jogada, jogada do oponente, resultado)
+        self.condition = threading.Condition()
+        self.own = {}  # rodada -> (jogada, nonce) das suas rodadas não resolvidas
+        self.peer_commits = {}  # rodada -> compromisso do oponente
+        self.revealed = set()  # Rodadas em que você já revelou a jogada
+        self.next_round = 1
+        self.resolved = 0  # Última rodada resolvida
+        self.player_score = 0
+        self.opponent_score = 0
+        self.finished = threading.Event()
+        self.reason = None
+
+    def in_flight(self):
+        return self.next_round - 1 - self.resolved
+
+    def play(self, choice):
+        """Compromete-se com a jogada da próxima rodada; retorna o número dela (None se a sessão acabou)."""
+        if choice not in VALID_CHOICES:
+            raise ValueError(f"jogada inválida: {choice!r}")
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight() < self.window or self.finished.is_set())
+            if self.finished.is_set():
+                return None
+            round_number = self.next_round
+            self.next_round += 1
+            nonce = secrets.token_hex(NONCE_SIZE)
+            self.own[round_number] = (choice, nonce)
+            # Enviado com a condição adquirida: o commit sempre sai antes da revelação da mesma rodada
+            self.channel.send({'type': 'commit', 'round': round_number,
+                               'hash': commitment(round_number, choice, nonce)})
+            self._reveal_if_ready(round_number)
+        return round_number
+
+    def quit(self, timeout=QUIT_TIMEOUT):
+        """Espera (até `timeout` segundos) as rodadas em andamento e avisa o oponente."""
+        with self.condition:
+            self.condition.wait_for(lambda: self.in_flight() == 0 or self.finished.is_set(), timeout)
+            if self.finished.is_set():
+                return
+            pending = self.in_flight()
+            try:
+                self.channel.send({'type': 'quit'})
+            except OSError:
+                pass
+        self._finish("Você encerrou o jogo." + (f" {pending} rodada(s) sem resposta do oponente foram descartadas."
+                                                  if pending else ""))
+
+    def run(self):
+        """Lê as mensagens do oponente até o fim da sessão (thread de rede)."""
+        try:
+            while not self.finished.is_set():
+                message = self.channel.receive()
+                if message is None:
+                    self._finish("O oponente desconectou.")
+                    return
+                kind = message.get('type')
+                if kind == 'commit':
+                    self._on_commit(int(message['round']), str(message['hash']))
+                elif kind == 'reveal':
+                    self._on_reveal(int(message['round']), message['choice'], str(message['nonce']))
+                elif kind == 'quit':
+                    self._finish("O oponente encerrou o jogo.")
+                    return
+                else:
+                    raise ProtocolError(f"mensagem desconhecida: {kind!r}")
+        except AuthenticationError as e:
+            self._finish(f"Erro de autenticação: {e}")
+        except (ProtocolError, KeyError, TypeError, ValueError) as e:
+            self._finish(f"Erro de protocolo: {e}")
+        except OSError as e:
+            self._finish(f"Conexão perdida: {e}")
+
+    def _on_commit(self, round_number, peer_hash):
+        with self.condition:
+            # O oponente só pode estar `window` rodadas à frente das que você já jogou
+            if round_number <= self.resolved or round_number in self.peer_commits \
+                    or round_number >= self.next_round + self.window:
+                raise ProtocolError(f"compromisso inesperado para a rodada {round_number}")
+            self.peer_commits[round_number] = peer_hash
+            self._reveal_if_ready(round_number)
+
+    def _reveal_if_ready(self, round_number):
+        # Chamado com a condição adquirida
+        if round_number in self.own and round_number in self.peer_commits and round_number not in self.revealed:
+            choice, nonce = self.own[round_number]
+            self.channel.send({'type': 'reveal', 'round': round_number, 'choice': choice, 'nonce': nonce})
+            self.revealed.add(round_number)
+
+    def _on_reveal(self, round_number, choice, nonce):
+        with self.condition:
+            if round_number != self.resolved + 1 or round_number not in self.revealed:
+                raise ProtocolError(f"revelação fora de ordem para a rodada {round_number}")
+            if choice not in VALID_CHOICES or \
+                    commitment(round_number, choice, nonce) != self.peer_commits.pop(round_number):
+                raise ProtocolError(f"a jogada revelada na rodada {round_number} não corresponde ao compromisso")
+            own_choice, _ = self.own.pop(round_number)
+            self.revealed.discard(round_number)
+            self.resolved = round_number
+            result = determine_winner(own_choice, choice)
+            if result == 1:
+                self.player_score += 1
+            elif result == -1:
+                self.opponent_score += 1
+            self.condition.notify_all()
+        if self.on_result:
+            self.on_result(round_number, own_choice, choice, result)
+
+    def _finish(self, reason):
+        with self.condition:
+            if self.finished.is_set():
+                return
+            self.reason = reason
+            self.finished.set()
+            self.condition.notify_all()
+
+
+# --- Console (usado por p2p_server.py e p2p_client.py) ---
+def print_result(session, round_number, own_choice, opponent_choice, result):
+    print(f"\n--- Rodada {round_number} ---")
+    print(f"Você: {CHOICE_MAPPING[own_choice]} | Oponente: {CHOICE_MAPPING[opponent_choice]}")
+    print("Resultado: " + ("Empate!" if result == 0 else "Você Venceu!" if result == 1 else "Você Perdeu!"))
+    print(f"Placar: Você {session.player_score} x {session.opponent_score} Oponente")
+
+
+def input_lines():
+    """
+    Linhas do teclado lidas direto do descritor. Uma thread parada aqui não
+    impede o interpretador de encerrar; parada em input(), ela trava o
+    buffer da entrada padrão no encerramento.
+    """
+    pending = b''
+    while True:
+        data = os.read(sys.stdin.fileno(), 1024)
+        if not data:
+            if pending:
+                yield pending.decode('utf-8', 'replace')
+            return
+        *lines, pending = (pending + data).split(b'\n')
+        for line in lines:
+            yield line.decode('utf-8', 'replace')
+
+
+def read_moves(session):
+    """Lê as jogadas do teclado; várias letras de uma vez (ex.: PAT) adiantam várias rodadas."""
+    lines = input_lines()
+    while not session.finished.is_set():
+        line = next(lines, 'SAIR').strip().upper()
+        if line == 'SAIR':
+            session.quit()
+            return
+        if not line or any(choice not in VALID_CHOICES for choice in line):
+            print("Escolha inválida. Por favor, digite P, A, T (ou várias, ex.: PAT) ou 'sair'.")
+            continue
+        for choice in line:
+            round_number = session.play(choice)
+            if round_number is None:
+                return
+            print(f"Rodada {round_number}: você escolheu {CHOICE_MAPPING[choice]}. Aguardando o oponente...")
+
+
+def play_console(transport):
+    """Joga uma sessão P2P pelo console no transporte (TCP ou UDP) já ligado ao oponente."""
+    channel = Channel(transport)
+    try:
+        channel.handshake()
+    except AuthenticationError as e:
+        print(f"Erro na troca de chaves: {e}")
+        return
+    print("Sessão cifrada estabelecida.")
+    session = CommitRevealSession(channel)
+    session.on_result = lambda *args: print_result(session, *args)
+    print("Sua escolha (P/A/T) ou 'sair' para encerrar. Você pode jogar várias rodadas à frente (ex.: PAT).")
+    threading.Thread(target=session.run, name='p2p-rede', daemon=True).start()
+    # A entrada roda em uma thread à parte para a sessão poder terminar com a leitura do teclado bloqueada
+    threading.Thread(target=read_moves, args=(session,), name='p2p-entrada', daemon=True).start()
+    session.finished.wait()
+    print(session.reason)
+    print(f"Placar final: Você {session.player_score} x {session.opponent_score} Oponente")
@@ -0,0 +1,393 @@
+# p2p_udp.py (Transporte UDP do modo P2P: sequência, acks, retransmissão e descarte de duplicados)
+
+import argparse
+import heapq
+import itertools
+import queue
+import random
+import socket
+import struct
+import threading
+import time
+
+DATA, ACK = 0, 1
+DATA_HEADER = struct.Struct('!BI')  # Tipo, sequência do datagrama
+ACK_MESSAGE = struct.Struct('!BII')  # Tipo, próxima sequência esperada (ack cumulativo), sequência confirmada
+MAX_PAYLOAD = 1200  # Cabe em um datagrama sem fragmentação em qualquer rede comum
+SEND_WINDOW = 64  # Sequências enviadas a partir do datagrama mais antigo ainda não confirmado
+RECEIVE_WINDOW = 256  # Datagramas fora de ordem guardados à espera dos anteriores
+INITIAL_RTO = 0.2  # Segundos até a primeira retransmissão, antes de medir o RTT
+MIN_RTO = 0.03
+MAX_RTO = 2.0
+MAX_RETRIES = 10  # Retransmissões de um datagrama antes de considerar o oponente perdido
+LINGER = 2.0  # Segundos que close() espera os últimos datagramas serem confirmados
+
+
+class Timer:
+    """Prazo agendado em uma TimerQueue; cancel() só o marca, e ele é descartado ao vencer."""
+    __slots__ = ('function', 'args', 'cancelled')
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerQueue:
+    """
+    Prazos das retransmissões e dos atrasos simulados: um heap ordenado pelo
+    vencimento e uma thread que chama as funções vencidas. Uma conexão P2P
+    tem no máximo SEND_WINDOW retransmissões pendentes, então o heap é
+    pequeno; cancelar custa O(1) e deixa o temporizador no heap até o
+    vencimento, quando ele é só descartado.
+
+    As funções são chamadas na thread da fila e devem ser rápidas.
+    """
+
+    def __init__(self):
+        self.heap = []  # (vencimento, desempate, Timer)
+        self.order = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        with self.condition:
+            if self.thread:
+                return
+            self.thread = threading.Thread(target=self._run, name='p2p-timers', daemon=True)
+        self.thread.start()
+
+    def schedule(self, delay, function, *args):
+        """Chama function(*args) daqui a `delay` segundos."""
+        timer = Timer(function, args)
+        with self.condition:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.order), timer))
+            if self.heap[0][2] is timer:
+                self.condition.notify()  # Vence antes do prazo que a thread estava esperando
+        return timer
+
+    def _run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if not self.heap:
+                        self.condition.wait()
+                        continue
+                    deadline, _, timer = self.heap[0]
+                    delay = deadline - time.monotonic()
+                    if timer.cancelled or delay <= 0:
+                        heapq.heappop(self.heap)
+                        if not timer.cancelled:
+                            break
+                    else:
+                        self.condition.wait(delay)
+            try:
+                timer.function(*timer.args)
+            except Exception as e:
+                print(f"ERRO em temporizador {getattr(timer.function, '__name__', timer.function)}: {e}")
+
+
+timers = TimerQueue()
+
+
+class _Pending:
+    """Datagrama enviado e ainda não confirmado."""
+    __slots__ = ('datagram', 'sent_at', 'retries', 'timer')
+
+    def __init__(self, datagram, sent_at):
+        self.datagram = datagram
+        self.sent_at = sent_at
+        self.retries = 0
+        self.timer = None
+
+
+class DatagramTransport:
+    """
+    Quadros sobre UDP, entregues em ordem, sem duplicados e com retransmissão,
+    com a mesma interface do StreamTransport (send_frame/recv_frame/close).
+
+    Cada quadro vai em um datagrama com a sua sequência. O receptor confirma
+    todo datagrama recebido (inclusive duplicados, cujo ack pode ter se
+    perdido) com um ack que traz a sequência confirmada e a próxima
+    esperada, que confirma de uma vez todas as anteriores. Quadros fora de
+    ordem esperam os que faltam; duplicados são descartados. O prazo de
+    retransmissão segue o RTT medido (RFC 6298, sem amostras de datagramas
+    retransmitidos) e dobra a cada nova tentativa.
+
+    `loss`, `delay` e `jitter` descartam ou atrasam os datagramas enviados,
+    para testar a recuperação em loopback (ver main()).
+    """
+
+    def __init__(self, sock, loss=0.0, delay=0.0, jitter=0.0, seed=None):
+        self.sock = sock
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.random = random.Random(seed)
+        self.condition = threading.Condition()
+        self.next_sequence = 0
+        self.unacked = {}  # sequência -> _Pending, em ordem crescente de sequência
+        self.expected = 1  # Próxima sequência a entregar
+        self.out_of_order = {}
+        self.inbox = queue.Queue()  # Quadros já em ordem; None encerra recv_frame
+        self.srtt = None
+        self.rttvar = None
+        self.rto = INITIAL_RTO
+        self.error = None
+        self.closed = False
+        # Estatísticas (ver main)
+        self.retransmissions = 0
+        self.duplicates = 0
+        self.dropped = 0
+        timers.start()
+
+    @classmethod
+    def connect(cls, address, **options):
+        """Lado que inicia: o primeiro quadro enviado já chega ao oponente, sem handshake de conexão."""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.connect(address)
+        transport = cls(sock, **options)
+        transport._start()
+        return transport
+
+    @classmethod
+    def accept(cls, sock, **options):
+        """
+        Lado que espera (socket já ligado à porta): o oponente é quem enviar o
+        primeiro quadro, e o socket passa a aceitar só os datagramas dele.
+        """
+        while True:
+            datagram, address = sock.recvfrom(MAX_PAYLOAD + DATA_HEADER.size)
+            if len(datagram) >= DATA_HEADER.size and DATA_HEADER.unpack_from(datagram) == (DATA, 1):
+                break
+        sock.connect(address)
+        transport = cls(sock, **options)
+        transport._on_data(1, datagram[DATA_HEADER.size:])
+        transport._start()
+        return transport, address
+
+    def _start(self):
+        threading.Thread(target=self._receive_loop, name='p2p-udp', daemon=True).start()
+
+    # --- Envio ---
+    def send_frame(self, data):
+        if len(data) > MAX_PAYLOAD:
+            raise ValueError(f"quadro de {len(data)} bytes excede o limite de {MAX_PAYLOAD} do UDP")
+        with self.condition:
+            # A janela conta a partir do mais antigo não confirmado (e não só os pendentes): com acks
+            # seletivos, um datagrama perdido não deixa o envio correr além da janela do receptor
+            self.condition.wait_for(lambda: not self.unacked or self.error or self.closed
+                                    or self.next_sequence - next(iter(self.unacked)) + 1 < SEND_WINDOW)
+            if self.error or self.closed:
+                raise ConnectionError(self.error or "transporte fechado")
+            self.next_sequence += 1
+            sequence = self.next_sequence
+            pending = _Pending(DATA_HEADER.pack(DATA, sequence) + data, time.monotonic())
+            pending.timer = timers.schedule(self.rto, self._retransmit, sequence)
+            self.unacked[sequence] = pending
+        self._transmit(pending.datagram)
+
+    def _retransmit(self, sequence):
+        # Thread dos temporizadores (TimerQueue)
+        with self.condition:
+            pending = self.unacked.get(sequence)
+            if pending is None or self.closed:
+                return
+            if pending.retries >= MAX_RETRIES:
+                self._fail("o oponente parou de responder")
+                return
+            pending.retries += 1
+            self.retransmissions += 1
+            pending.timer = timers.schedule(min(self.rto * 2 ** pending.retries, MAX_RTO), self._retransmit, sequence)
+        self._transmit(pending.datagram)
+
+    def _transmit(self, datagram):
+        if self.loss and self.random.random() < self.loss:
+            self.dropped += 1
+            return
+        if self.delay or self.jitter:
+            timers.schedule(self.delay + self.random.uniform(0, self.jitter), self._send_now, datagram)
+        else:
+            self._send_now(datagram)
+
+    def _send_now(self, datagram):
+        try:
+            self.sock.send(datagram)
+        except OSError:
+            pass  # Porta do oponente ainda fechada, socket já fechado...: a retransmissão cobre
+
+    # --- Recebimento ---
+    def recv_frame(self):
+        """Próximo quadro, em ordem; None depois de close(). ConnectionError se o oponente sumiu."""
+        frame = self.inbox.get()
+        if frame is None:
+            self.inbox.put(None)  # Para as próximas chamadas também retornarem
+            if self.error:
+                raise ConnectionError(self.error)
+        return frame
+
+    def _receive_loop(self):
+        while not self.closed:
+            try:
+                datagram = self.sock.recv(MAX_PAYLOAD + DATA_HEADER.size)
+            except ConnectionRefusedError:
+                continue  # ICMP de porta fechada (o oponente ainda não abriu ou já fechou)
+            except OSError:
+                return  # Socket fechado
+            if len(datagram) == ACK_MESSAGE.size and datagram[0] == ACK:
+                _, expected, sequence = ACK_MESSAGE.unpack(datagram)
+                self._on_ack(expected, sequence)
+            elif len(datagram) >= DATA_HEADER.size and datagram[0] == DATA:
+                _, sequence = DATA_HEADER.unpack_from(datagram)
+                self._on_data(sequence, datagram[DATA_HEADER.size:])
+
+    def _on_data(self, sequence, payload):
+        with self.condition:
+            if self.expected <= sequence < self.expected + RECEIVE_WINDOW and sequence not in self.out_of_order:
+                self.out_of_order[sequence] = payload
+                while self.expected in self.out_of_order:
+                    self.inbox.put(self.out_of_order.pop(self.expected))
+                    self.expected += 1
+            elif sequence < self.expected or sequence in self.out_of_order:
+                self.duplicates += 1
+            else:
+                return  # Além da janela: sem ack, para o oponente retransmitir quando couber
+            ack = ACK_MESSAGE.pack(ACK, self.expected, sequence)
+        self._transmit(ack)
+
+    def _on_ack(self, expected, sequence):
+        now = time.monotonic()
+        with self.condition:
+            acked = [sequence] if sequence in self.unacked else []
+            for pending_sequence in self.unacked:  # Em ordem crescente: para no primeiro ainda não confirmado
+                if pending_sequence >= expected:
+                    break
+                acked.append(pending_sequence)
+            for pending_sequence in acked:
+                pending = self.unacked.pop(pending_sequence, None)
+                if pending is None:
+                    continue
+                pending.timer.cancel()
+                if pending.retries == 0:
+                    self._sample_rtt(now - pending.sent_at)
+            if acked:
+                self.condition.notify_all()
+
+    def _sample_rtt(self, rtt):
+        # Chamado com a condição adquirida (RFC 6298)
+        if self.srtt is None:
+            self.srtt, self.rttvar = rtt, rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        self.rto = min(max(self.srtt + 4 * self.rttvar, MIN_RTO), MAX_RTO)
+
+    def _fail(self, reason):
+        # Chamado com a condição adquirida
+        self.error = reason
+        self.condition.notify_all()
+        self.inbox.put(None)
+
+    def close(self, linger=LINGER):
+        """Espera (até `linger` segundos) a confirmação do que foi enviado e fecha o socket."""
+        with self.condition:
+            self.condition.wait_for(lambda: not self.unacked or self.error, linger)
+            self.closed = True
+            for pending in self.unacked.values():
+                pending.timer.cancel()
+            self.unacked.clear()
+            self.condition.notify_all()
+        self.inbox.put(None)
+        self.sock.close()
+
+
+# --- Opções de linha de comando (p2p_server.py e p2p_client.py) ---
+def add_transport_arguments(parser):
+    parser.add_argument('--udp', action='store_true',
+                        help="joga sobre UDP, com sequência, acks e retransmissão próprias, em vez de TCP")
+    parser.add_argument('--perda', type=float, default=0.0,
+                        help="(teste, só com --udp) descarta esta fração dos datagramas enviados")
+    parser.add_argument('--atraso', type=float, default=0.0,
+                        help="(teste, só com --udp) atrasa cada datagrama enviado por tantos segundos")
+
+
+def transport_options(args):
+    return {'loss': args.perda, 'delay': args.atraso}
+
+
+# --- Teste em loopback com perda e atraso simulados ---
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Joga rodadas P2P aleatórias entre dois lados em loopback pelo transporte UDP, "
+                    "com perda e atraso simulados, e confere se os dois chegaram ao mesmo placar.")
+    parser.add_argument('--rodadas', type=int, default=1000)
+    parser.add_argument('--perda', type=float, default=0.1, help="probabilidade de descartar cada datagrama enviado")
+    parser.add_argument('--atraso', type=float, default=0.01, help="atraso fixo (s) de cada datagrama enviado")
+    parser.add_argument('--variacao', type=float, default=0.01,
+                        help="atraso extra aleatório (s), entre 0 e este valor: reordena datagramas")
+    parser.add_argument('--semente', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from p2p_protocol import Channel, CommitRevealSession
+
+    args = ler_argumentos(argv)
+    options = {'loss': args.perda, 'delay': args.atraso, 'jitter': args.variacao}
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(('127.0.0.1', 0))
+    accepted = {}
+    # Sementes diferentes em cada lado: as perdas dos dois sentidos não são
+    # correlacionadas (um ack pode se perder mesmo com o datagrama que ele
+    # confirma tendo chegado, o caso que exercita os duplicados)
+    seeds = (None, None) if args.semente is None else (args.semente, args.semente + 1)
+    accepting = threading.Thread(target=lambda: accepted.update(
+        transport=DatagramTransport.accept(listener, seed=seeds[1], **options)[0]))
+    accepting.start()
+    initiator = DatagramTransport.connect(listener.getsockname(), seed=seeds[0], **options)
+
+    inicio = time.perf_counter()
+    channels = [Channel(initiator)]
+    handshake = threading.Thread(target=channels[0].handshake)
+    handshake.start()
+    accepting.join()
+    channels.append(Channel(accepted['transport']))
+    channels[1].handshake()
+    handshake.join()
+
+    sessions = [CommitRevealSession(channel) for channel in channels]
+    for session in sessions:
+        threading.Thread(target=session.run, daemon=True).start()
+    players = [threading.Thread(target=lambda session=session: [session.play(random.choice('PAT'))
+                                                                for _ in range(args.rodadas)])
+               for session in sessions]
+    for player in players:
+        player.start()
+    for player in players:
+        player.join()
+    sessions[0].quit(timeout=60)
+    sessions[1].finished.wait(60)
+    decorrido = time.perf_counter() - inicio
+    transports = [initiator, accepted['transport']]
+    for transport in transports:
+        transport.close()
+
+    print(f"Rodadas resolvidas: {sessions[0].resolved} / {sessions[1].resolved} de {args.rodadas} "
+          f"em {decorrido:.2f} s ({sessions[0].resolved / decorrido:.0f} rodadas/s)")
+    print(f"Placar: {sessions[0].player_score} x {sessions[0].opponent_score} | "
+          f"do outro lado: {sessions[1].opponent_score} x {sessions[1].player_score}")
+    for lado, transport in zip(('iniciador', 'ouvinte'), transports):
+        print(f"[{lado}] descartados={transport.dropped} retransmissões={transport.retransmissions} "
+              f"duplicados={transport.duplicates} rto={transport.rto * 1000:.0f} ms")
+    ok = (sessions[0].resolved == sessions[1].resolved == args.rodadas
+          and (sessions[0].player_score, sessions[0].opponent_score)
+          == (sessions[1].opponent_score, sessions[1].player_score))
+    print("OK" if ok else f"FALHOU: {sessions[0].reason} / {sessions[1].reason}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,311 @@
+# ser_broker.py (Broker de pareamento entre vários servidores)
+
+import argparse
+import os
+import socket
+import threading
+from collections import deque
+from multiprocessing.connection import Client, Listener, answer_challenge, deliver_challenge
+
+from ser_conexao import configurar_nodelay
+from ser_fila import FilaPareamento
+from ser_processos import ESPERA_CRUZADA, Coordenador
+from ser_ranking import RankingFragmentado
+
+HOST_BROKER = '127.0.0.1'
+PORTA_BROKER = 12400
+VARIAVEL_CHAVE = 'SER_BROKER_CHAVE'  # Chave compartilhada, quando não passada por --chave
+FRAGMENTOS_RANKING = 16
+LIMITE_FILA_NO = 10000  # Mensagens pendentes para um nó a partir das quais ele é desconectado
+PRAZO_AUTENTICACAO = 5.0  # Segundos para uma conexão nova completar o desafio da chave
+
+# Além das mensagens do coordenador (ver ser_processos), a federação usa:
+#   broker -> nó: ('registrado', indice, [(nome, vitórias), ...])   na conexão
+#                 ('registrar', nome)  ('incrementar', nome, delta)  de outros nós
+#   nó -> broker: ('mesclar', [(nome, vitórias), ...])              depois do registro
+
+
+def _sem_nagle(conexao):
+    """Liga TCP_NODELAY na conexão: jogadas e quadros repassados são mensagens pequenas."""
+    with socket.socket(fileno=os.dup(conexao.fileno())) as sock:
+        configurar_nodelay(sock, True)
+
+
+def _derrubar(conexao):
+    """Desliga os dois sentidos da conexão, o que também solta um send() bloqueado em outra thread."""
+    try:
+        with socket.socket(fileno=os.dup(conexao.fileno())) as sock:
+            sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass  # Já fechada
+
+
+class EnvioNo:
+    """
+    Fila de saída de um nó, esvaziada por uma thread própria: o laço do
+    broker só enfileira, então um nó que para de ler não atrasa os outros.
+    Se a fila passar de `limite` mensagens, ela para de aceitar mensagens e
+    `transbordou` fica ligado, para o laço do broker desconectar o nó.
+    """
+
+    def __init__(self, conexao, indice, limite=LIMITE_FILA_NO):
+        self.conexao = conexao
+        self.limite = limite
+        self.fila = deque()
+        self.condicao = threading.Condition()
+        self.encerrado = False
+        self.transbordou = False
+        threading.Thread(target=self._executar, name=f'broker-envio-{indice}', daemon=True).start()
+
+    def enviar(self, mensagem):
+        with self.condicao:
+            if self.encerrado:
+                return
+            if len(self.fila) >= self.limite:
+                self.transbordou = self.encerrado = True
+                self.fila.clear()
+            else:
+                self.fila.append(mensagem)
+            self.condicao.notify()
+
+    def encerrar(self):
+        with self.condicao:
+            self.encerrado = True
+            self.fila.clear()
+            self.condicao.notify()
+
+    def _executar(self):
+        while True:
+            with self.condicao:
+                while not self.fila and not self.encerrado:
+                    self.condicao.wait()
+                if self.encerrado:
+                    return
+                mensagem = self.fila.popleft()
+            try:
+                self.conexao.send(mensagem)
+            except (OSError, ValueError):
+                return  # Nó desconectado (o laço do broker lê o EOF e o remove)
+
+
+class Broker(Coordenador):
+    """
+    Coordenador entre servidores (nós) independentes. Cada nó pareia os seus
+    jogadores localmente e só envia ao broker quem ficou esperando demais;
+    aqui, esses jogadores são pareados primeiro com os do mesmo nó e depois
+    entre nós, como no modo multiprocesso, e a partida roda em um dos dois
+    nós, com as mensagens do outro jogador repassadas pelo broker.
+
+    O broker também mantém o ranking mesclado: cada vitória informada por um
+    nó é repassada aos demais, e um nó que se conecta recebe o ranking
+    inteiro e envia o seu (fica o maior valor de cada jogador).
+
+    As conexões são aceitas por uma thread e autenticadas (desafio da chave,
+    com prazo) cada uma na sua, para que um cliente que conecta e não envia
+    nada não segure os registros seguintes; as autenticadas são entregues
+    ao laço principal, que é o único a tocar no estado do coordenador. Os envios para cada nó
+    passam por um EnvioNo: um nó lento acumula mensagens na sua fila (até
+    `limite_fila`, e aí é desconectado) sem segurar o laço.
+    """
+    descricao = 'Nó'
+
+    def __init__(self, endereco, chave, criar_fila=FilaPareamento, limite_fila=LIMITE_FILA_NO,
+                 prazo_autenticacao=PRAZO_AUTENTICACAO):
+        super().__init__({}, RankingFragmentado(FRAGMENTOS_RANKING), criar_fila)
+        self.criar_fila = criar_fila
+        self.limite_fila = limite_fila
+        self.envios = {}  # índice -> EnvioNo
+        self.chave = chave
+        self.prazo_autenticacao = prazo_autenticacao
+        self.ouvinte = Listener(endereco)  # Sem authkey: o desafio é feito em _autenticar, com prazo
+        self.novos = []  # Conexões aceitas e ainda não registradas
+        self.trava_novos = threading.Lock()
+        self.proximo_indice = 0
+
+    def _aceitar(self):
+        while True:
+            try:
+                conexao = self.ouvinte.accept()
+            except OSError:
+                return  # Ouvinte fechado
+            threading.Thread(target=self._autenticar, args=(conexao,), name='broker-autenticar', daemon=True).start()
+
+    def _autenticar(self, conexao):
+        trava = threading.Lock()
+        concluido = False
+
+        def expirar():
+            with trava:
+                if not concluido:
+                    _derrubar(conexao)  # Solta o recv bloqueado no desafio
+
+        temporizador = threading.Timer(self.prazo_autenticacao, expirar)
+        temporizador.daemon = True
+        temporizador.start()
+        try:
+            deliver_challenge(conexao, self.chave)
+            answer_challenge(conexao, self.chave)
+            with trava:
+                concluido = True
+        except Exception as e:  # Chave errada, handshake incompleto ou prazo esgotado
+            print(f"AVISO: Conexão recusada: {e or type(e).__name__}")
+            conexao.close()
+            return
+        finally:
+            temporizador.cancel()
+        _sem_nagle(conexao)
+        with self.trava_novos:
+            self.novos.append(conexao)
+
+    def executar(self):
+        threading.Thread(target=self._aceitar, name='broker-aceitar', daemon=True).start()
+        while True:
+            with self.trava_novos:
+                novos, self.novos = self.novos, []
+            for conexao in novos:
+                self._registrar_no(conexao)
+            for indice in [indice for indice, envio in self.envios.items() if envio.transbordou]:
+                print(f"AVISO: Nó {indice} desconectado: parou de ler as mensagens do broker.")
+                self._remover_trabalhador(indice)
+            self.atender(ESPERA_CRUZADA)
+
+    def enviar(self, indice, mensagem):
+        envio = self.envios.get(indice)
+        if envio is not None:
+            envio.enviar(mensagem)
+
+    def _registrar_no(self, conexao):
+        indice = self.proximo_indice
+        self.proximo_indice += 1
+        self.canais[indice] = conexao
+        self.envios[indice] = EnvioNo(conexao, indice, self.limite_fila)
+        self.filas[indice] = self.criar_fila()
+        self.ativas[indice] = 0
+        with self.ranking.travado():
+            pares = list(self.ranking.itens())
+        self.enviar(indice, ('registrado', indice, pares))
+        print(f"[BROKER] Nó {indice} registrado. Nós conectados: {len(self.canais)}")
+
+    def _remover_trabalhador(self, indice):
+        self.envios.pop(indice).encerrar()
+        _derrubar(self.canais[indice])
+        super()._remover_trabalhador(indice)
+
+    def _repassar(self, origem, mensagem):
+        for indice in list(self.canais):
+            if indice != origem:
+                self.enviar(indice, mensagem)
+
+    def tratar(self, indice, mensagem):
+        tipo = mensagem[0]
+        if tipo == 'registrar':
+            if self.ranking.registrar(mensagem[1]):
+                self._repassar(indice, mensagem)
+        elif tipo == 'incrementar':
+            self.ranking.incrementar(mensagem[1], mensagem[2])
+            self._repassar(indice, mensagem)
+        elif tipo == 'mesclar':
+            for nome, delta in self.ranking.mesclar(mensagem[1]):
+                self._repassar(indice, ('incrementar', nome, delta) if delta else ('registrar', nome))
+        else:
+            super().tratar(indice, mensagem)
+
+
+# --- Lado do nó (usado por ser_server com --broker) ---
+class RankingFederado:
+    """
+    Ranking local de um nó que também informa ao broker as alterações
+    feitas aqui. As alterações vindas do broker são aplicadas direto em
+    `local`, sem voltar para ele. Consultas são locais.
+    """
+
+    def __init__(self, local, canal):
+        self.local = local
+        self.canal = canal
+
+    def __len__(self):
+        return len(self.local)
+
+    def get(self, nome, padrao=0):
+        return self.local.get(nome, padrao)
+
+    def registrar(self, nome):
+        if self.local.registrar(nome):
+            self.canal.enviar(('registrar', nome))
+
+    def incrementar(self, nome, delta=1):
+        total = self.local.incrementar(nome, delta)
+        self.canal.enviar(('incrementar', nome, delta))
+        return total
+
+    def consultar(self, offset=0, limite=10, nome=None):
+        return self.local.consultar(offset, limite, nome)
+
+
+def conectar(endereco, chave):
+    """Conecta ao broker; retorna (conexão, índice do nó, ranking mesclado do broker)."""
+    conexao = Client(endereco, authkey=chave)
+    _sem_nagle(conexao)
+    tipo, indice, pares = conexao.recv()
+    if tipo != 'registrado':
+        conexao.close()
+        raise ConnectionError(f"resposta inesperada do broker: '{tipo}'")
+    return conexao, indice, pares
+
+
+def endereco_broker(texto):
+    """'host:porta' (ou só 'porta', em localhost) -> (host, porta); para argparse."""
+    host, _, porta = texto.rpartition(':')
+    try:
+        return host or HOST_BROKER, int(porta)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"endereço do broker inválido: '{texto}' (use host:porta)")
+
+
+def ler_chave(chave):
+    """Chave de autenticação da federação (--chave ou a variável SER_BROKER_CHAVE)."""
+    chave = chave or os.environ.get(VARIAVEL_CHAVE)
+    return chave.encode('utf-8') if chave else None
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Broker de pareamento e ranking entre servidores ser_server.")
+    parser.add_argument('--host', default=HOST_BROKER,
+                        help="interface em que o broker escuta (padrão: só a própria máquina)")
+    parser.add_argument('--porta', type=int, default=PORTA_BROKER)
+    parser.add_argument('--chave', default=None,
+                        help=f"chave compartilhada com os servidores (ou a variável {VARIAVEL_CHAVE})")
+    parser.add_argument('--pareamento', choices=('fifo', 'vitorias'), default='fifo',
+                        help="ordem de chegada ou faixas de vitórias do ranking mesclado")
+    parser.add_argument('--faixa-vitorias', type=int, default=5)
+    parser.add_argument('--espera-alargamento', type=float, default=10.0)
+    parser.add_argument('--limite-fila', type=int, default=LIMITE_FILA_NO,
+                        help="mensagens pendentes para um nó a partir das quais ele é desconectado")
+    args = parser.parse_args(argv)
+    args.chave = ler_chave(args.chave)
+    if not args.chave:
+        # As mensagens são objetos Python serializados (pickle): sem autenticação,
+        # qualquer um que alcançasse a porta poderia executar código no broker
+        parser.error(f"informe a chave compartilhada com --chave ou {VARIAVEL_CHAVE}")
+    return args
+
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    broker = Broker((args.host, args.porta), args.chave, limite_fila=args.limite_fila)
+    if args.pareamento == 'vitorias':
+        def criar_fila():
+            return FilaPareamento(broker.ranking.get, args.faixa_vitorias, args.espera_alargamento)
+        broker.criar_fila = criar_fila
+    print(f"[*] Broker escutando em {args.host}:{args.porta}")
+    try:
+        broker.executar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        broker.ouvinte.close()
+        print("Broker encerrado.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+# ser_carga.py (Gerador de carga: bots que jogam contra o ser_server)
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+from ser_protocolo import LeitorQuadros, CODECS, CODEC_JSON
+from ser_sistema import elevar_limite_descritores
+
+HOST = '127.0.0.1'
+PORT = 12345
+JOGADAS = ('ROC', 'PAP', 'SCI')
+VENCE = {'ROC': 'SCI', 'SCI': 'PAP', 'PAP': 'ROC'}  # Jogada -> jogada que ela vence
+PERDE_PARA = {perdedora: vencedora for vencedora, perdedora in VENCE.items()}
+RESULTADOS = ('WIN', 'LOS', 'TIE')
+PERCENTIS = (50, 90, 99)
+
+
+# --- Estratégias de jogada ---
+# Cada estratégia recebe o número da rodada (1 a 3) e a última jogada do
+# oponente (None na primeira rodada) e retorna o comando a enviar.
+def _aleatoria(rodada, ultima_oponente):
+    return random.choice(JOGADAS)
+
+
+def _pedra(rodada, ultima_oponente):
+    return 'ROC'
+
+
+def _ciclo(rodada, ultima_oponente):
+    return JOGADAS[(rodada - 1) % len(JOGADAS)]
+
+
+def _contra(rodada, ultima_oponente):
+    # Joga o que venceria a jogada anterior do oponente
+    if ultima_oponente not in PERDE_PARA:
+        return random.choice(JOGADAS)
+    return PERDE_PARA[ultima_oponente]
+
+
+ESTRATEGIAS = {'aleatoria': _aleatoria, 'pedra': _pedra, 'ciclo': _ciclo, 'contra': _contra}
+
+
+def percentis(valores, pontos=PERCENTIS):
+    """Percentis por posição (nearest-rank) de uma lista de valores; {} se ela estiver vazia."""
+    if not valores:
+        return {}
+    ordenados = sorted(valores)
+    resultado = {f"p{p}": ordenados[min(len(ordenados) - 1, max(0, -(-p * len(ordenados) // 100) - 1))]
+                 for p in pontos}
+    resultado["max"] = ordenados[-1]
+    return resultado
+
+
+class Estatisticas:
+    """Contadores e amostras de latência (em segundos) de todos os bots."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.conexao = []  # connect() até o socket aberto
+        self.pla_resultado = []  # PLA recebido até o WIN/LOS/TIE (inclui o tempo de pensar e o oponente)
+        self.jogada_resultado = []  # Jogada enviada até o WIN/LOS/TIE
+        self.ranking = []  # RAN enviado até a resposta
+        self.sessoes = 0
+        self.fins = 0  # END recebidos; cada partida entre dois bots gera dois
+        self.rodadas = 0
+        self.timeouts = 0  # Resultados em que o bot ou o oponente ficou sem jogar
+        self.abandonos = 0
+        self.erros = {}
+
+    def erro(self, tipo):
+        self.erros[tipo] = self.erros.get(tipo, 0) + 1
+
+    def relatorio(self):
+        decorrido = time.perf_counter() - self.inicio
+        partidas = self.fins / 2
+        return {
+            "duracao": decorrido,
+            "sessoes": self.sessoes,
+            "partidas": partidas,
+            "partidas_por_segundo": partidas / decorrido if decorrido else 0.0,
+            "rodadas": self.rodadas,
+            "timeouts": self.timeouts,
+            "abandonos": self.abandonos,
+            "erros": dict(self.erros),
+            "latencia_ms": {
+                nome: {chave: valor * 1000 for chave, valor in percentis(amostras).items()}
+                for nome, amostras in (("conexao", self.conexao), ("pla_resultado", self.pla_resultado),
+                                       ("jogada_resultado", self.jogada_resultado), ("ranking", self.ranking))
+            },
+        }
+
+
+class ErroProtocolo(Exception):
+    """O servidor enviou algo que o bot não esperava."""
+
+
+async def _proximas(reader, leitor, prazo):
+    """Espera os próximos bytes e retorna as mensagens completas (lista possivelmente vazia)."""
+    dados = await asyncio.wait_for(reader.read(65536), prazo)
+    if not dados:
+        raise ConnectionResetError("servidor encerrou a conexão")
+    mensagens = leitor.alimentar(dados)
+    for comando, payload in mensagens:
+        if comando is None:
+            raise ErroProtocolo(f"JSON inválido: {payload!r}")
+    return mensagens
+
+
+async def sessao(nome, porta, config, estat):
+    """
+    Uma sessão completa de um bot: conecta, envia CON, joga a partida,
+    opcionalmente pede o ranking e sai com QUI. Com probabilidade
+    `config.churn`, o bot abandona a sessão (fecha o socket sem QUI) em um
+    instante aleatório, na fila ou no meio da partida.
+    """
+    inicio = time.perf_counter()
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(config.host, porta), config.prazo)
+    estat.conexao.append(time.perf_counter() - inicio)
+    estat.sessoes += 1
+    try:
+        codec_pedido = random.choice(sorted(CODECS)) if config.codec == 'misto' else config.codec
+        payload = {"nome": nome}
+        if codec_pedido != CODEC_JSON.nome:
+            payload["codec"] = codec_pedido
+        codec = CODEC_JSON
+        writer.write(codec.codificar('CON', payload))
+
+        estrategia = ESTRATEGIAS[config.estrategia]
+        abandono = None
+        if random.random() < config.churn:
+            abandono = time.perf_counter() + random.uniform(0, config.janela_churn)
+        leitor = LeitorQuadros()
+        rodada, ultima_oponente = 0, None
+        t_pla = t_jogada = None
+        terminou = False
+        while not terminou:
+            prazo = config.prazo
+            if abandono is not None:
+                prazo = abandono - time.perf_counter()
+                if prazo <= 0:
+                    estat.abandonos += 1
+                    writer.transport.abort()
+                    return
+            try:
+                mensagens = await _proximas(reader, leitor, prazo)
+            except asyncio.TimeoutError:
+                if abandono is not None:
+                    continue  # Hora de abandonar
+                raise
+            for comando, payload in mensagens:
+                agora = time.perf_counter()
+                if comando == 'COD':
+                    codec = CODECS.get(payload.get('codec'), CODEC_JSON)
+                elif comando == 'MAT':
+                    rodada, ultima_oponente = 0, None
+                elif comando == 'PLA':
+                    rodada += 1
+                    t_pla = agora
+                    if config.pensar_max > 0:
+                        await asyncio.sleep(random.uniform(config.pensar_min, config.pensar_max))
+                    writer.write(codec.codificar(estrategia(rodada, ultima_oponente)))
+                    t_jogada = time.perf_counter()
+                elif comando in RESULTADOS:
+                    if t_pla is not None:
+                        estat.pla_resultado.append(agora - t_pla)
+                        estat.jogada_resultado.append(agora - t_jogada)
+                    t_pla = t_jogada = None
+                    estat.rodadas += 1
+                    ultima_oponente = str(payload.get('jogada_oponente', '')).upper()
+                    if ultima_oponente == 'TIMEOUT':
+                        estat.timeouts += 1
+                elif comando == 'END':
+                    estat.fins += 1
+                    terminou = True
+                elif comando != 'RAN':
+                    raise ErroProtocolo(f"comando inesperado '{comando}'")
+
+        if random.random() < config.ranking:
+            inicio = time.perf_counter()
+            writer.write(codec.codificar('RAN', {"nome": nome, "limit": 10}))
+            while not any(comando == 'RAN' for comando, _ in await _proximas(reader, leitor, config.prazo)):
+                pass
+            estat.ranking.append(time.perf_counter() - inicio)
+        writer.write(codec.codificar('QUI'))
+        await writer.drain()
+    finally:
+        writer.close()
+
+
+async def bot(indice, config, estat, parar):
+    """
+    Roda sessões seguidas até `parar` ser sinalizado, contando os erros por
+    tipo. Com várias portas (servidores ligados a um ser_broker), cada bot
+    usa sempre a mesma, em rodízio pelo índice.
+    """
+    porta = config.porta[indice % len(config.porta)]
+    await asyncio.sleep(config.rampa * indice / config.bots)  # Espalha as conexões iniciais
+    numero = 0
+    while not parar.is_set():
+        numero += 1
+        try:
+            await sessao(f"{config.prefixo}{indice}-{numero}", porta, config, estat)
+        except asyncio.TimeoutError:
+            estat.erro('prazo')
+        except ConnectionRefusedError:
+            estat.erro('recusada')
+        except ConnectionResetError:
+            estat.erro('reset')
+        except ErroProtocolo:
+            estat.erro('protocolo')
+        except OSError as e:
+            estat.erro(type(e).__name__)
+        else:
+            continue
+        await asyncio.sleep(random.uniform(0.05, 0.5))  # Recua um pouco antes de reconectar
+
+
+async def mostrar_progresso(estat, intervalo):
+    fins_anteriores = 0
+    while True:
+        await asyncio.sleep(intervalo)
+        partidas = (estat.fins - fins_anteriores) / 2
+        fins_anteriores = estat.fins
+        print(f"[{time.perf_counter() - estat.inicio:6.1f}s] partidas/s={partidas / intervalo:8.1f} "
+              f"sessões={estat.sessoes} erros={sum(estat.erros.values())} abandonos={estat.abandonos}", flush=True)
+
+
+async def executar(config):
+    estat = Estatisticas()
+    parar = asyncio.Event()
+    tarefas = [asyncio.create_task(bot(i, config, estat, parar)) for i in range(config.bots)]
+    progresso = asyncio.create_task(mostrar_progresso(estat, config.intervalo)) if config.intervalo > 0 else None
+    await asyncio.sleep(config.duracao)
+    parar.set()
+    # Sessões em andamento são interrompidas: não contam como erro
+    for tarefa in tarefas + [progresso]:
+        if tarefa:
+            tarefa.cancel()
+    await asyncio.gather(*tarefas, return_exceptions=True)
+    return estat.relatorio()
+
+
+def imprimir_relatorio(relatorio):
+    print("=" * 60)
+    print(f"Duração: {relatorio['duracao']:.1f} s   sessões: {relatorio['sessoes']}   "
+          f"rodadas: {relatorio['rodadas']}   timeouts: {relatorio['timeouts']}")
+    print(f"Partidas: {relatorio['partidas']:.0f} ({relatorio['partidas_por_segundo']:.2f}/s)   "
+          f"abandonos: {relatorio['abandonos']}")
+    print(f"Erros: {relatorio['erros'] or 'nenhum'}")
+    for nome, valores in relatorio['latencia_ms'].items():
+        if valores:
+            print(f"  {nome:<17} " + "  ".join(f"{chave}={valor:.2f}ms" for chave, valor in valores.items()))
+    print("=" * 60)
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Gerador de carga para o ser_server: N bots jogando pelo protocolo real.")
+    parser.add_argument('--host', default=HOST)
+    parser.add_argument('--porta', type=int, nargs='+', default=[PORT],
+                        help="uma ou mais portas; os bots são distribuídos entre elas")
+    parser.add_argument('--bots', type=int, default=100, help="conexões simultâneas")
+    parser.add_argument('--duracao', type=float, default=30.0, help="segundos de teste")
+    parser.add_argument('--rampa', type=float, default=1.0,
+                        help="segundos para abrir as conexões iniciais (espalhadas uniformemente)")
+    parser.add_argument('--estrategia', choices=sorted(ESTRATEGIAS), default='aleatoria')
+    parser.add_argument('--pensar-min', type=float, default=0.0, help="tempo mínimo (s) antes de responder um PLA")
+    parser.add_argument('--pensar-max', type=float, default=0.0, help="tempo máximo (s) antes de responder um PLA")
+    parser.add_argument('--churn', type=float, default=0.0,
+                        help="probabilidade de uma sessão ser abandonada sem QUI")
+    parser.add_argument('--janela-churn', type=float, default=5.0,
+                        help="o abandono acontece em um instante aleatório nos primeiros N segundos da sessão")
+    parser.add_argument('--ranking', type=float, default=0.5, help="probabilidade de pedir RAN ao fim da partida")
+    parser.add_argument('--codec', choices=sorted(CODECS) + ['misto'], default=CODEC_JSON.nome)
+    parser.add_argument('--prazo', type=float, default=30.0,
+                        help="segundos sem receber nada do servidor até a sessão contar como erro")
+    parser.add_argument('--prefixo', default='bot', help="prefixo dos nomes dos bots")
+    parser.add_argument('--intervalo', type=float, default=5.0,
+                        help="segundos entre linhas de progresso (0 desliga)")
+    parser.add_argument('--json', default=None, help="grava o relatório final neste arquivo JSON")
+    args = parser.parse_args(argv)
+    if args.pensar_max < args.pensar_min:
+        parser.error("--pensar-max deve ser maior ou igual a --pensar-min")
+    return args
+
+
+def main(argv=None):
+    config = ler_argumentos(argv)
+    elevar_limite_descritores()
+    print(f"[*] {config.bots} bots contra {config.host}:{','.join(map(str, config.porta))} por {config.duracao:.0f} s "
+          f"(estratégia '{config.estrategia}', codec '{config.codec}').")
+    try:
+        relatorio = asyncio.run(executar(config))
+    except KeyboardInterrupt:
+        sys.exit(1)
+    imprimir_relatorio(relatorio)
+    if config.json:
+        with open(config.json, 'w', encoding='utf-8') as arquivo:
+            json.dump(relatorio, arquivo, indent=2)
+
+
+if __name__ == "__main__":
+    main()
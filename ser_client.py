@@ -4,12 +4,15 @@ import socket
 import threading
 import sys
 import os
-import json # Importar a biblioteca json
+import argparse
+from ser_protocolo import LeitorQuadros, CODECS, CODEC_JSON
 #aaa
 # --- Configurações do Cliente ---
 HOST = '127.0.0.1'
 PORT = 12345
 nome_jogador = ""
+codec_atual = CODEC_JSON  # Passa a ser o codec negociado quando o servidor responde COD
+RANKING_POR_PAGINA = 10
 
 # Mapeamento de jogadas do usuário para comandos do protocolo
 JOGADAS_MAP = {
@@ -28,17 +31,12 @@ COMANDOS_MAP = {
 
 def enviar_comando(client_socket, comando_type, payload_data={}):
     """
-    Envia uma mensagem JSON para o servidor.
+    Envia uma mensagem para o servidor no codec atual (JSON até o COD).
     comando_type: string (ex: 'CON', 'ROC', 'RAN')
     payload_data: dict (dados a serem incluídos no payload)
     """
     try:
-        mensagem_json = {
-            "type": comando_type.upper(),
-            "payload": payload_data
-        }
-        mensagem = json.dumps(mensagem_json) + '\n'  # Adiciona a quebra de linha no final
-        client_socket.sendall(mensagem.encode('utf-8'))
+        client_socket.sendall(codec_atual.codificar(comando_type, payload_data))
     except (BrokenPipeError, ConnectionResetError):
         print(f"[ERRO] Conexão com o servidor foi perdida ao tentar enviar comando '{comando_type}'.")
         os._exit(1) # Força a saída em caso de erro crítico
@@ -48,29 +46,25 @@ def enviar_comando(client_socket, comando_type, payload_data={}):
 
 def escutar_servidor(client_socket):
     """Thread que escuta comandos do servidor e os exibe."""
-    buffer = ""
+    global codec_atual
+    leitor = LeitorQuadros()  # Aceita linhas JSON e quadros binários
     while True:
         try:
-            dados = client_socket.recv(4096).decode('utf-8')
-            if not dados:
+            mensagens = leitor.receber(client_socket)
+            if mensagens is None:
                 print("\n[INFO] Desconectado do servidor.")
                 break
 
-            buffer += dados
-            while '\n' in buffer:
-                linha, buffer = buffer.split('\n', 1)
-                linha = linha.strip()
-                if not linha:
-                    continue
-
-                try:
-                    mensagem_json = json.loads(linha)
-                    comando = mensagem_json.get('type', '').upper()
-                    payload = mensagem_json.get('payload', {})
-                except json.JSONDecodeError:
-                    print(f"\n[ERRO] Mensagem JSON inválida recebida do servidor: {linha}")
+            for comando, payload in mensagens:
+                if comando is None:
+                    print(f"\n[ERRO] Mensagem JSON inválida recebida do servidor: {payload}")
                     continue # Ignora a mensagem inválida e continua
 
+                if comando == 'COD':
+                    # O servidor confirmou o codec pedido no CON
+                    codec_atual = CODECS.get(payload.get('codec'), CODEC_JSON)
+                    continue
+
                 print()  # Linha em branco para formatação
 
                 if comando == 'MAT':
@@ -96,12 +90,16 @@ def escutar_servidor(client_socket):
                     if not ranking_data:
                         print("Ainda não há vencedores.")
                     else:
-                        # Garante que a lista de ranking seja classificada por vitórias
-                        ranking_data.sort(key=lambda x: x.get('vitorias', 0), reverse=True)
-                        for item in ranking_data:
+                        # O servidor já envia a página ordenada por vitórias
+                        offset = payload.get('offset', 0)
+                        for i, item in enumerate(ranking_data, offset + 1):
                             nome = item.get('nome', 'Desconhecido')
                             vitorias = item.get('vitorias', 0)
-                            print(f"- {nome}: {vitorias} vitórias")
+                            print(f"{i}. {nome}: {vitorias} vitórias")
+                        print(f"({payload.get('total', len(ranking_data))} jogadores no ranking)")
+                    posicao = payload.get('posicao')
+                    if posicao and posicao.get('posicao'):
+                        print(f"Sua posição: {posicao['posicao']}º com {posicao.get('vitorias', 0)} vitórias")
                     print("-----------------------------")
                 elif comando == 'END':
                     mensagem_final = payload.get('mensagem', 'Partida finalizada.').strip()
@@ -114,7 +112,7 @@ def escutar_servidor(client_socket):
                 # Reimprime o prompt do usuário
                 print(f"{nome_jogador}> ", end="", flush=True)
 
-        except (ConnectionResetError, IndexError) as e:
+        except (ConnectionResetError, IndexError, ValueError) as e:
             print(f"\n[ERRO] Conexão perdida ou dados inválidos do servidor: {e}")
             break
         except Exception as e:
@@ -128,6 +126,11 @@ def main():
     global nome_jogador
     global HOST
 
+    parser = argparse.ArgumentParser(description="Cliente de terminal do Pedra, Papel e Tesoura.")
+    parser.add_argument('--codec', choices=sorted(CODECS), default=CODEC_JSON.nome,
+                        help="formato pedido ao servidor no CON (json ou bin)")
+    args = parser.parse_args()
+
     server_ip_input = input("Digite o IP do servidor (ou pressione Enter para '127.0.0.1'): ")
     if server_ip_input:
         HOST = server_ip_input
@@ -146,7 +149,10 @@ def main():
         sys.exit(1)
 
     # 1. Enviar comando de conexão (CON com payload de nome)
-    enviar_comando(client_socket, 'CON', {"nome": nome_jogador})
+    con_payload = {"nome": nome_jogador}
+    if args.codec != CODEC_JSON.nome:
+        con_payload["codec"] = args.codec
+    enviar_comando(client_socket, 'CON', con_payload)
 
     # 2. Iniciar thread para escutar o servidor
     thread_escuta = threading.Thread(target=escutar_servidor, args=(client_socket,), daemon=True)
@@ -154,7 +160,7 @@ def main():
 
     # 3. Loop principal para enviar comandos
     print("\nBem-vindo ao Pedra, Papel e Tesoura!")
-    print("Comandos: 'rock', 'paper', 'scissors', 'ran' (ranking), ou 'quit'.")
+    print("Comandos: 'rock', 'paper', 'scissors', 'ran [página]' (ranking), ou 'quit'.")
     print("Aguardando partida...")
 
     while thread_escuta.is_alive():
@@ -164,8 +170,12 @@ def main():
             if comando_usuario in JOGADAS_MAP:
                 comando_protocolo = JOGADAS_MAP[comando_usuario]
                 enviar_comando(client_socket, comando_protocolo, {}) # Jogadas tem payload vazio
-            elif comando_usuario == 'ran':
-                enviar_comando(client_socket, 'RAN', {}) # RAN tem payload vazio
+            elif comando_usuario.split()[:1] == ['ran']:
+                # 'ran' mostra o topo do ranking; 'ran <página>' mostra as páginas seguintes
+                partes = comando_usuario.split()
+                pagina = int(partes[1]) if len(partes) > 1 and partes[1].isdigit() else 1
+                enviar_comando(client_socket, 'RAN', {"nome": nome_jogador, "limit": RANKING_POR_PAGINA,
+                                                      "offset": (max(pagina, 1) - 1) * RANKING_POR_PAGINA})
             elif comando_usuario == 'quit':
                 enviar_comando(client_socket, 'QUI', {}) # QUI tem payload vazio
                 break
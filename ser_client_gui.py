@@ -5,45 +5,80 @@ from tkinter import messagebox, scrolledtext
 import socket
 import threading
 import queue
+import time
+from ser_protocolo import LeitorQuadros, CODECS, CODEC_JSON, CODEC_BINARIO
 
 
-# --- Classe de Rede (sem alterações necessárias) ---
+EVENTO_MENSAGEM = '<<MensagemServidor>>'  # Gerado pela thread de rede quando a fila deixa de estar vazia
+ORCAMENTO_LOTE = 0.02  # Segundos de mensagens tratadas por vez, antes de devolver o controle ao Tk
+MAX_LINHAS_LOG = 500  # Linhas mantidas no log do jogo; as mais antigas são descartadas
+
+
+# --- Classe de Rede ---
 class NetworkClient:
-    def __init__(self):
+    """
+    Fala o protocolo do ser_server (JSON ou binário negociado no CON).
+    As mensagens recebidas entram na fila como tuplas (comando, payload),
+    e `notify` (se definido) é chamado quando a fila deixa de estar vazia.
+    """
+
+    def __init__(self, notify=None):
         self.client_socket = None
+        self.codec = CODEC_JSON
+        self.name = ""
         self.message_queue = queue.Queue()
-
-    def connect(self, host, port, name):
+        self.notify = notify
+        self.notified = False  # Já há um aviso pendente; a interface desliga antes de esvaziar a fila
+
+    def _deliver(self, messages):
+        for message in messages:
+            self.message_queue.put(message)
+        # Um aviso por rajada, não um por mensagem: o Tk esvazia a fila inteira a cada aviso
+        if self.notify and not self.notified:
+            self.notified = True
+            self.notify()
+
+    def connect(self, host, port, name, codec_name=CODEC_JSON.nome):
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
             self.client_socket.connect((host, port))
-            self.send_command(f"CON {name}")
+            self.name = name
+            payload = {"nome": name}
+            if codec_name != CODEC_JSON.nome:
+                payload["codec"] = codec_name  # Só passa a valer quando o servidor responder COD
+            self.send_command("CON", payload)
             self.start_listening()
             return True
         except Exception as e:
             messagebox.showerror("Erro de Conexão", f"Não foi possível conectar ao servidor: {e}")
             return False
 
-    def send_command(self, command):
+    def send_command(self, command, payload=None):
         if self.client_socket:
             try:
-                self.client_socket.sendall(f"{command}\n".encode('utf-8'))
-            except (BrokenPipeError, ConnectionResetError):
-                self.message_queue.put(('ERROR', 'Conexão com o servidor perdida.'))
+                self.client_socket.sendall(self.codec.codificar(command, payload))
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                self._deliver([('ERROR', 'Conexão com o servidor perdida.')])
 
     def _listen_for_server_messages(self):
-        buffer = ""
+        reader = LeitorQuadros()
         while self.client_socket:
             try:
-                data = self.client_socket.recv(4096).decode('utf-8')
-                if not data: break
-                buffer += data
-                while '\n' in buffer:
-                    line, buffer = buffer.split('\n', 1)
-                    if line: self.message_queue.put(line.strip())
-            except (ConnectionResetError, OSError):
+                messages = reader.receber(self.client_socket)
+                if messages is None: break
+                received = []
+                for command, payload in messages:
+                    if command is None:
+                        continue  # Linha JSON inválida
+                    if command == 'COD':
+                        self.codec = CODECS.get(payload.get('codec'), CODEC_JSON)
+                        continue
+                    received.append((command, payload))
+                if received:
+                    self._deliver(received)
+            except (ConnectionResetError, OSError, ValueError):
                 break
-        self.message_queue.put(('ERROR', 'Desconectado do servidor.'))
+        self._deliver([('ERROR', 'Desconectado do servidor.')])
         self.client_socket = None
 
     def start_listening(self):
@@ -57,6 +92,14 @@ class NetworkClient:
             self.client_socket = None
 
 
+MOVE_NAMES = {"roc": "Pedra", "pap": "Papel", "sci": "Tesoura", "timeout": "Tempo Esgotado"}
+
+
+def move_name(payload):
+    move = payload.get('jogada_oponente', 'TIMEOUT').lower()
+    return MOVE_NAMES.get(move, move)
+
+
 # --- Classe principal da Aplicação GUI ---
 class App(tk.Tk):
     def __init__(self, *args, **kwargs):
@@ -64,7 +107,8 @@ class App(tk.Tk):
         self.title("Pedra, Papel e Tesoura (Protocolo Final)")
         self.geometry("400x500")
 
-        self.network_client = NetworkClient()
+        self.network_client = NetworkClient(notify=self.notify_messages)
+        self.bind(EVENTO_MENSAGEM, self.process_queue)
         container = tk.Frame(self)
         container.pack(side="top", fill="both", expand=True)
         container.grid_rowconfigure(0, weight=1)
@@ -77,56 +121,74 @@ class App(tk.Tk):
             frame.grid(row=0, column=0, sticky="nsew")
 
         self.show_frame("ConnectScreen")
-        self.process_queue()
 
     def show_frame(self, page_name):
         frame = self.frames[page_name]
         frame.tkraise()
 
     def request_ranking(self):
-        """Envia o comando RAN para o servidor."""
-        self.network_client.send_command("RAN")
+        """Envia o comando RAN para o servidor, pedindo também a posição do jogador."""
+        self.network_client.send_command("RAN", {"nome": self.network_client.name, "limit": 20})
         self.show_frame("RankingScreen")
 
-    def process_queue(self):
+    def notify_messages(self):
+        """
+        Chamado pela thread de rede: acorda o mainloop com um evento virtual
+        (event_generate é a única chamada do Tk feita fora da thread principal).
+        """
         try:
-            message = self.network_client.message_queue.get_nowait()
-
-            if isinstance(message, tuple) and message[0] == 'ERROR':
-                messagebox.showerror("Erro", message[1])
-                self.on_closing(force=True)
+            self.event_generate(EVENTO_MENSAGEM, when='tail')
+        except (tk.TclError, RuntimeError):
+            pass  # Janela já destruída
+
+    def process_queue(self, event=None):
+        """
+        Trata todas as mensagens pendentes, até ORCAMENTO_LOTE segundos por
+        vez. Se sobrar mensagem, continua na próxima volta do mainloop, para
+        a janela continuar respondendo durante uma rajada. Sem mensagens,
+        não há nada agendado: só o próximo aviso da thread de rede acorda o Tk.
+        """
+        self.network_client.notified = False  # Antes de esvaziar: o que chegar depois gera outro aviso
+        limit = time.monotonic() + ORCAMENTO_LOTE
+        while time.monotonic() < limit:
+            try:
+                command, payload = self.network_client.message_queue.get_nowait()
+            except queue.Empty:
+                return
+            if not self.handle_message(command, payload):
                 return
+        self.after(1, self.process_queue)
 
-            parts = message.split(' ', 1)
-            command = parts[0].upper()
-            payload = parts[1] if len(parts) > 1 else ""
-
-            game_frame = self.frames["GameScreen"]
-            ranking_frame = self.frames["RankingScreen"]
-
-            if command == 'MAT':
-                game_frame.add_message(f"🔥 Partida encontrada contra: {payload}")
-            elif command == 'PLA':
-                game_frame.add_message("Sua vez! Faça sua jogada.")
-                game_frame.toggle_move_buttons(tk.NORMAL)
-            elif command == 'WIN':
-                game_frame.add_message("✅ Você venceu esta rodada!")
-            elif command == 'LOS':
-                game_frame.add_message("❌ Você perdeu esta rodada.")
-            elif command == 'TIE':
-                game_frame.add_message("🤝 A rodada terminou em empate.")
-            elif command == 'RAN':
-                ranking_frame.update_ranking(payload)
-                game_frame.add_message("[INFO] Ranking recebido.")
-            elif command == 'END':
-                game_frame.add_message(f"--- FIM DE JOGO ---")
-                messagebox.showinfo("Fim da Partida", payload)
-                self.on_closing(force=True)
-
-        except queue.Empty:
-            pass
-        finally:
-            self.after(100, self.process_queue)
+    def handle_message(self, command, payload):
+        """Aplica uma mensagem do servidor na interface; retorna False se a janela foi fechada."""
+        if command == 'ERROR':
+            messagebox.showerror("Erro", payload)
+            self.on_closing(force=True)
+            return False
+
+        game_frame = self.frames["GameScreen"]
+        ranking_frame = self.frames["RankingScreen"]
+
+        if command == 'MAT':
+            game_frame.add_message(f"🔥 Partida encontrada contra: {payload.get('oponente', 'Desconhecido')}")
+        elif command == 'PLA':
+            game_frame.add_message("Sua vez! Faça sua jogada.")
+            game_frame.toggle_move_buttons(tk.NORMAL)
+        elif command == 'WIN':
+            game_frame.add_message(f"✅ Você venceu esta rodada! Oponente: {move_name(payload)}")
+        elif command == 'LOS':
+            game_frame.add_message(f"❌ Você perdeu esta rodada. Oponente: {move_name(payload)}")
+        elif command == 'TIE':
+            game_frame.add_message(f"🤝 A rodada terminou em empate. Oponente: {move_name(payload)}")
+        elif command == 'RAN':
+            ranking_frame.update_ranking(payload)
+            game_frame.add_message("[INFO] Ranking recebido.")
+        elif command == 'END':
+            game_frame.add_message(f"--- FIM DE JOGO ---")
+            messagebox.showinfo("Fim da Partida", payload.get('mensagem', 'Partida finalizada.'))
+            self.on_closing(force=True)
+            return False
+        return True
 
     def on_closing(self, force=False):
         if force or messagebox.askokcancel("Sair", "Você tem certeza que quer sair?"):
@@ -147,6 +209,8 @@ class ConnectScreen(tk.Frame):
         tk.Label(self, text="Seu Nome:").pack(pady=(10, 0))
         self.name_entry = tk.Entry(self, width=30);
         self.name_entry.pack()
+        self.binary_var = tk.BooleanVar(value=False)
+        tk.Checkbutton(self, text="Protocolo binário", variable=self.binary_var).pack(pady=(10, 0))
         self.connect_button = tk.Button(self, text="Conectar", command=self.handle_connect);
         self.connect_button.pack(pady=20)
 
@@ -155,7 +219,8 @@ class ConnectScreen(tk.Frame):
         if not ip or not name:
             messagebox.showwarning("Campos Vazios", "Por favor, preencha o IP e o seu nome.")
             return
-        if self.controller.network_client.connect(ip, 12345, name):
+        codec_name = CODEC_BINARIO.nome if self.binary_var.get() else CODEC_JSON.nome
+        if self.controller.network_client.connect(ip, 12345, name, codec_name):
             self.controller.show_frame("GameScreen")
             self.controller.frames["GameScreen"].add_message(f"Bem-vindo, {name}! Aguardando partida...")
 
@@ -193,6 +258,10 @@ class GameScreen(tk.Frame):
     def add_message(self, message):
         self.log_text.config(state='normal');
         self.log_text.insert(tk.END, message + "\n");
+        # Anel de MAX_LINHAS_LOG linhas: o widget não cresce durante sessões longas
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 1 - MAX_LINHAS_LOG
+        if excess > 0:
+            self.log_text.delete('1.0', f'{excess + 1}.0')
         self.log_text.config(state='disabled');
         self.log_text.see(tk.END)
 
@@ -214,15 +283,20 @@ class RankingScreen(tk.Frame):
 
     def update_ranking(self, payload):
         self.ranking_listbox.delete(0, tk.END)
-        if not payload:
+        lista_ranking = payload.get('ranking', [])
+        if not lista_ranking:
             self.ranking_listbox.insert(tk.END, "  Ranking vazio.")
             return
         try:
-            lista_ranking = [item.split(':') for item in payload.split(',')]
-            lista_ranking.sort(key=lambda x: int(x[1]), reverse=True)
-            for i, (nome, vitorias) in enumerate(lista_ranking, 1):
+            # O servidor já envia a página ordenada por vitórias
+            for i, item in enumerate(lista_ranking, payload.get('offset', 0) + 1):
+                nome, vitorias = item['nome'], int(item['vitorias'])
                 self.ranking_listbox.insert(tk.END, f" {i:>2}. {nome:<20} {vitorias:>3} vitórias")
-        except (ValueError, IndexError):
+            posicao = payload.get('posicao')
+            if posicao and posicao.get('posicao'):
+                self.ranking_listbox.insert(tk.END, "")
+                self.ranking_listbox.insert(tk.END, f" Você: {posicao['posicao']}º com {posicao.get('vitorias', 0)} vitórias")
+        except (ValueError, KeyError, TypeError):
             self.ranking_listbox.insert(tk.END, "  Erro ao carregar ranking.")
 
 
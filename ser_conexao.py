@@ -0,0 +1,408 @@
+# ser_conexao.py (Conexões do servidor com fila de saída)
+
+import selectors
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from ser_metricas import Contador
+from ser_protocolo import CODEC_JSON
+
+LIMITE_SAIDA_PADRAO = 256 * 1024  # Bytes pendentes a partir dos quais o cliente é considerado lento
+TEMPO_DRENAGEM = 2.0  # Segundos que close() espera a fila de saída esvaziar
+
+BYTES_RECEBIDOS = Contador('ser_bytes_recebidos_total', "Bytes recebidos dos clientes.")
+BYTES_ENVIADOS = Contador('ser_bytes_enviados_total', "Bytes escritos nos sockets dos clientes.")
+FALHAS_ENVIO = Contador('ser_falhas_envio_total',
+                        "Envios que falharam (conexão perdida ou cliente lento desconectado).")
+
+
+class ClienteLento(BrokenPipeError):
+    """O cliente acumulou mais bytes pendentes que o limite e foi desconectado."""
+
+
+def configurar_keepalive(sock, ocioso, intervalo=None, tentativas=3):
+    """
+    Liga o keepalive do TCP: depois de `ocioso` segundos sem tráfego, o
+    kernel sonda o cliente e derruba a conexão se ele não responder, o que
+    libera a leitura bloqueada (ou o read do asyncio) de um cliente morto.
+    """
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Opções por plataforma: onde não existirem, valem os padrões do sistema
+        for opcao, valor in (('TCP_KEEPIDLE', ocioso), ('TCP_KEEPINTVL', intervalo or max(1, ocioso // 3)),
+                             ('TCP_KEEPCNT', tentativas)):
+            if hasattr(socket, opcao):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, opcao), max(1, int(valor)))
+    except OSError:
+        pass
+
+
+def configurar_nodelay(sock, ativo):
+    """Liga/desliga o algoritmo de Nagle (TCP_NODELAY) de um socket aceito."""
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 if ativo else 0)
+    except OSError:
+        pass
+
+
+@contextmanager
+def agrupar(*conexoes):
+    """
+    Segura os quadros enviados às conexões dentro do bloco e os entrega
+    ao sair, em uma única escrita por conexão (ex.: resultado + END).
+    O bloco não deve esperar nada (rede, sleep): tudo o que for enviado
+    a essas conexões por outras threads também fica retido até o fim dele.
+    """
+    for conn in conexoes:
+        conn.adiar()
+    try:
+        yield
+    finally:
+        for conn in conexoes:
+            conn.descarregar()
+
+
+# Com MSG_DONTWAIT, um send pode ser tentado no socket bloqueante do cliente
+# sem esperar a janela TCP (a thread de leitura continua usando o modo
+# bloqueante). Sem ele (Windows), a escritora só escreve depois que o
+# selector indicar espaço, e em fatias pequenas.
+_ENVIO_SEM_ESPERA = getattr(socket, 'MSG_DONTWAIT', 0)
+FATIA_SEM_DONTWAIT = 4096
+
+
+class EscritoraSaida:
+    """
+    Thread única que escreve nos sockets de todas as ConexaoSaida do
+    processo, em vez de uma thread escritora por conexão.
+
+    sendall() de uma conexão enfileira os bytes e, se ela ainda não está
+    agendada, a coloca na lista de prontas e acorda a escritora (por um
+    socketpair vigiado pelo mesmo selector). A escritora junta a fila da
+    conexão em um único send sem bloqueio: o que o kernel não aceitou volta
+    para o começo da fila, e o socket passa a ser vigiado pelo selector
+    (EVENT_WRITE) até caber mais. Assim, um cliente com a janela TCP cheia
+    nunca segura a escrita dos outros.
+
+    Os sockets só são fechados por esta thread (ver fechar), para nenhum
+    descritor fechado ficar registrado no selector e ser reaproveitado por
+    uma conexão nova.
+    """
+
+    def __init__(self):
+        self.seletor = selectors.DefaultSelector()
+        self.prontas = deque()  # Conexões com bytes novos (ou a fechar) desde a última volta
+        self.trava = threading.Lock()
+        self.acordada = False  # Já há um byte no despertador ainda não lido
+        self.despertador, self.campainha = socket.socketpair()
+        self.despertador.setblocking(False)
+        self.seletor.register(self.despertador, selectors.EVENT_READ)
+        self.thread = threading.Thread(target=self._executar, name='saida', daemon=True)
+        self.thread.start()
+
+    def agendar(self, conn):
+        """Pede uma volta da escritora para a conexão (chamado com a condição da conexão adquirida)."""
+        with self.trava:
+            self.prontas.append(conn)
+            if self.acordada:
+                return
+            self.acordada = True
+        try:
+            self.campainha.send(b'\0')
+        except OSError:
+            pass
+
+    def _executar(self):
+        while True:
+            for chave, _ in self.seletor.select():
+                if chave.fileobj is self.despertador:
+                    try:
+                        while self.despertador.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    self._atender(chave.data, pronta=True)
+            with self.trava:
+                prontas, self.prontas = self.prontas, deque()
+                self.acordada = False
+            for conn in prontas:
+                self._atender(conn, pronta=False)
+
+    def _atender(self, conn, pronta):
+        if conn.fechada and not conn.fila:
+            self._fechar(conn)
+            return
+        if conn.vigiada and not pronta:
+            return  # Já espera espaço no socket; o selector a devolve quando houver
+        if not _ENVIO_SEM_ESPERA and not pronta:
+            self._vigiar(conn)
+            return
+        with conn.condicao:
+            if conn.agrupando and not conn.fechada:
+                conn.agendada = False  # descarregar() agenda de novo ao fim do bloco
+                if conn.vigiada:
+                    self._parar_de_vigiar(conn)
+                return
+            # Coalescência: tudo o que está na fila vai em uma única escrita
+            dados = conn.fila.popleft() if len(conn.fila) == 1 else b''.join(conn.fila)
+            conn.fila.clear()
+        if not _ENVIO_SEM_ESPERA:
+            dados, resto = dados[:FATIA_SEM_DONTWAIT], dados[FATIA_SEM_DONTWAIT:]
+        else:
+            resto = b''
+        try:
+            conn.escritas += 1
+            enviados = conn.sock.send(dados, _ENVIO_SEM_ESPERA)
+        except (BlockingIOError, InterruptedError):
+            enviados = 0
+        except OSError:
+            FALHAS_ENVIO.incrementar()
+            with conn.condicao:
+                conn.fechada = True
+                conn.fila.clear()
+                conn.pendentes = 0
+                conn.condicao.notify_all()
+            self._fechar(conn)
+            return
+        BYTES_ENVIADOS.incrementar(enviados)
+        with conn.condicao:
+            if conn.fechada:  # Expulsa ou abortada durante o send: o resto é descartado
+                conn.fila.clear()
+                conn.pendentes = 0
+                self._fechar(conn)
+                return
+            conn.pendentes -= enviados
+            resto = dados[enviados:] + resto
+            if resto:
+                conn.fila.appendleft(resto)
+            elif not conn.pendentes:
+                conn.condicao.notify_all()
+            if not conn.fila:
+                conn.agendada = False
+                if conn.vigiada:
+                    self._parar_de_vigiar(conn)
+                if conn.fechada:
+                    self._fechar(conn)
+                return
+        self._vigiar(conn)  # Sobrou (ou chegou) mais: escreve quando o socket tiver espaço
+
+    def _vigiar(self, conn):
+        if not conn.vigiada:
+            try:
+                self.seletor.register(conn.sock, selectors.EVENT_WRITE, conn)
+            except (ValueError, OSError):
+                return  # Socket já fechado
+            conn.vigiada = True
+
+    def _parar_de_vigiar(self, conn):
+        conn.vigiada = False
+        try:
+            self.seletor.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+
+    def _fechar(self, conn):
+        if conn.vigiada:
+            self._parar_de_vigiar(conn)
+        conn.sock.close()
+
+
+_escritora = None
+_trava_escritora = threading.Lock()
+
+
+def escritora_saida():
+    """A EscritoraSaida do processo, criada na primeira conexão (depois de um eventual fork)."""
+    global _escritora
+    with _trava_escritora:
+        if _escritora is None:
+            _escritora = EscritoraSaida()
+        return _escritora
+
+
+class ConexaoSaida:
+    """
+    Socket de cliente com fila de saída própria (motor de threads).
+
+    sendall() apenas enfileira os bytes e agenda a conexão na escritora
+    compartilhada (EscritoraSaida), então quem envia (partidas, broadcast)
+    nunca espera a janela TCP de um cliente, e cada cliente custa uma única
+    thread, a de leitura. Se os bytes pendentes passarem de `limite_bytes`,
+    o cliente é considerado lento e desconectado: o socket é fechado nos
+    dois sentidos, o que também encerra a thread de leitura dele.
+
+    A escritora junta tudo o que estiver na fila em um único send, então
+    quadros enfileirados enquanto ela escrevia saem na próxima volta, e
+    adiar()/descarregar() (ver agrupar) seguram a fila para formar um lote.
+    """
+
+    def __init__(self, sock, addr, limite_bytes=LIMITE_SAIDA_PADRAO):
+        self.sock = sock
+        self.addr = addr
+        self.limite_bytes = limite_bytes
+        self.codec = CODEC_JSON  # Formato das mensagens enviadas a este cliente
+        self.fila = deque()
+        self.pendentes = 0
+        self.fechada = False
+        self.agrupando = 0  # Blocos agrupar() abertos; a fila só é escrita quando zera
+        self.agendada = False  # Na lista de prontas da escritora ou vigiada por ela
+        self.vigiada = False  # Registrada no selector da escritora (só a escritora mexe)
+        self.escritas = 0  # Chamadas de send feitas no socket
+        self.ultima_atividade = time.monotonic()  # Último recebimento (ver prazo de ociosidade)
+        self.temporizador = None  # Prazo de identificação ou de ociosidade em andamento
+        self.condicao = threading.Condition()
+        self.escritora = escritora_saida()
+
+    def recv(self, tamanho):
+        if self.fechada:
+            return b''
+        return self.sock.recv(tamanho)
+
+    def recv_into(self, buffer):
+        # Depois de uma expulsão a escritora fecha o socket: a leitura termina como um fim de conexão
+        if self.fechada:
+            return 0
+        lidos = self.sock.recv_into(buffer)
+        BYTES_RECEBIDOS.incrementar(lidos)
+        self.ultima_atividade = time.monotonic()
+        return lidos
+
+    def sendall(self, dados):
+        with self.condicao:
+            if self.fechada:
+                raise BrokenPipeError("conexão encerrada")
+            if self.pendentes + len(dados) > self.limite_bytes:
+                self._expulsar()
+                raise ClienteLento(f"cliente {self.addr} excedeu {self.limite_bytes} bytes pendentes")
+            self.fila.append(dados)
+            self.pendentes += len(dados)
+            self._agendar()
+
+    def adiar(self):
+        with self.condicao:
+            self.agrupando += 1
+
+    def descarregar(self):
+        with self.condicao:
+            self.agrupando -= 1
+            if self.fila:
+                self._agendar()
+
+    def close(self):
+        """Encerra a conexão depois de drenar a fila (por até TEMPO_DRENAGEM segundos)."""
+        with self.condicao:
+            if self.fechada:
+                return
+            self.condicao.wait_for(lambda: not self.pendentes, timeout=TEMPO_DRENAGEM)
+            self.fechada = True
+            self.fila.clear()
+            self.pendentes = 0
+            self._encerrar_socket()
+
+    def abortar(self):
+        """Derruba a conexão sem drenar a fila de saída (cliente morto ou expirado)."""
+        with self.condicao:
+            if not self.fechada:
+                self._expulsar()
+
+    def _agendar(self):
+        # Chamado com a condição adquirida
+        if not self.agendada and not self.agrupando:
+            self.agendada = True
+            self.escritora.agendar(self)
+
+    def _expulsar(self):
+        # Chamado com a condição adquirida
+        self.fechada = True
+        self.fila.clear()
+        self.pendentes = 0
+        self.condicao.notify_all()
+        self._encerrar_socket()
+
+    def _encerrar_socket(self):
+        # Chamado com a condição adquirida. O shutdown já derruba a conexão e
+        # acorda a leitura; o close fica com a escritora (ver EscritoraSaida)
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.escritora.agendar(self)
+
+
+class ConexaoAsync:
+    """
+    Adapta um StreamWriter do asyncio à interface de socket usada pelo resto
+    do servidor (sendall/close), para que gerenciar_partida e
+    broadcast_comando funcionem sem saber qual motor está ativo.
+    As escritas são agendadas no loop, então podem vir de qualquer thread;
+    o buffer do transporte faz o papel da fila de saída, com o mesmo limite
+    de bytes pendentes antes de o cliente ser considerado lento.
+
+    Quadros enviados antes de o loop atender a escrita agendada (ou dentro
+    de um bloco agrupar) são juntados em um único write no transporte.
+    """
+
+    def __init__(self, writer, loop, limite_bytes=LIMITE_SAIDA_PADRAO):
+        self.writer = writer
+        self.loop = loop
+        self.limite_bytes = limite_bytes
+        self.codec = CODEC_JSON
+        self.fechada = False
+        self.fila = []  # Quadros ainda não entregues ao transporte
+        self.agrupando = 0
+        self.agendada = False  # Já há um _escrever agendado no loop
+        self.escritas = 0
+        self.ultima_atividade = time.monotonic()
+        self.temporizador = None
+        self.trava = threading.Lock()
+
+    def sendall(self, dados):
+        if self.fechada or self.writer.is_closing():
+            raise BrokenPipeError("conexão encerrada")
+        with self.trava:
+            self.fila.append(dados)
+            if self.agrupando or self.agendada:
+                return
+            self.agendada = True
+        self.loop.call_soon_threadsafe(self._escrever)
+
+    def adiar(self):
+        with self.trava:
+            self.agrupando += 1
+
+    def descarregar(self):
+        with self.trava:
+            self.agrupando -= 1
+            if self.agrupando or self.agendada or not self.fila:
+                return
+            self.agendada = True
+        self.loop.call_soon_threadsafe(self._escrever)
+
+    def _escrever(self):
+        with self.trava:
+            dados = b''.join(self.fila)
+            self.fila.clear()
+            self.agendada = False
+        if not dados or self.writer.is_closing():
+            return
+        if self.writer.transport.get_write_buffer_size() + len(dados) > self.limite_bytes:
+            print(f"AVISO: Cliente lento desconectado (mais de {self.limite_bytes} bytes pendentes).")
+            FALHAS_ENVIO.incrementar()
+            self.fechada = True
+            self.writer.transport.abort()
+            return
+        self.escritas += 1
+        BYTES_ENVIADOS.incrementar(len(dados))
+        self.writer.write(dados)
+
+    def abortar(self):
+        self.fechada = True
+        self.loop.call_soon_threadsafe(self.writer.transport.abort)
+
+    def close(self):
+        self.fechada = True
+        self.loop.call_soon_threadsafe(self._escrever)  # Entrega o que ainda estiver na fila
+        self.loop.call_soon_threadsafe(self.writer.close)
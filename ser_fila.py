@@ -0,0 +1,155 @@
+# ser_fila.py (Fila de pareamento do servidor)
+
+import time
+from collections import OrderedDict
+
+from ser_metricas import Histograma
+from ser_sync import TravaInstrumentada
+
+ESPERA_FILA = Histograma('ser_fila_espera_segundos', "Tempo entre entrar na fila e ser pareado.")
+
+
+class FilaPareamento:
+    """
+    Fila de jogadores aguardando partida, indexada pela conexão.
+
+    Entrar, cancelar e retirar um par custam O(1) no modo FIFO: cada faixa é
+    um OrderedDict (conexão -> entrada), que mantém a ordem de chegada e
+    permite remover qualquer jogador pela chave.
+
+    Com `avaliacao` (função nome -> vitórias), os jogadores são separados em
+    faixas de `largura_faixa` vitórias e só são pareados com a própria faixa.
+    A cada `espera_alargamento` segundos de espera, a janela aceita uma faixa
+    vizinha a mais de cada lado, para ninguém ficar preso na fila.
+
+    A fila tem sua própria trava, separada do resto do estado do servidor.
+    Com `aviso` (threading.Event), cada jogador que entra ou volta para a
+    fila liga o evento, para quem retira os pares não precisar consultá-la
+    periodicamente.
+    """
+
+    def __init__(self, avaliacao=None, largura_faixa=5, espera_alargamento=10.0, aviso=None):
+        self.avaliacao = avaliacao
+        self.largura_faixa = max(1, largura_faixa)
+        self.espera_alargamento = espera_alargamento
+        self.aviso = aviso
+        self.faixas = {}  # faixa -> OrderedDict(conexão -> (jogador_info, instante de entrada))
+        self.indice = {}  # conexão -> faixa
+        self.trava = TravaInstrumentada('fila')
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __contains__(self, jogador_info):
+        return jogador_info['socket'] in self.indice
+
+    def entrar(self, jogador_info):
+        # A avaliação (consulta ao ranking) é feita fora da trava da fila
+        faixa = self.avaliacao(jogador_info['nome']) // self.largura_faixa if self.avaliacao else 0
+        conn = jogador_info['socket']
+        with self.trava:
+            if conn in self.indice:
+                return
+            self.faixas.setdefault(faixa, OrderedDict())[conn] = (jogador_info, time.monotonic())
+            self.indice[conn] = faixa
+        if self.aviso:
+            self.aviso.set()
+
+    def cancelar(self, jogador_info):
+        """Remove o jogador da fila; retorna False se ele não estava nela."""
+        conn = jogador_info['socket']
+        with self.trava:
+            faixa = self.indice.pop(conn, None)
+            if faixa is None:
+                return False
+            self._remover_da_faixa(faixa, conn)
+            return True
+
+    def espera(self, jogador_info):
+        """Segundos que o jogador está aguardando, ou None se não está na fila."""
+        conn = jogador_info['socket']
+        with self.trava:
+            faixa = self.indice.get(conn)
+            if faixa is None:
+                return None
+            return time.monotonic() - self.faixas[faixa][conn][1]
+
+    def devolver(self, jogador_info, entrada):
+        """
+        Recoloca na frente da sua faixa um jogador retirado por
+        retirar_antigos, com o instante de entrada original (para a
+        janela de faixas continuar alargando a partir dele).
+        """
+        faixa = self.avaliacao(jogador_info['nome']) // self.largura_faixa if self.avaliacao else 0
+        conn = jogador_info['socket']
+        with self.trava:
+            if conn in self.indice:
+                return
+            fila = self.faixas.setdefault(faixa, OrderedDict())
+            fila[conn] = (jogador_info, entrada)
+            if entrada <= next(iter(fila.values()))[1]:
+                fila.move_to_end(conn, last=False)
+            self.indice[conn] = faixa
+        if self.aviso:
+            self.aviso.set()
+
+    def retirar_antigos(self, espera_minima, observar=True):
+        """
+        Retira e retorna os jogadores que aguardam há pelo menos `espera_minima`
+        segundos. Com observar=False, a espera deles não entra em ESPERA_FILA
+        (quem retira pode devolvê-los e a espera ainda não terminou).
+        """
+        limite = time.monotonic() - espera_minima
+        retirados = []
+        with self.trava:
+            for faixa in list(self.faixas):
+                # Cada faixa está em ordem de chegada: basta olhar o começo dela
+                while faixa in self.faixas and next(iter(self.faixas[faixa].values()))[1] <= limite:
+                    retirados.append(self._retirar_primeiro(faixa, observar))
+        return retirados
+
+    def retirar_par(self):
+        """Retira e retorna o próximo par (jogador1_info, jogador2_info), ou None."""
+        with self.trava:
+            return self._retirar_par()
+
+    def _retirar_par(self):
+        if len(self.indice) < 2:
+            return None
+        if not self.avaliacao:
+            return self._retirar_primeiro(0), self._retirar_primeiro(0)
+
+        # Prioriza a faixa cujo primeiro jogador está esperando há mais tempo
+        agora = time.monotonic()
+        cabecas = sorted((next(iter(fila.values()))[1], faixa) for faixa, fila in self.faixas.items())
+        for entrada, faixa in cabecas:
+            janela = int((agora - entrada) // self.espera_alargamento) if self.espera_alargamento else 0
+            janela = min(janela, max(self.faixas) - min(self.faixas))
+            parceira = self._faixa_parceira(faixa, janela)
+            if parceira is not None:
+                jogador1_info = self._retirar_primeiro(faixa)
+                return jogador1_info, self._retirar_primeiro(parceira)
+        return None
+
+    def _faixa_parceira(self, faixa, janela):
+        if len(self.faixas[faixa]) >= 2:
+            return faixa
+        for distancia in range(1, janela + 1):
+            for vizinha in (faixa - distancia, faixa + distancia):
+                if vizinha in self.faixas:
+                    return vizinha
+        return None
+
+    def _retirar_primeiro(self, faixa, observar=True):
+        conn, (jogador_info, entrada) = self.faixas[faixa].popitem(last=False)
+        if observar:
+            ESPERA_FILA.observar(time.monotonic() - entrada)
+        del self.indice[conn]
+        if not self.faixas[faixa]:
+            del self.faixas[faixa]
+        return jogador_info
+
+    def _remover_da_faixa(self, faixa, conn):
+        del self.faixas[faixa][conn]
+        if not self.faixas[faixa]:
+            del self.faixas[faixa]
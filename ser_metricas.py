@@ -0,0 +1,149 @@
+# ser_metricas.py (Métricas do servidor: contadores, medidores e histogramas)
+
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+HOST_METRICAS = '127.0.0.1'  # O endpoint só atende a própria máquina
+TIPO_CONTEUDO = 'text/plain; version=0.0.4; charset=utf-8'
+# Limites (em segundos) dos histogramas de latência: de 1 ms a 5 min
+LIMITES_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+# Todas as métricas criadas, na ordem de criação, para a exposição
+METRICAS = []
+_trava_registro = threading.Lock()
+
+
+def _registrar(metrica):
+    with _trava_registro:
+        if any(existente.nome == metrica.nome for existente in METRICAS):
+            raise ValueError(f"Métrica '{metrica.nome}' já registrada.")
+        METRICAS.append(metrica)
+
+
+def _formatar(valor):
+    if valor == float('inf'):
+        return '+Inf'
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    return repr(valor)
+
+
+class Contador:
+    """Valor que só cresce (conexões aceitas, bytes enviados, falhas...)."""
+    tipo = 'counter'
+
+    def __init__(self, nome, ajuda):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.valor = 0
+        self._trava = threading.Lock()
+        _registrar(self)
+
+    def incrementar(self, quantidade=1):
+        with self._trava:
+            self.valor += quantidade
+
+    def amostras(self):
+        return [(self.nome, self.valor)]
+
+
+class Medidor:
+    """
+    Valor que sobe e desce. Com `funcao`, o valor é lido dela no momento da
+    coleta (ex.: tamanho da fila), sem nenhum custo no caminho quente.
+    """
+    tipo = 'gauge'
+
+    def __init__(self, nome, ajuda, funcao=None):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.funcao = funcao
+        self.valor = 0
+        self._trava = threading.Lock()
+        _registrar(self)
+
+    def definir(self, valor):
+        self.valor = valor
+
+    def incrementar(self, quantidade=1):
+        with self._trava:
+            self.valor += quantidade
+
+    def decrementar(self, quantidade=1):
+        self.incrementar(-quantidade)
+
+    def amostras(self):
+        return [(self.nome, self.funcao() if self.funcao else self.valor)]
+
+
+class Histograma:
+    """
+    Distribuição em faixas fixas (`limites`, em ordem crescente). Observar
+    um valor custa uma busca binária e três somas; a exposição segue o
+    formato cumulativo (_bucket{le=...}, _sum e _count).
+    """
+    tipo = 'histogram'
+
+    def __init__(self, nome, ajuda, limites=LIMITES_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.limites = tuple(limites)
+        self.contagens = [0] * (len(self.limites) + 1)  # A última faixa é +Inf
+        self.soma = 0.0
+        self._trava = threading.Lock()
+        _registrar(self)
+
+    def observar(self, valor):
+        indice = bisect.bisect_left(self.limites, valor)
+        with self._trava:
+            self.contagens[indice] += 1
+            self.soma += valor
+
+    def amostras(self):
+        with self._trava:
+            contagens, soma = list(self.contagens), self.soma
+        linhas, acumulado = [], 0
+        for limite, contagem in zip(self.limites + (float('inf'),), contagens):
+            acumulado += contagem
+            linhas.append((f'{self.nome}_bucket{{le="{_formatar(limite)}"}}', acumulado))
+        linhas.append((f'{self.nome}_sum', soma))
+        linhas.append((f'{self.nome}_count', acumulado))
+        return linhas
+
+
+def exposicao():
+    """Todas as métricas no formato texto de exposição (# HELP/# TYPE e uma amostra por linha)."""
+    with _trava_registro:
+        metricas = list(METRICAS)
+    linhas = []
+    for metrica in metricas:
+        linhas.append(f"# HELP {metrica.nome} {metrica.ajuda}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        for nome, valor in metrica.amostras():
+            linhas.append(f"{nome} {_formatar(valor)}")
+    return '\n'.join(linhas) + '\n'
+
+
+class _TratadorMetricas(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        corpo = exposicao().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', TIPO_CONTEUDO)
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, formato, *args):
+        pass  # Coletas periódicas não devem poluir o console do servidor
+
+
+def iniciar_endpoint(porta, host=HOST_METRICAS):
+    """Serve /metrics em http://host:porta/ numa thread daemon; retorna o servidor HTTP."""
+    servidor = ThreadingHTTPServer((host, porta), _TratadorMetricas)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name='metricas', daemon=True).start()
+    return servidor
@@ -0,0 +1,243 @@
+# ser_perfil.py (Perfilamento sob demanda para o console do administrador)
+
+import asyncio
+import cProfile
+import collections
+import io
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+INTERVALO_AMOSTRAS = 0.005  # Segundos entre duas amostras do perfilador por amostragem
+LINHAS_RELATORIO = 15
+PROFUNDIDADE_PILHA = 8  # Quadros mostrados por pilha nos resumos
+QUADROS_TRACEMALLOC = 10
+PRAZO_LOOP = 5.0  # Segundos para o loop asyncio atender um pedido do perfilador
+
+
+def _descrever(frame, linha=False):
+    """Função do quadro; com `linha`, a linha em execução em vez da primeira linha da função."""
+    codigo = frame.f_code
+    return f"{codigo.co_name} ({codigo.co_filename}:{frame.f_lineno if linha else codigo.co_firstlineno})"
+
+
+def _pilha(frame, linha=False):
+    """Quadros da pilha, do mais externo ao mais interno."""
+    quadros = []
+    while frame is not None:
+        quadros.append(_descrever(frame, linha))
+        frame = frame.f_back
+    quadros.reverse()
+    return tuple(quadros)
+
+
+def _pilha_tarefa(tarefa):
+    """Cadeia de corrotinas aguardadas pela tarefa, da mais externa à mais interna."""
+    quadros = []
+    corrotina = tarefa.get_coro()
+    while corrotina is not None:
+        frame = getattr(corrotina, 'cr_frame', None) or getattr(corrotina, 'gi_frame', None)
+        if frame is None:
+            break
+        quadros.append(_descrever(frame, linha=True))
+        corrotina = getattr(corrotina, 'cr_await', None) or getattr(corrotina, 'gi_yieldfrom', None)
+    return tuple(quadros) or ('<sem quadros>',)
+
+
+class Perfilador:
+    """
+    Uma sessão de perfilamento por vez, iniciada pelo console e encerrada
+    depois de N segundos (ou por parar()). Nada fica ativo fora de uma
+    sessão, então o custo com o perfilamento desligado é zero.
+
+    - 'cprofile': perfil determinístico (cProfile) do loop asyncio, onde
+      todo o atendimento às conexões acontece no modo asyncio. O cProfile
+      só mede a thread em que é ligado, por isso exige esse modo.
+    - 'amostras': a cada INTERVALO_AMOSTRAS, registra a pilha de todas as
+      threads (tempo de parede, inclusive threads bloqueadas). Funciona nos
+      dois modos e grava as pilhas no formato "colapsado" (uma pilha por
+      linha, com a contagem), aceito por ferramentas de flame graph.
+    """
+
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.ativo = None  # (tipo, evento de parada) da sessão em andamento
+        self.loop = None  # Loop asyncio do servidor, quando houver
+
+    def iniciar(self, tipo, segundos, arquivo):
+        with self.trava:
+            if self.ativo:
+                raise RuntimeError(f"Já há um perfil '{self.ativo[0]}' em andamento (use 'perfil parar').")
+            if tipo == 'cprofile' and self.loop is None:
+                raise RuntimeError("O cProfile mede só o loop asyncio; no modo threads use 'perfil amostras'.")
+            parar = threading.Event()
+            self.ativo = (tipo, parar)
+        alvo = self._cprofile if tipo == 'cprofile' else self._amostras
+        threading.Thread(target=self._executar, args=(alvo, segundos, arquivo, parar),
+                         name=f'perfil-{tipo}', daemon=True).start()
+
+    def parar(self):
+        with self.trava:
+            if not self.ativo:
+                return False
+            self.ativo[1].set()
+            return True
+
+    def _executar(self, alvo, segundos, arquivo, parar):
+        try:
+            print(alvo(segundos, arquivo, parar))
+        except Exception as e:
+            print(f"ERRO no perfilamento: {e}")
+        finally:
+            with self.trava:
+                self.ativo = None
+
+    def _no_loop(self, funcao, descartar_atrasada=True):
+        """
+        Executa `funcao` na thread do loop asyncio e espera o fim, por até
+        PRAZO_LOOP segundos; depois disso levanta TimeoutError (loop bloqueado
+        ou parado). Com `descartar_atrasada`, a chamada que ficou na fila do
+        loop não é mais executada quando ele voltar a responder.
+        """
+        trava = threading.Lock()
+        feita = threading.Event()
+        desistiu = False
+
+        def chamar():
+            with trava:
+                if desistiu and descartar_atrasada:
+                    return
+                funcao()
+                feita.set()
+        try:
+            self.loop.call_soon_threadsafe(chamar)
+        except RuntimeError:  # Loop já fechado
+            raise TimeoutError("o loop asyncio não está mais rodando") from None
+        feita.wait(PRAZO_LOOP)
+        with trava:
+            if not feita.is_set():
+                desistiu = True
+                raise TimeoutError(f"o loop asyncio não respondeu em {PRAZO_LOOP:g} s (bloqueado ou parado)")
+
+    def _cprofile(self, segundos, arquivo, parar):
+        perfil = cProfile.Profile()
+        try:
+            self._no_loop(perfil.enable)
+        except TimeoutError as e:
+            return f"[perfil] cProfile não iniciado: {e}."
+        parar.wait(segundos)
+        try:
+            # Atrasado ou não, o disable tem que rodar: senão o loop continua perfilado
+            self._no_loop(perfil.disable, descartar_atrasada=False)
+        except TimeoutError as e:
+            return f"[perfil] cProfile sem resultado: {e}; ele será desligado quando o loop voltar."
+        perfil.dump_stats(arquivo)
+        saida = io.StringIO()
+        pstats.Stats(perfil, stream=saida).sort_stats('cumulative').print_stats(LINHAS_RELATORIO)
+        return f"[perfil] cProfile gravado em '{arquivo}'.\n{saida.getvalue()}"
+
+    def _amostras(self, segundos, arquivo, parar):
+        propria = threading.get_ident()
+        nomes = {}
+        pilhas = collections.Counter()
+        total = 0
+        fim = time.monotonic() + segundos
+        while time.monotonic() < fim and not parar.is_set():
+            nomes.update((thread.ident, thread.name) for thread in threading.enumerate())
+            for ident, frame in sys._current_frames().items():
+                if ident != propria:
+                    pilhas[(nomes.get(ident, str(ident)),) + _pilha(frame)] += 1
+            total += 1
+            parar.wait(INTERVALO_AMOSTRAS)
+
+        with open(arquivo, 'w', encoding='utf-8') as saida:
+            for pilha, contagem in pilhas.most_common():
+                saida.write(f"{';'.join(pilha)} {contagem}\n")
+
+        proprio, inclusivo = collections.Counter(), collections.Counter()
+        for pilha, contagem in pilhas.items():
+            proprio[pilha[-1]] += contagem
+            for funcao in set(pilha[1:]):
+                inclusivo[funcao] += contagem
+        linhas = [f"[perfil] {total} amostras de {len(nomes)} threads gravadas em '{arquivo}'.",
+                  "Mais amostras no topo da pilha (tempo próprio):"]
+        linhas += [f"  {contagem:>7}  {funcao}" for funcao, contagem in proprio.most_common(LINHAS_RELATORIO)]
+        linhas.append("Mais amostras em qualquer ponto da pilha (tempo inclusivo):")
+        linhas += [f"  {contagem:>7}  {funcao}" for funcao, contagem in inclusivo.most_common(LINHAS_RELATORIO)]
+        return '\n'.join(linhas)
+
+
+# --- tracemalloc ---
+_snapshot_anterior = None
+
+
+def _snapshot():
+    # Ignora as alocações do próprio tracemalloc
+    return tracemalloc.take_snapshot().filter_traces((tracemalloc.Filter(False, tracemalloc.__file__),))
+
+
+def memoria(acao):
+    """
+    'iniciar' liga o tracemalloc e guarda o snapshot de referência; 'diff'
+    mostra o que mais cresceu desde o snapshot anterior e passa a usar o
+    atual como referência; 'parar' desliga (o tracemalloc tem custo em
+    toda alocação enquanto ligado).
+    """
+    global _snapshot_anterior
+    if acao == 'iniciar':
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(QUADROS_TRACEMALLOC)
+        _snapshot_anterior = _snapshot()
+        return "[memoria] tracemalloc ligado; use 'memoria diff' para ver o crescimento."
+    if acao == 'parar':
+        tracemalloc.stop()
+        _snapshot_anterior = None
+        return "[memoria] tracemalloc desligado."
+    if acao == 'diff':
+        if not tracemalloc.is_tracing() or _snapshot_anterior is None:
+            return "[memoria] tracemalloc desligado; use 'memoria iniciar' antes."
+        atual = _snapshot()
+        diferencas = atual.compare_to(_snapshot_anterior, 'lineno')
+        _snapshot_anterior = atual
+        usado, pico = tracemalloc.get_traced_memory()
+        linhas = [f"[memoria] em uso: {usado / 1024:.1f} KiB (pico {pico / 1024:.1f} KiB). Maiores variações:"]
+        linhas += [f"  {diferenca}" for diferenca in diferencas[:LINHAS_RELATORIO]]
+        return '\n'.join(linhas)
+    return f"[memoria] ação '{acao}' desconhecida (use iniciar, diff ou parar)."
+
+
+# --- Pilhas ---
+def _agrupar_pilhas(pilhas):
+    """Agrupa pilhas idênticas: [(quantidade, exemplos de nomes, pilha)], da mais comum à menos."""
+    grupos = collections.OrderedDict()
+    for nome, pilha in pilhas:
+        grupos.setdefault(pilha[-PROFUNDIDADE_PILHA:], []).append(nome)
+    return sorted(((len(nomes), nomes, pilha) for pilha, nomes in grupos.items()),
+                  key=lambda grupo: grupo[0], reverse=True)
+
+
+def _formatar_grupos(titulo, grupos):
+    linhas = [titulo]
+    for quantidade, nomes, pilha in grupos:
+        exemplos = ', '.join(nomes[:3]) + (', ...' if len(nomes) > 3 else '')
+        linhas.append(f"  {quantidade} x [{exemplos}]")
+        linhas += [f"      {quadro}" for quadro in pilha]
+    return '\n'.join(linhas)
+
+
+def pilhas_threads():
+    """Resumo das pilhas de todas as threads, agrupando as que estão no mesmo ponto."""
+    nomes = {thread.ident: thread.name for thread in threading.enumerate()}
+    pilhas = [(nomes.get(ident, str(ident)), _pilha(frame, linha=True))
+              for ident, frame in sys._current_frames().items()]
+    return _formatar_grupos(f"[pilhas] {len(pilhas)} threads:", _agrupar_pilhas(pilhas))
+
+
+def pilhas_tarefas(loop, prazo=5.0):
+    """Resumo das pilhas das tarefas asyncio do loop, coletado na thread do próprio loop."""
+    async def coletar():
+        return [(tarefa.get_name(), _pilha_tarefa(tarefa)) for tarefa in asyncio.all_tasks()]
+    pilhas = asyncio.run_coroutine_threadsafe(coletar(), loop).result(prazo)
+    return _formatar_grupos(f"[pilhas] {len(pilhas)} tarefas asyncio:", _agrupar_pilhas(pilhas))
@@ -0,0 +1,410 @@
+# ser_processos.py (Modo multiprocesso: coordenador e processos trabalhadores)
+
+import asyncio
+import itertools
+import threading
+import time
+from multiprocessing.connection import wait
+
+from ser_fila import ESPERA_FILA
+from ser_protocolo import CODECS, CODEC_JSON
+
+PRAZO_PEDIDO = 5.0  # Segundos que um trabalhador espera a resposta do coordenador
+# Quem não tem par no seu trabalhador espera este tempo por um par local antes
+# de ser pareado com outro trabalhador (partidas locais não passam pelo coordenador)
+ESPERA_CRUZADA = 0.1
+
+# Mensagens trocadas pelos canais (tuplas, com o tipo no primeiro campo).
+# Um jogador é identificado em todos os processos pelo 'jid' (índice do
+# trabalhador, número sequencial).
+#
+# trabalhador -> coordenador:
+#   ('registrar', nome)                    ('incrementar', nome, delta)
+#   ('entrar', jid, nome, codec)           ('cancelar', jid)
+#   ('pedido', id, 'consultar', args)      ('relay', jid, quadro)
+#   ('jogada', jid, jogada)                ('desconectado', jid)
+#   ('fim_partida', jid1, jid2)
+# coordenador -> trabalhador:
+#   ('resposta', id, resultado)            ('partida', (jid, nome, codec), (jid, nome, codec))
+#   ('partida_remota', jid)                ('quadro', jid, quadro)
+#   ('jogada', jid, jogada)                ('desconectado', jid)
+#   ('fim_partida', jid)                   ('end', mensagem)
+
+
+class CanalIPC:
+    """
+    Ponta de um multiprocessing.Pipe usada por várias threads: os envios são
+    serializados por uma trava, e uma thread leitora entrega cada mensagem
+    a `tratador`, exceto as respostas a pedir() e pedir_async(), que acordam
+    quem pediu.
+    """
+
+    def __init__(self, conexao, tratador, ao_fechar=None):
+        self.conexao = conexao
+        self.tratador = tratador
+        self.ao_fechar = ao_fechar
+        self.trava = threading.Lock()
+        self.pedidos = {}  # id -> função que entrega o resultado a quem pediu
+        self.ids = itertools.count()
+        self.fechado = False
+
+    def iniciar(self):
+        threading.Thread(target=self._ler, name='canal-coordenador', daemon=True).start()
+
+    def enviar(self, mensagem):
+        """Envia a mensagem; depois que o outro lado fechou o canal, não faz nada."""
+        with self.trava:
+            if self.fechado:
+                return
+            try:
+                self.conexao.send(mensagem)
+            except OSError:
+                self.fechado = True
+
+    def pedir(self, operacao, *args):
+        """Envia um pedido e bloqueia até a resposta (ConnectionError se ela não chegar no prazo)."""
+        identificador = next(self.ids)
+        espera = [threading.Event(), None]
+
+        def entregar(resultado):
+            espera[1] = resultado
+            espera[0].set()
+        self.pedidos[identificador] = entregar
+        try:
+            self.enviar(('pedido', identificador, operacao, args))
+            if not espera[0].wait(PRAZO_PEDIDO):
+                raise ConnectionError(f"coordenador não respondeu '{operacao}'")
+            return espera[1]
+        finally:
+            self.pedidos.pop(identificador, None)
+
+    async def pedir_async(self, operacao, *args):
+        """
+        Como pedir(), mas para o loop asyncio: a thread leitora resolve um
+        Future no loop, e as outras conexões seguem atendidas enquanto a
+        resposta não chega.
+        """
+        loop = asyncio.get_running_loop()
+        futuro = loop.create_future()
+        identificador = next(self.ids)
+
+        def resolver(resultado):
+            if not futuro.done():  # Cancelado pelo prazo enquanto a resposta vinha
+                futuro.set_result(resultado)
+
+        def entregar(resultado):
+            try:
+                loop.call_soon_threadsafe(resolver, resultado)
+            except RuntimeError:
+                pass  # Loop já encerrado
+        self.pedidos[identificador] = entregar
+        try:
+            self.enviar(('pedido', identificador, operacao, args))
+            return await asyncio.wait_for(futuro, PRAZO_PEDIDO)
+        except asyncio.TimeoutError:
+            raise ConnectionError(f"coordenador não respondeu '{operacao}'") from None
+        finally:
+            self.pedidos.pop(identificador, None)
+
+    def _ler(self):
+        try:
+            while True:
+                mensagem = self.conexao.recv()
+                if mensagem[0] == 'resposta':
+                    entregar = self.pedidos.get(mensagem[1])
+                    if entregar:
+                        entregar(mensagem[2])
+                    continue
+                try:
+                    self.tratador(mensagem)
+                except Exception as e:
+                    print(f"ERRO ao tratar a mensagem '{mensagem[0]}' do coordenador: {e}")
+        except (EOFError, OSError):
+            with self.trava:
+                self.fechado = True
+            if self.ao_fechar:
+                self.ao_fechar()
+
+
+# --- Representantes usados pelos trabalhadores ---
+class ConexaoRemota:
+    """
+    Jogador conectado a outro trabalhador, visto pelo trabalhador que
+    hospeda a partida: os quadros seguem pelo coordenador até o socket dele.
+    Tem a mesma interface de envio de ConexaoSaida (inclusive agrupar).
+    """
+
+    def __init__(self, canal, jid, nome_codec):
+        self.canal = canal
+        self.jid = jid
+        self.codec = CODECS.get(nome_codec, CODEC_JSON)
+        self.agrupando = 0
+        self.lote = []
+
+    def sendall(self, dados):
+        if self.agrupando:
+            self.lote.append(dados)
+        else:
+            self.canal.enviar(('relay', self.jid, dados))
+
+    def adiar(self):
+        self.agrupando += 1
+
+    def descarregar(self):
+        self.agrupando -= 1
+        if not self.agrupando and self.lote:
+            dados, self.lote = b''.join(self.lote), []
+            self.canal.enviar(('relay', self.jid, dados))
+
+    def close(self):
+        pass
+
+
+class SlotsRemotos:
+    """
+    Ocupa o lugar de SlotsJogada no jogador local de uma partida hospedada
+    em outro trabalhador: jogadas e desconexão são repassadas ao anfitrião.
+    """
+
+    def __init__(self, canal, jid):
+        self.canal = canal
+        self.jid = jid
+
+    def registrar(self, jogador_info, jogada):
+        # Jogadas fora de uma rodada aberta são descartadas pelo anfitrião
+        self.canal.enviar(('jogada', self.jid, jogada))
+        return True
+
+    def desconectar(self, jogador_info):
+        self.canal.enviar(('desconectado', self.jid))
+
+
+class FilaRemota:
+    """
+    Fila de espera de um trabalhador: entrar/cancelar são repassados à fila
+    global do coordenador, que devolve os pares prontos com 'partida'.
+    `locais` guarda os jogadores deste trabalhador pelo jid, até a desconexão.
+    """
+
+    def __init__(self, canal, indice):
+        self.canal = canal
+        self.indice = indice
+        self.sequencia = itertools.count()
+        self.locais = {}  # jid -> jogador_info
+        self.aguardando = set()  # jids enviados à fila e ainda não pareados
+        self.trava = threading.Lock()
+
+    def __len__(self):
+        return len(self.aguardando)
+
+    def __contains__(self, jogador_info):
+        return jogador_info.get('jid') in self.aguardando
+
+    def entrar(self, jogador_info):
+        with self.trava:
+            jid = jogador_info.get('jid')
+            if jid is None or jid[0] != self.indice:  # Novo, ou de antes de o nó voltar ao broker
+                jid = jogador_info['jid'] = (self.indice, next(self.sequencia))
+            self.locais[jid] = jogador_info
+            self.aguardando.add(jid)
+        self.canal.enviar(('entrar', jid, jogador_info['nome'], jogador_info['socket'].codec.nome))
+
+    def cancelar(self, jogador_info):
+        """Esquece o jogador (desconexão); retorna False se ele não estava mais na fila."""
+        jid = jogador_info.get('jid')
+        with self.trava:
+            self.locais.pop(jid, None)
+            if jid not in self.aguardando:
+                return False
+            self.aguardando.discard(jid)
+        self.canal.enviar(('cancelar', jid))
+        return True
+
+    def pareado(self, jid):
+        """Marca o jogador como retirado da fila e retorna o jogador_info dele (ou None)."""
+        with self.trava:
+            self.aguardando.discard(jid)
+            return self.locais.get(jid)
+
+    def retirar_par(self):
+        return None  # O pareamento é feito pelo coordenador
+
+
+class RankingRemoto:
+    """Ranking de um trabalhador: alterações são repassadas ao coordenador e consultas, pedidas a ele."""
+
+    def __init__(self, canal):
+        self.canal = canal
+
+    def registrar(self, nome):
+        self.canal.enviar(('registrar', nome))
+
+    def incrementar(self, nome, delta=1):
+        self.canal.enviar(('incrementar', nome, delta))
+
+    def consultar(self, offset=0, limite=10, nome=None):
+        try:
+            return self.canal.pedir('consultar', offset, limite, nome)
+        except ConnectionError as e:
+            print(f"AVISO: Ranking indisponível: {e}")
+            return 0, [], None, None
+
+    async def consultar_async(self, offset=0, limite=10, nome=None):
+        """consultar() para o motor asyncio, sem bloquear o loop enquanto o coordenador responde."""
+        try:
+            return await self.canal.pedir_async('consultar', offset, limite, nome)
+        except ConnectionError as e:
+            print(f"AVISO: Ranking indisponível: {e}")
+            return 0, [], None, None
+
+
+# --- Coordenador ---
+class Coordenador:
+    """
+    Processo que detém a fila de pareamento e o ranking do modo
+    multiprocesso. Cada trabalhador tem a sua FilaPareamento aqui dentro: os
+    pares são formados primeiro dentro do mesmo trabalhador (a partida roda
+    nele, sem passar pelo coordenador) e só os jogadores que ficaram sem
+    par no seu trabalhador são pareados entre trabalhadores. Nesse
+    caso, a partida roda no trabalhador com menos partidas ativas, e os
+    quadros e jogadas do jogador remoto são repassados por aqui.
+
+    Roda em uma única thread: todo o estado abaixo só é tocado por ela.
+    """
+    descricao = 'Trabalhador'
+
+    def __init__(self, canais, ranking, criar_fila):
+        self.canais = dict(canais)  # índice -> ponta do Pipe do trabalhador
+        self.ranking = ranking
+        self.filas = {indice: criar_fila() for indice in self.canais}
+        self.jogadores = {}  # jid -> jogador_info na fila ('socket' é o próprio jid)
+        self.rotas = {}  # jid de jogador remoto -> trabalhador que hospeda a partida dele
+        self.ativas = {indice: 0 for indice in self.canais}
+        self.encerrando = False
+        self._trava_envio = threading.Lock()  # encerrar() pode vir da thread do console
+
+    def __len__(self):
+        return sum(len(fila) for fila in self.filas.values())
+
+    def enviar(self, indice, mensagem):
+        conexao = self.canais.get(indice)
+        if conexao is None:
+            return
+        try:
+            with self._trava_envio:
+                conexao.send(mensagem)
+        except (BrokenPipeError, OSError):
+            pass  # O trabalhador morreu; será removido quando o EOF for lido
+
+    def encerrar(self, mensagem):
+        """Pede a todos os trabalhadores que enviem END aos clientes e terminem."""
+        self.encerrando = True
+        for indice in list(self.canais):
+            self.enviar(indice, ('end', mensagem))
+
+    def executar(self):
+        """Atende os trabalhadores até todos terminarem."""
+        while self.canais:
+            self.atender(ESPERA_CRUZADA)
+
+    def atender(self, prazo):
+        """Trata as mensagens que chegarem em até `prazo` segundos e pareia quem estiver na fila."""
+        indices = {conexao: indice for indice, conexao in self.canais.items()}
+        # O prazo também serve de relógio para o pareamento cruzado e o alargamento das faixas
+        for conexao in wait(list(indices), timeout=prazo):
+            try:
+                mensagem = conexao.recv()
+            except (EOFError, OSError):
+                self._remover_trabalhador(indices[conexao])
+                continue
+            self.tratar(indices[conexao], mensagem)
+        self.parear()
+
+    def tratar(self, indice, mensagem):
+        tipo = mensagem[0]
+        if tipo == 'relay':
+            _, jid, quadro = mensagem
+            self.enviar(jid[0], ('quadro', jid, quadro))
+        elif tipo in ('jogada', 'desconectado'):
+            anfitriao = self.rotas.get(mensagem[1])
+            if anfitriao is not None:
+                self.enviar(anfitriao, mensagem)
+        elif tipo == 'registrar':
+            self.ranking.registrar(mensagem[1])
+        elif tipo == 'incrementar':
+            self.ranking.incrementar(mensagem[1], mensagem[2])
+        elif tipo == 'entrar':
+            _, jid, nome, codec = mensagem
+            jogador_info = {'socket': jid, 'nome': nome, 'codec': codec, 'entrada': time.monotonic()}
+            self.jogadores[jid] = jogador_info
+            self.filas[indice].entrar(jogador_info)
+        elif tipo == 'cancelar':
+            jogador_info = self.jogadores.pop(mensagem[1], None)
+            if jogador_info:
+                self.filas[indice].cancelar(jogador_info)
+        elif tipo == 'pedido':
+            _, identificador, operacao, args = mensagem
+            if operacao == 'consultar':
+                self.enviar(indice, ('resposta', identificador, self.ranking.consultar(*args)))
+        elif tipo == 'fim_partida':
+            self.ativas[indice] = max(0, self.ativas.get(indice, 0) - 1)
+            for jid in mensagem[1:]:
+                if self.rotas.pop(jid, None) is not None:
+                    self.enviar(jid[0], ('fim_partida', jid))
+        else:
+            print(f"Mensagem desconhecida '{tipo}' do trabalhador {indice}.")
+
+    def parear(self):
+        if self.encerrando:
+            return
+        for fila in self.filas.values():
+            while True:
+                par = fila.retirar_par()
+                if not par:
+                    break
+                self.iniciar_partida(*par)
+        # Quem espera há ESPERA_CRUZADA sem par no seu trabalhador (sozinho ou
+        # em uma faixa sem parceiro lá) é pareado com outro trabalhador, por
+        # ordem de chegada; quem sobrar volta para a fila de onde saiu
+        antigos = sorted(((info['entrada'], indice, info) for indice, fila in self.filas.items()
+                          for info in fila.retirar_antigos(ESPERA_CRUZADA, observar=False)),
+                         key=lambda item: item[0])
+        agora = time.monotonic()
+        sobras = []
+        for item in antigos:
+            parceiro = next((sobra for sobra in sobras if sobra[1] != item[1]), None)
+            if parceiro is None:
+                sobras.append(item)
+                continue
+            sobras.remove(parceiro)
+            ESPERA_FILA.observar(agora - parceiro[0])
+            ESPERA_FILA.observar(agora - item[0])
+            self.iniciar_partida(parceiro[2], item[2])
+        for entrada, indice, info in reversed(sobras):
+            self.filas[indice].devolver(info, entrada)
+
+    def iniciar_partida(self, jogador1_info, jogador2_info):
+        jid1, jid2 = jogador1_info['socket'], jogador2_info['socket']
+        self.jogadores.pop(jid1, None)
+        self.jogadores.pop(jid2, None)
+        anfitriao = min((jid1[0], jid2[0]), key=lambda indice: self.ativas.get(indice, 0))
+        self.ativas[anfitriao] = self.ativas.get(anfitriao, 0) + 1
+        for jid in (jid1, jid2):
+            if jid[0] != anfitriao:
+                self.rotas[jid] = anfitriao
+                self.enviar(jid[0], ('partida_remota', jid))
+        self.enviar(anfitriao, ('partida', *((info['socket'], info['nome'], info['codec'])
+                                             for info in (jogador1_info, jogador2_info))))
+
+    def _remover_trabalhador(self, indice):
+        print(f"AVISO: {self.descricao} {indice} encerrou.")
+        self.canais.pop(indice).close()
+        self.filas.pop(indice, None)
+        self.ativas.pop(indice, None)
+        for jid in [jid for jid in self.jogadores if jid[0] == indice]:
+            del self.jogadores[jid]
+        # Jogadores de outros trabalhadores em partidas hospedadas no que morreu
+        for jid, anfitriao in list(self.rotas.items()):
+            if anfitriao == indice:
+                del self.rotas[jid]
+                self.enviar(jid[0], ('fim_partida', jid))
@@ -0,0 +1,281 @@
+# ser_protocolo.py (Codificação das mensagens do protocolo ser_*)
+
+import json
+import struct
+
+JOGADAS = ('roc', 'pap', 'sci', 'TIMEOUT')
+RESULTADOS = ('WIN', 'LOS', 'TIE')
+
+
+def codificar_json(comando_type, payload_data=None):
+    """Codifica uma mensagem JSON terminada em quebra de linha, pronta para o socket."""
+    mensagem_json = {
+        "type": comando_type.upper(),
+        "payload": payload_data if payload_data is not None else {}
+    }
+    return (json.dumps(mensagem_json) + '\n').encode('utf-8')
+
+
+# --- Cache de quadros servidor -> cliente ---
+# Os quadros mais frequentes de uma partida vêm de um conjunto pequeno e fixo:
+# são montados uma única vez e reaproveitados em todas as rodadas. Os bytes
+# são idênticos aos gerados por codificar_json.
+QUADRO_PLA = codificar_json('PLA')
+_QUADROS_RESULTADO = {
+    (resultado, jogada): codificar_json(resultado, {"jogada_oponente": jogada})
+    for resultado in RESULTADOS for jogada in JOGADAS
+}
+
+
+def _modelo(comando_type, campo):
+    """Divide o quadro de um payload com um único campo texto em prefixo e sufixo."""
+    marcador = '\0'
+    quadro = codificar_json(comando_type, {campo: marcador})
+    prefixo, sufixo = quadro.split(json.dumps(marcador).encode('utf-8'))
+    return prefixo, sufixo
+
+
+_MODELO_MAT = _modelo('MAT', 'oponente')
+_MODELO_END = _modelo('END', 'mensagem')
+
+
+def quadro_resultado(resultado, jogada_oponente):
+    """Quadro WIN/LOS/TIE; jogadas fora do conjunto conhecido são codificadas na hora."""
+    quadro = _QUADROS_RESULTADO.get((resultado, jogada_oponente))
+    if quadro is None:
+        quadro = codificar_json(resultado, {"jogada_oponente": jogada_oponente})
+    return quadro
+
+
+def quadro_mat(oponente):
+    prefixo, sufixo = _MODELO_MAT
+    return prefixo + json.dumps(oponente).encode('utf-8') + sufixo
+
+
+def quadro_end(mensagem):
+    prefixo, sufixo = _MODELO_END
+    return prefixo + json.dumps(mensagem).encode('utf-8') + sufixo
+
+
+# --- Protocolo binário ---
+# Quadro: cabeçalho fixo de 7 bytes (marcador 0xA5, comando com 3 letras
+# ASCII, flags e tamanho do payload) seguido do payload compactado.
+# O marcador nunca começa uma linha JSON ('{'), então o receptor distingue
+# os dois formatos quadro a quadro e pode aceitar ambos na mesma conexão.
+MARCADOR_BINARIO = 0xA5
+CABECALHO_BINARIO = struct.Struct('>B3sBH')
+FLAG_PAYLOAD_JSON = 0x01  # Payload é um objeto JSON (comandos sem formato compacto)
+TAMANHO_MAXIMO_PAYLOAD = 0xFFFF
+
+_CODIGOS_JOGADA = {jogada: codigo for codigo, jogada in enumerate(JOGADAS)}
+# Comandos cujo payload é um único campo texto em UTF-8
+_CAMPOS_TEXTO = {'CON': 'nome', 'MAT': 'oponente', 'END': 'mensagem'}
+_COMANDOS_VAZIOS = frozenset(('ROC', 'PAP', 'SCI', 'PLA', 'QUI'))
+
+
+def codificar_binario(comando_type, payload_data=None):
+    """Codifica uma mensagem no formato binário."""
+    comando = comando_type.upper()
+    payload_data = payload_data or {}
+    flags = 0
+    if comando in _COMANDOS_VAZIOS and not payload_data:
+        corpo = b''
+    elif comando in RESULTADOS and set(payload_data) == {'jogada_oponente'} \
+            and payload_data['jogada_oponente'] in _CODIGOS_JOGADA:
+        corpo = bytes((_CODIGOS_JOGADA[payload_data['jogada_oponente']],))
+    elif comando in _CAMPOS_TEXTO and set(payload_data) == {_CAMPOS_TEXTO[comando]}:
+        corpo = str(payload_data[_CAMPOS_TEXTO[comando]]).encode('utf-8')
+    else:
+        flags |= FLAG_PAYLOAD_JSON
+        corpo = json.dumps(payload_data, separators=(',', ':')).encode('utf-8')
+    if len(corpo) > TAMANHO_MAXIMO_PAYLOAD:
+        raise ValueError(f"Payload de '{comando}' excede {TAMANHO_MAXIMO_PAYLOAD} bytes.")
+    return CABECALHO_BINARIO.pack(MARCADOR_BINARIO, comando.encode('ascii'), flags, len(corpo)) + corpo
+
+
+class QuadroInvalido(ValueError):
+    """Quadro mal formado: payload que não corresponde ao comando (código de jogada fora da tabela...)."""
+
+
+def decodificar_payload_binario(comando, flags, corpo):
+    """Reconstrói o payload (dict) de um quadro binário; QuadroInvalido se ele não for válido."""
+    if flags & FLAG_PAYLOAD_JSON:
+        payload = json.loads(str(corpo, 'utf-8'))
+        if not isinstance(payload, dict):
+            raise QuadroInvalido(f"Payload JSON de '{comando}' não é um objeto.")
+        return payload
+    if comando in RESULTADOS:
+        # O codificador sempre manda um byte com o código da jogada do oponente
+        if len(corpo) != 1 or corpo[0] >= len(JOGADAS):
+            raise QuadroInvalido(f"Jogada do oponente inválida em '{comando}' ({bytes(corpo).hex() or 'vazio'}).")
+        return {"jogada_oponente": JOGADAS[corpo[0]]}
+    if not corpo:
+        return {}
+    if comando in _CAMPOS_TEXTO:
+        return {_CAMPOS_TEXTO[comando]: str(corpo, 'utf-8')}
+    raise QuadroInvalido(f"Payload binário inesperado para '{comando}'.")
+
+
+class CodecJSON:
+    """Mensagens JSON terminadas em quebra de linha (formato original)."""
+    nome = 'json'
+    codificar = staticmethod(codificar_json)
+    quadro_pla = QUADRO_PLA
+    quadro_resultado = staticmethod(quadro_resultado)
+    quadro_mat = staticmethod(quadro_mat)
+    quadro_end = staticmethod(quadro_end)
+
+
+class CodecBinario:
+    """Quadros binários com cabeçalho fixo; os quadros fixos também ficam em cache."""
+    nome = 'bin'
+    codificar = staticmethod(codificar_binario)
+    quadro_pla = codificar_binario('PLA')
+    _resultados = {
+        (resultado, jogada): codificar_binario(resultado, {"jogada_oponente": jogada})
+        for resultado in RESULTADOS for jogada in JOGADAS
+    }
+
+    @staticmethod
+    def quadro_resultado(resultado, jogada_oponente):
+        quadro = CodecBinario._resultados.get((resultado, jogada_oponente))
+        if quadro is None:
+            quadro = codificar_binario(resultado, {"jogada_oponente": jogada_oponente})
+        return quadro
+
+    @staticmethod
+    def quadro_mat(oponente):
+        return codificar_binario('MAT', {"oponente": oponente})
+
+    @staticmethod
+    def quadro_end(mensagem):
+        return codificar_binario('END', {"mensagem": mensagem})
+
+
+CODEC_JSON = CodecJSON()
+CODEC_BINARIO = CodecBinario()
+CODECS = {codec.nome: codec for codec in (CODEC_JSON, CODEC_BINARIO)}
+
+
+TAMANHO_MAXIMO_QUADRO = CABECALHO_BINARIO.size + TAMANHO_MAXIMO_PAYLOAD
+TAMANHO_LEITURA = 4096  # Espaço livre mínimo oferecido a cada recv_into
+CAPACIDADE_INICIAL = 2 * TAMANHO_LEITURA
+
+
+class QuadroGrandeDemais(QuadroInvalido):
+    """Um quadro (ou linha JSON sem quebra) passou do tamanho máximo permitido."""
+
+
+class LeitorQuadros:
+    """
+    Separa um fluxo de bytes em mensagens (comando, payload), aceitando
+    linhas JSON e quadros binários misturados. Linhas JSON inválidas são
+    entregues como (None, texto_da_linha) para quem chama registrar o erro.
+
+    Os bytes ficam em um bytearray pré-alocado: receber() lê do socket com
+    recv_into direto no espaço livre do buffer, os quadros são fatiados com
+    memoryview sem cópias intermediárias e a busca pela quebra de linha
+    continua de onde parou, em vez de reprocessar o que já foi varrido.
+    Apenas o pedaço de um quadro incompleto é movido para o início do
+    buffer quando o espaço livre acaba. O buffer começa pequeno (muitas
+    conexões ociosas não devem custar 64 KiB cada) e só dobra quando um
+    quadro grande precisa, até caber `tamanho_maximo`; quadros maiores
+    levantam QuadroGrandeDemais.
+    """
+
+    def __init__(self, tamanho_maximo=TAMANHO_MAXIMO_QUADRO, capacidade_inicial=CAPACIDADE_INICIAL):
+        self.tamanho_maximo = tamanho_maximo
+        self.buffer = bytearray(min(capacidade_inicial, tamanho_maximo + TAMANHO_LEITURA))
+        self.visao = memoryview(self.buffer)
+        self.inicio = 0  # Primeiro byte ainda não consumido
+        self.fim = 0  # Fim dos bytes válidos
+        self.varrido = 0  # Até onde a linha JSON corrente já foi procurada
+
+    def receber(self, sock):
+        """
+        Lê do socket direto para o buffer e retorna as mensagens completas,
+        ou None se a conexão foi encerrada pelo outro lado.
+        """
+        self._garantir_espaco()
+        lidos = sock.recv_into(self.visao[self.fim:])
+        if not lidos:
+            return None
+        self.fim += lidos
+        return self._extrair()
+
+    def alimentar(self, dados):
+        """Acrescenta bytes já recebidos (ex.: de um StreamReader) e retorna as mensagens completas."""
+        dados = memoryview(dados)
+        mensagens = []
+        while dados:
+            self._garantir_espaco()
+            parte = dados[:len(self.buffer) - self.fim]
+            self.visao[self.fim:self.fim + len(parte)] = parte
+            self.fim += len(parte)
+            dados = dados[len(parte):]
+            mensagens += self._extrair()
+        return mensagens
+
+    def _garantir_espaco(self):
+        if self.inicio == self.fim:
+            self.inicio = self.fim = self.varrido = 0
+        if len(self.buffer) - self.fim >= TAMANHO_LEITURA:
+            return
+        if self.inicio:
+            # Move só o quadro incompleto para o começo do buffer
+            pendente = self.fim - self.inicio
+            self.buffer[:pendente] = bytes(self.visao[self.inicio:self.fim])
+            self.varrido -= self.inicio
+            self.inicio, self.fim = 0, pendente
+            if len(self.buffer) - self.fim >= TAMANHO_LEITURA:
+                return
+        capacidade = min(2 * len(self.buffer), self.tamanho_maximo + TAMANHO_LEITURA)
+        if capacidade > len(self.buffer):
+            self.visao.release()  # Um bytearray exportado não pode mudar de tamanho
+            self.buffer.extend(bytes(capacidade - len(self.buffer)))
+            self.visao = memoryview(self.buffer)
+
+    def _extrair(self):
+        mensagens = []
+        visao = self.visao
+        while self.inicio < self.fim:
+            disponivel = self.fim - self.inicio
+            if self.buffer[self.inicio] == MARCADOR_BINARIO:
+                if disponivel < CABECALHO_BINARIO.size:
+                    break
+                _, comando, flags, tamanho = CABECALHO_BINARIO.unpack_from(self.buffer, self.inicio)
+                total = CABECALHO_BINARIO.size + tamanho
+                if total > self.tamanho_maximo:
+                    raise QuadroGrandeDemais(f"Quadro binário de {total} bytes excede {self.tamanho_maximo}.")
+                if disponivel < total:
+                    break
+                comando = comando.decode('ascii')
+                with visao[self.inicio + CABECALHO_BINARIO.size:self.inicio + total] as corpo:
+                    payload = decodificar_payload_binario(comando, flags, corpo)
+                self.inicio += total
+                self.varrido = self.inicio
+                mensagens.append((comando, payload))
+            else:
+                quebra = self.buffer.find(b'\n', max(self.varrido, self.inicio), self.fim)
+                if quebra < 0:
+                    self.varrido = self.fim
+                    if disponivel > self.tamanho_maximo:
+                        raise QuadroGrandeDemais(f"Linha JSON excede {self.tamanho_maximo} bytes.")
+                    break
+                with visao[self.inicio:quebra] as bytes_linha:
+                    linha = str(bytes_linha, 'utf-8')
+                self.inicio = self.varrido = quebra + 1
+                if linha.strip():
+                    mensagens.append(_decodificar_linha_json(linha))
+        return mensagens
+
+
+def _decodificar_linha_json(linha):
+    try:
+        mensagem_json = json.loads(linha)
+        payload = mensagem_json.get('payload', {})
+        if not isinstance(payload, dict):
+            return None, linha  # Como no binário, o payload precisa ser um objeto
+        return mensagem_json.get('type', '').upper(), payload
+    except (json.JSONDecodeError, AttributeError):
+        return None, linha
@@ -0,0 +1,527 @@
+# ser_ranking.py (Ranking de vitórias do servidor)
+
+import glob
+import mmap
+import os
+import struct
+import threading
+import zlib
+from contextlib import ExitStack
+from itertools import islice
+
+from ser_sync import TravaInstrumentada
+
+# Registro binário: vitórias (u32), tamanho do nome (u16), nome em UTF-8
+REGISTRO = struct.Struct('<IH')
+# Cabeçalho dos arquivos: assinatura e geração do log
+CABECALHO = struct.Struct('<4sQ')
+ASSINATURA_SNAPSHOT = b'RKS1'
+ASSINATURA_LOG = b'RKL1'
+
+
+class Placar:
+    """
+    Ranking de vitórias mantido ordenado de forma incremental.
+
+    Os jogadores ficam agrupados por número de vitórias (níveis) e uma árvore
+    de Fenwick conta quantos jogadores há em cada nível. Assim, incrementar
+    uma vitória, descobrir a posição de um jogador e localizar o início de
+    uma página do ranking custam O(log V), onde V é o maior número de
+    vitórias, sem copiar nem reordenar o ranking inteiro.
+
+    Dentro de um mesmo nível, os jogadores aparecem na ordem em que chegaram
+    a ele. O Placar não tem trava própria: quem o usa deve sincronizar.
+    """
+
+    def __init__(self):
+        self.vitorias = {}  # nome -> vitórias
+        self.niveis = {}  # vitórias -> dict(nome -> None), preserva a ordem de chegada
+        self.arvore = [0] * 65  # Fenwick indexada por vitórias + 1
+
+    def __len__(self):
+        return len(self.vitorias)
+
+    def __contains__(self, nome):
+        return nome in self.vitorias
+
+    def get(self, nome, padrao=0):
+        return self.vitorias.get(nome, padrao)
+
+    def itens(self):
+        """Itera sobre (nome, vitórias) sem ordem definida."""
+        return iter(self.vitorias.items())
+
+    def carregar(self, pares):
+        """Carga em lote de (nome, vitórias), reconstruindo o índice uma única vez."""
+        for nome, vitorias in pares:
+            if nome in self.vitorias:
+                del self.niveis[self.vitorias[nome]][nome]
+            self.vitorias[nome] = vitorias
+            self.niveis.setdefault(vitorias, {})[nome] = None
+        self.niveis = {vitorias: nivel for vitorias, nivel in self.niveis.items() if nivel}
+        self._crescer(max(self.niveis, default=0) + 1)
+
+    def registrar(self, nome, vitorias=0):
+        """Inclui o jogador no ranking, se ainda não estiver nele."""
+        if nome not in self.vitorias:
+            self.vitorias[nome] = vitorias
+            self._entrar_nivel(nome, vitorias)
+
+    def incrementar(self, nome, delta=1):
+        """Soma `delta` vitórias ao jogador e retorna o novo total."""
+        atual = self.vitorias.get(nome)
+        if atual is None:
+            self.registrar(nome, delta)
+            return delta
+        self._sair_nivel(nome, atual)
+        self.vitorias[nome] = atual + delta
+        self._entrar_nivel(nome, atual + delta)
+        return atual + delta
+
+    def posicao(self, nome):
+        """Posição do jogador (1 = mais vitórias; empatados dividem a posição), ou None."""
+        vitorias = self.vitorias.get(nome)
+        if vitorias is None:
+            return None
+        return len(self.vitorias) - self._prefixo(vitorias + 1) + 1
+
+    def pagina(self, offset=0, limite=10):
+        """Retorna até `limite` pares (nome, vitórias) a partir da posição `offset` (0 = líder)."""
+        total = len(self.vitorias)
+        if offset < 0 or limite <= 0 or offset >= total:
+            return []
+        # O jogador na posição `offset` (ordem decrescente) é o (total - offset)-ésimo na crescente
+        nivel = self._menor_indice_com_prefixo(total - offset) - 1
+        pular = offset - (total - self._prefixo(nivel + 1))
+        resultado = []
+        while len(resultado) < limite:
+            restantes = limite - len(resultado)
+            for nome in islice(self.niveis[nivel], pular, pular + restantes):
+                resultado.append((nome, nivel))
+            pular = 0
+            abaixo = self._prefixo(nivel)
+            if not abaixo:
+                break
+            nivel = self._menor_indice_com_prefixo(abaixo) - 1
+        return resultado
+
+    def contar_acima(self, vitorias):
+        """Quantidade de jogadores com mais de `vitorias` vitórias."""
+        return len(self.vitorias) - self._prefixo(vitorias + 1)
+
+    def jogadores_com(self, vitorias):
+        """Nomes com exatamente `vitorias` vitórias, na ordem de chegada ao nível."""
+        return self.niveis.get(vitorias, {})
+
+    def nivel_abaixo(self, vitorias):
+        """Maior número de vitórias, menor que `vitorias`, que algum jogador tem (ou None)."""
+        abaixo = self._prefixo(vitorias)
+        if not abaixo:
+            return None
+        return self._menor_indice_com_prefixo(abaixo) - 1
+
+    def maior_nivel(self):
+        return self.nivel_abaixo(len(self.arvore))
+
+    # --- Níveis e árvore de Fenwick ---
+    def _entrar_nivel(self, nome, vitorias):
+        self.niveis.setdefault(vitorias, {})[nome] = None
+        self._atualizar(vitorias + 1, 1)
+
+    def _sair_nivel(self, nome, vitorias):
+        nivel = self.niveis[vitorias]
+        del nivel[nome]
+        if not nivel:
+            del self.niveis[vitorias]
+        self._atualizar(vitorias + 1, -1)
+
+    def _atualizar(self, indice, delta):
+        if indice >= len(self.arvore):
+            self._crescer(indice)  # A reconstrução já inclui o estado atual dos níveis
+            return
+        while indice < len(self.arvore):
+            self.arvore[indice] += delta
+            indice += indice & -indice
+
+    def _prefixo(self, indice):
+        """Quantidade de jogadores com menos de `indice` vitórias."""
+        indice = min(indice, len(self.arvore) - 1)
+        soma = 0
+        while indice > 0:
+            soma += self.arvore[indice]
+            indice -= indice & -indice
+        return soma
+
+    def _menor_indice_com_prefixo(self, k):
+        """Menor índice i com _prefixo(i) >= k (k >= 1)."""
+        indice = 0
+        passo = 1 << (len(self.arvore) - 1).bit_length()
+        while passo:
+            proximo = indice + passo
+            if proximo < len(self.arvore) and self.arvore[proximo] < k:
+                indice = proximo
+                k -= self.arvore[proximo]
+            passo >>= 1
+        return indice + 1
+
+    def _crescer(self, indice):
+        """Dobra a árvore até caber `indice` e a reconstrói a partir dos níveis."""
+        tamanho = len(self.arvore) - 1
+        while tamanho < indice:
+            tamanho *= 2
+        self.arvore = [0] * (tamanho + 1)
+        for vitorias, nivel in self.niveis.items():
+            self.arvore[vitorias + 1] += len(nivel)
+        for i in range(1, tamanho + 1):
+            pai = i + (i & -i)
+            if pai <= tamanho:
+                self.arvore[pai] += self.arvore[i]
+
+
+class RankingFragmentado:
+    """
+    Ranking dividido em fragmentos pelo hash do nome, cada um com seu Placar
+    e sua própria trava instrumentada. Vitórias de jogadores diferentes
+    raramente disputam a mesma trava.
+
+    Consultas globais (página e posição) travam todos os fragmentos, sempre
+    na mesma ordem, apenas pelo tempo de algumas buscas O(log V) por
+    fragmento; nenhuma cópia do ranking é feita.
+
+    Se houver `persistencia`, cada alteração é anotada nela ainda sob a trava
+    do fragmento, o que permite à compactação obter um estado consistente.
+    """
+
+    def __init__(self, fragmentos=16):
+        self.fragmentos = [Placar() for _ in range(fragmentos)]
+        self.travas = [TravaInstrumentada(f'ranking[{i}]') for i in range(fragmentos)]
+        self.persistencia = None
+
+    def _indice(self, nome):
+        return zlib.crc32(nome.encode('utf-8')) % len(self.fragmentos)
+
+    def travado(self):
+        """Context manager que detém as travas de todos os fragmentos."""
+        pilha = ExitStack()
+        for trava in self.travas:
+            pilha.enter_context(trava)
+        return pilha
+
+    def __len__(self):
+        return sum(len(placar) for placar in self.fragmentos)
+
+    def __contains__(self, nome):
+        indice = self._indice(nome)
+        with self.travas[indice]:
+            return nome in self.fragmentos[indice]
+
+    def get(self, nome, padrao=0):
+        indice = self._indice(nome)
+        with self.travas[indice]:
+            return self.fragmentos[indice].get(nome, padrao)
+
+    def itens(self):
+        """Itera sobre (nome, vitórias); chame com `travado()` para um estado consistente."""
+        for placar in self.fragmentos:
+            yield from placar.itens()
+
+    def carregar(self, pares):
+        """Carga em lote (sem persistência), usada na partida do servidor."""
+        por_fragmento = [[] for _ in self.fragmentos]
+        for nome, vitorias in pares:
+            por_fragmento[self._indice(nome)].append((nome, vitorias))
+        for placar, trava, lote in zip(self.fragmentos, self.travas, por_fragmento):
+            with trava:
+                placar.carregar(lote)
+
+    def registrar(self, nome):
+        """Inclui o jogador com 0 vitórias; retorna True se ele era novo."""
+        indice = self._indice(nome)
+        with self.travas[indice]:
+            placar = self.fragmentos[indice]
+            if nome in placar:
+                return False
+            placar.registrar(nome)
+            if self.persistencia:
+                self.persistencia.anotar(nome, 0)
+            return True
+
+    def incrementar(self, nome, delta=1):
+        indice = self._indice(nome)
+        with self.travas[indice]:
+            total = self.fragmentos[indice].incrementar(nome, delta)
+            if self.persistencia:
+                self.persistencia.anotar(nome, delta)
+            return total
+
+    def mesclar(self, pares):
+        """
+        Mescla (nome, vitórias) de outro ranking, ficando com o maior valor de
+        cada jogador. Retorna os (nome, delta) que mudaram este ranking
+        (delta 0 para jogadores que só foram incluídos).
+        """
+        alterados = []
+        for nome, vitorias in pares:
+            indice = self._indice(nome)
+            with self.travas[indice]:
+                placar = self.fragmentos[indice]
+                if nome not in placar:
+                    placar.registrar(nome)
+                    if self.persistencia:
+                        self.persistencia.anotar(nome, 0)
+                    alterados.append((nome, 0))
+                delta = vitorias - placar.get(nome)
+                if delta > 0:
+                    placar.incrementar(nome, delta)
+                    if self.persistencia:
+                        self.persistencia.anotar(nome, delta)
+                    alterados.append((nome, delta))
+        return alterados
+
+    def posicao(self, nome):
+        indice = self._indice(nome)
+        with self.travado():
+            vitorias = self.fragmentos[indice].vitorias.get(nome)
+            if vitorias is None:
+                return None
+            return 1 + sum(placar.contar_acima(vitorias) for placar in self.fragmentos)
+
+    def pagina(self, offset=0, limite=10):
+        """Mesma semântica de Placar.pagina, sobre todos os fragmentos."""
+        with self.travado():
+            total = len(self)
+            if offset < 0 or limite <= 0 or offset >= total:
+                return []
+            # Menor nível cujos jogadores acima dele não passam de `offset`
+            baixo, alto = 0, max(placar.maior_nivel() or 0 for placar in self.fragmentos)
+            while baixo < alto:
+                meio = (baixo + alto) // 2
+                if sum(placar.contar_acima(meio) for placar in self.fragmentos) <= offset:
+                    alto = meio
+                else:
+                    baixo = meio + 1
+            nivel = baixo
+            pular = offset - sum(placar.contar_acima(nivel) for placar in self.fragmentos)
+
+            resultado = []
+            while nivel is not None and len(resultado) < limite:
+                for placar in self.fragmentos:
+                    jogadores = placar.jogadores_com(nivel)
+                    if pular >= len(jogadores):
+                        pular -= len(jogadores)
+                        continue
+                    restantes = limite - len(resultado)
+                    resultado.extend((nome, nivel) for nome in islice(jogadores, pular, pular + restantes))
+                    pular = 0
+                    if len(resultado) >= limite:
+                        break
+                abaixo = [placar.nivel_abaixo(nivel) for placar in self.fragmentos]
+                nivel = max((n for n in abaixo if n is not None), default=None)
+            return resultado
+
+    def consultar(self, offset=0, limite=10, nome=None):
+        """
+        Tudo o que uma resposta RAN precisa: (total, página, posição, vitórias).
+        Posição e vitórias são None quando `nome` não é informado. Uma chamada
+        só, para que um ranking remoto (ver ser_processos) custe uma ida e volta.
+        """
+        pagina = self.pagina(offset, limite)
+        if nome is None:
+            return len(self), pagina, None, None
+        return len(self), pagina, self.posicao(nome), self.get(nome)
+
+
+def _codificar_registro(nome, valor):
+    nome_bytes = nome.encode('utf-8')
+    return REGISTRO.pack(valor, len(nome_bytes)) + nome_bytes
+
+
+def _ler_registros(dados, inicio):
+    """
+    Percorre os registros de `dados` a partir de `inicio`.
+    Gera (nome, valor, fim_do_registro) e para no primeiro registro incompleto.
+    """
+    posicao = inicio
+    tamanho = len(dados)
+    while posicao + REGISTRO.size <= tamanho:
+        valor, tamanho_nome = REGISTRO.unpack_from(dados, posicao)
+        fim = posicao + REGISTRO.size + tamanho_nome
+        if fim > tamanho:
+            return
+        yield bytes(dados[posicao + REGISTRO.size:fim]).decode('utf-8'), valor, fim
+        posicao = fim
+
+
+class RankingDuravel:
+    """
+    Persistência do ranking: log binário append-only mais snapshot compactado.
+
+    Cada vitória (ou nome novo) vira um registro pequeno acumulado em memória
+    e gravado em lote, com fsync, a cada `intervalo_fsync` segundos. Quando o
+    log passa do tamanho do último snapshot (ou de `limite_compactacao`), o
+    estado atual é gravado em um novo snapshot e o log recomeça, então o
+    custo de escrita por vitória fica constante e a partida do servidor lê
+    no máximo um snapshot e um log de tamanho parecido.
+
+    Arquivos: `<base>.snap` (vitórias absolutas) e `<base>.<geração>.log`
+    (incrementos). O snapshot guarda a geração do primeiro log que ainda não
+    está incluído nele, o que torna a troca de arquivos segura contra quedas.
+    """
+
+    def __init__(self, base, intervalo_fsync=1.0, limite_compactacao=4 * 1024 * 1024):
+        self.base = base
+        self.intervalo_fsync = intervalo_fsync
+        self.limite_compactacao = limite_compactacao
+        self.pendentes = bytearray()
+        self.trava = threading.Lock()  # Protege `pendentes` e a troca de log
+        self.arquivo_log = None
+        self.geracao = 0
+        self.tamanho_snapshot = 0
+        self.encerrado = threading.Event()
+        self.thread = None
+
+    @property
+    def caminho_snapshot(self):
+        return f"{self.base}.snap"
+
+    def caminho_log(self, geracao):
+        return f"{self.base}.{geracao}.log"
+
+    # --- Carga na partida ---
+    def carregar(self, placar):
+        """
+        Carrega snapshot e logs no placar (Placar ou RankingFragmentado, ainda
+        sem persistência associada) e abre o log corrente para escrita.
+        """
+        pasta = os.path.dirname(self.base)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        self.geracao = 0
+        if os.path.exists(self.caminho_snapshot):
+            self.geracao = self._carregar_snapshot(placar)
+
+        logs = sorted((self._geracao_do_log(caminho), caminho) for caminho in glob.glob(f"{glob.escape(self.base)}.*.log"))
+        for geracao, caminho in logs:
+            if geracao is None:
+                continue
+            if geracao < self.geracao:
+                os.remove(caminho)  # Já incluído no snapshot
+                continue
+            self._repetir_log(placar, caminho)
+            self.geracao = geracao
+        self._abrir_log(self.geracao)
+
+    def _geracao_do_log(self, caminho):
+        try:
+            return int(caminho[len(self.base) + 1:-len('.log')])
+        except ValueError:
+            return None
+
+    def _carregar_snapshot(self, placar):
+        with open(self.caminho_snapshot, 'rb') as arquivo:
+            self.tamanho_snapshot = os.fstat(arquivo.fileno()).st_size
+            if self.tamanho_snapshot < CABECALHO.size:
+                return 0
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as dados:
+                assinatura, geracao = CABECALHO.unpack_from(dados, 0)
+                if assinatura != ASSINATURA_SNAPSHOT:
+                    raise ValueError(f"Snapshot de ranking inválido: {self.caminho_snapshot}")
+                placar.carregar((nome, vitorias) for nome, vitorias, _ in _ler_registros(dados, CABECALHO.size))
+        return geracao
+
+    def _repetir_log(self, placar, caminho):
+        with open(caminho, 'rb') as arquivo:
+            dados = arquivo.read()
+        fim_valido = CABECALHO.size
+        if len(dados) >= CABECALHO.size and dados[:4] == ASSINATURA_LOG:
+            for nome, delta, fim in _ler_registros(dados, CABECALHO.size):
+                placar.incrementar(nome, delta) if delta else placar.registrar(nome)
+                fim_valido = fim
+        if fim_valido < len(dados):
+            # Registro incompleto deixado por uma queda: descarta o final do arquivo
+            with open(caminho, 'r+b') as arquivo:
+                arquivo.truncate(fim_valido)
+
+    def _abrir_log(self, geracao):
+        caminho = self.caminho_log(geracao)
+        novo = not os.path.exists(caminho) or os.path.getsize(caminho) < CABECALHO.size
+        self.arquivo_log = open(caminho, 'wb' if novo else 'ab')
+        if novo:
+            self.arquivo_log.write(CABECALHO.pack(ASSINATURA_LOG, geracao))
+            self.arquivo_log.flush()
+            os.fsync(self.arquivo_log.fileno())
+
+    # --- Escrita ---
+    def anotar(self, nome, delta):
+        """Acrescenta um incremento (delta 0 registra um nome novo) ao próximo lote."""
+        with self.trava:
+            self.pendentes += _codificar_registro(nome, delta)
+
+    def descarregar(self):
+        """Grava e sincroniza no disco os registros pendentes."""
+        with self.trava:
+            if self.pendentes and self.arquivo_log is not None:
+                self._gravar_pendentes()
+                os.fsync(self.arquivo_log.fileno())
+
+    def _gravar_pendentes(self):
+        if self.pendentes:
+            self.arquivo_log.write(self.pendentes)
+            self.pendentes.clear()
+            self.arquivo_log.flush()
+
+    def precisa_compactar(self):
+        return self.arquivo_log.tell() > max(self.limite_compactacao, self.tamanho_snapshot)
+
+    def compactar(self, ranking):
+        """
+        Grava o estado atual do ranking (RankingFragmentado) em um novo
+        snapshot e inicia um log novo. Todos os fragmentos ficam travados
+        enquanto o estado é copiado, para nenhuma vitória entrar nos dois.
+        """
+        with ranking.travado():
+            with self.trava:
+                self._gravar_pendentes()
+                os.fsync(self.arquivo_log.fileno())
+                itens = list(ranking.itens())
+                self.arquivo_log.close()
+                self.geracao += 1
+                self._abrir_log(self.geracao)
+
+        temporario = self.caminho_snapshot + '.tmp'
+        with open(temporario, 'wb') as arquivo:
+            arquivo.write(CABECALHO.pack(ASSINATURA_SNAPSHOT, self.geracao))
+            for inicio in range(0, len(itens), 65536):
+                arquivo.write(b''.join(_codificar_registro(nome, vitorias)
+                                       for nome, vitorias in itens[inicio:inicio + 65536]))
+            arquivo.flush()
+            os.fsync(arquivo.fileno())
+            self.tamanho_snapshot = arquivo.tell()
+        os.replace(temporario, self.caminho_snapshot)
+        antigo = self.caminho_log(self.geracao - 1)
+        if os.path.exists(antigo):
+            os.remove(antigo)
+
+    # --- Thread de gravação ---
+    def iniciar(self, ranking):
+        def laco():
+            while not self.encerrado.wait(self.intervalo_fsync):
+                try:
+                    self.descarregar()
+                    if self.precisa_compactar():
+                        self.compactar(ranking)
+                except OSError as e:
+                    print(f"ERRO ao gravar o ranking em disco: {e}")
+
+        self.thread = threading.Thread(target=laco, name='ranking-duravel', daemon=True)
+        self.thread.start()
+
+    def fechar(self):
+        self.encerrado.set()
+        if self.thread:
+            self.thread.join()
+        self.descarregar()
+        if self.arquivo_log:
+            self.arquivo_log.close()
+            self.arquivo_log = None
@@ -5,36 +5,124 @@ import threading
 import time
 import sys
 import os
-import json  # Importar a biblioteca json
+import random
+import argparse
+import asyncio
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from game import resolve_moves
+from ser_fila import FilaPareamento
+from ser_ranking import RankingFragmentado, RankingDuravel
+from ser_sync import TravaInstrumentada, relatorio_travas
+from ser_conexao import (ConexaoSaida, ConexaoAsync, LIMITE_SAIDA_PADRAO, agrupar, configurar_keepalive,
+                         configurar_nodelay, BYTES_RECEBIDOS, FALHAS_ENVIO)
+from ser_metricas import Contador, Medidor, Histograma, exposicao, iniciar_endpoint
+from ser_perfil import Perfilador, memoria, pilhas_threads, pilhas_tarefas
+from ser_broker import RankingFederado, conectar as conectar_broker, endereco_broker, ler_chave
+from ser_processos import CanalIPC, ConexaoRemota, Coordenador, FilaRemota, RankingRemoto, SlotsRemotos
+from ser_protocolo import LeitorQuadros, CODECS, CODEC_JSON
+from ser_sistema import elevar_limite_descritores
+from ser_temporizador import RodaTemporizadores
 
 # --- Configurações do Servidor ---
 HOST = '0.0.0.0'
 PORT = 12345
+BACKLOG = socket.SOMAXCONN  # Fila de conexões pendentes do listen()
+MODOS_SERVIDOR = ('threads', 'asyncio')
+MAX_PARTIDAS_SIMULTANEAS = 256  # Limite padrão de partidas jogadas ao mesmo tempo
+TEMPO_LIMITE_RODADA = 300  # Prazo padrão (segundos) para as duas jogadas de uma rodada
+PRAZO_IDENTIFICACAO = 30  # Segundos para uma conexão nova enviar o CON
+PRAZO_OCIOSO = 600  # Segundos sem receber nada de um jogador fora da fila e de partidas
+KEEPALIVE = 60  # Segundos sem tráfego antes de o TCP sondar o cliente
+MODOS_PAREAMENTO = ('fifo', 'vitorias')
+REVISAO_FILA = 1.0  # Segundos entre revisões da fila por faixas sem nenhum aviso (a janela alarga com o tempo)
+RANKING_LIMITE_PADRAO = 10  # Entradas por página do RAN quando o cliente não informa 'limit'
+RANKING_LIMITE_MAXIMO = 100
+FRAGMENTOS_RANKING = 16  # Fragmentos (cada um com sua trava) do ranking
+RECONEXAO_BROKER_INICIAL = 0.5  # Segundos até a primeira tentativa de voltar ao broker (dobra a cada falha)
+RECONEXAO_BROKER_MAXIMA = 30.0
 
 # --- Estado Global do Servidor ---
-global_lock = threading.Lock()
-jogadores_em_espera = []
-clientes_conectados = []  # Lista de todos os sockets para broadcast
-ranking = {}
+class RegistroConexoes:
+    """Conjunto de todas as conexões abertas (para broadcast), com trava própria."""
+
+    def __init__(self):
+        self.conexoes = set()
+        self.trava = TravaInstrumentada('conexoes')
+
+    def __len__(self):
+        return len(self.conexoes)
+
+    def adicionar(self, conn):
+        with self.trava:
+            self.conexoes.add(conn)
+
+    def remover(self, conn):
+        with self.trava:
+            self.conexoes.discard(conn)
+
+    def copia(self):
+        with self.trava:
+            return list(self.conexoes)
+
+
+# Cada domínio de estado tem sua própria sincronização: registro de conexões,
+# fila de espera e fragmentos do ranking. O estado de partida de cada jogador
+# ('slots' e 'conectado') é protegido pela trava do próprio jogador_info.
+aviso_partidas = threading.Event()  # Jogador entrou na fila ou vaga de partida liberada: acorda o escalonador
+jogadores_em_espera = FilaPareamento(aviso=aviso_partidas)
+clientes_conectados = RegistroConexoes()
+ranking = RankingFragmentado(FRAGMENTOS_RANKING)
+persistencia = None  # RankingDuravel, quando o ranking é gravado em disco
+limite_saida = LIMITE_SAIDA_PADRAO  # Bytes pendentes por cliente antes de desconectá-lo por lentidão
+tcp_nodelay = True  # Os envios já saem agrupados, então o Nagle só acrescentaria atraso
+max_partidas_simultaneas = MAX_PARTIDAS_SIMULTANEAS
+vagas_partidas = threading.BoundedSemaphore(max_partidas_simultaneas)
+tempo_limite_rodada = TEMPO_LIMITE_RODADA
+prazo_identificacao = PRAZO_IDENTIFICACAO  # 0 desliga
+prazo_ocioso = PRAZO_OCIOSO  # 0 desliga
+keepalive = KEEPALIVE  # 0 desliga
+temporizadores = RodaTemporizadores()  # Prazos de rodada, identificação e ociosidade (ver ser_temporizador)
+perfilador = Perfilador()  # Perfis sob demanda pedidos pelo console
+# Modo multiprocesso (--processos): o processo principal é o coordenador e
+# cada trabalhador fala com ele pelo seu canal (ver ser_processos)
+coordenador = None
+canal_coordenador = None
+fila_coordenador = None  # FilaRemota dos jogadores pareados pelo coordenador (ou pelo broker, com --broker)
+jogadores_remotos = {}  # jid -> jogador_info dos oponentes, em outro trabalhador, de partidas hospedadas aqui
+executor_partidas = None
+federacao = None  # (endereço, chave) do broker, com --broker
+consultas_ranking = set()  # Tarefas asyncio esperando o coordenador responder um RAN
+
+# --- Métricas (ver ser_metricas; expostas com --porta-metricas) ---
+CONEXOES_ABERTAS = Medidor('ser_conexoes_abertas', "Conexões de clientes abertas.",
+                           lambda: len(clientes_conectados))
+CONEXOES_ACEITAS = Contador('ser_conexoes_aceitas_total', "Conexões de clientes aceitas.")
+JOGADORES_NA_FILA = Medidor('ser_fila_espera_jogadores', "Jogadores aguardando pareamento.",
+                            lambda: len(jogadores_em_espera))
+PARTIDAS_ATIVAS = Medidor('ser_partidas_ativas', "Partidas em andamento.")
+PARTIDAS_CONCLUIDAS = Contador('ser_partidas_total', "Partidas encerradas (concluídas ou com erro).")
+LATENCIA_RODADA = Histograma('ser_rodada_segundos', "Tempo entre o PLA e a resolução da rodada.")
+CONEXOES_EXPIRADAS = Contador('ser_conexoes_expiradas_total',
+                              "Conexões derrubadas por não enviarem o CON ou por ociosidade.")
+TEMPORIZADORES_ATIVOS = Medidor('ser_temporizadores_ativos', "Prazos agendados na roda de temporizadores.",
+                                lambda: len(temporizadores))
 
 
 # --- Lógica do Jogo ---
 def determinar_vencedor(jogada1, jogador1, jogada2, jogador2):
-    # Regra: Timeout/None sempre perde
-    if jogada1 == 'TIMEOUT' and jogada2 != 'TIMEOUT':
-        return jogador2, jogador1
-    if jogada2 == 'TIMEOUT' and jogada1 != 'TIMEOUT':
-        return jogador1, jogada2
-    if jogada1 == 'TIMEOUT' and jogada2 == 'TIMEOUT':
-        return None, None  # Ambos perdem
-
-    regras = {'roc': 'sci', 'sci': 'pap', 'pap': 'roc'}
-    if jogada1 == jogada2:
-        return None, None  # Empate
-    elif regras.get(jogada1) == jogada2:
+    """
+    (vencedor, perdedor) da rodada, ou (None, None) em empate. Timeout/None
+    sempre perde; se os dois derem TIMEOUT, ambos perdem (também (None, None)).
+    Para muitas rodadas de uma vez, ver game.resolve_rounds.
+    """
+    resultado = resolve_moves(jogada1, jogada2)
+    if resultado > 0:
         return jogador1, jogador2
-    else:
+    if resultado < 0:
         return jogador2, jogador1
+    return None, None
 
 
 # --- Comunicação ---
@@ -44,171 +132,705 @@ def enviar_comando(cliente_socket, comando_type, payload_data={}):
     comando_type: string (ex: 'MAT', 'PLA', 'WIN')
     payload_data: dict (dados a serem incluídos no payload)
     """
+    enviar_quadro(cliente_socket, cliente_socket.codec.codificar(comando_type, payload_data), comando_type)
+
+
+def enviar_quadro(cliente_socket, quadro, comando_type):
+    """Envia bytes já codificados (ver ser_protocolo) para o cliente."""
     try:
-        mensagem_json = {
-            "type": comando_type.upper(),
-            "payload": payload_data
-        }
-        mensagem = json.dumps(mensagem_json) + '\n'  # Adiciona a quebra de linha no final
-        cliente_socket.sendall(mensagem.encode('utf-8'))
+        cliente_socket.sendall(quadro)
     except (BrokenPipeError, ConnectionResetError):
+        FALHAS_ENVIO.incrementar()
         print(f"AVISO: Conexão com o cliente foi perdida ao tentar enviar comando '{comando_type}'.")
     except Exception as e:
+        FALHAS_ENVIO.incrementar()
         print(f"ERRO ao enviar comando '{comando_type}' para o cliente: {e}")
 
 
-def enviar_ranking_para_cliente(cliente_socket):
-    with global_lock:
-        # Converte o dicionário de ranking para o formato de lista de objetos JSON
-        ranking_list = [{"nome": nome, "vitorias": vitorias} for nome, vitorias in ranking.items()]
-    enviar_comando(cliente_socket, 'RAN', {"ranking": ranking_list})
+def _inteiro(valor, padrao, minimo, maximo):
+    try:
+        return min(max(int(valor), minimo), maximo)
+    except (TypeError, ValueError):
+        return padrao
+
+
+def _pedido_ranking(payload_data):
+    """(offset, limite, nome) pedidos em um RAN, já validados."""
+    limite = _inteiro(payload_data.get('limit'), RANKING_LIMITE_PADRAO, 1, RANKING_LIMITE_MAXIMO)
+    offset = _inteiro(payload_data.get('offset'), 0, 0, sys.maxsize)
+    return offset, limite, payload_data.get('nome')
+
+
+def _resposta_ranking(offset, nome, consulta):
+    total, pagina, posicao, vitorias = consulta
+    resposta = {"total": total, "offset": offset}
+    if nome is not None:
+        resposta["posicao"] = {"nome": nome, "posicao": posicao, "vitorias": vitorias}
+    resposta["ranking"] = [{"nome": nome, "vitorias": vitorias} for nome, vitorias in pagina]
+    return resposta
+
+
+def enviar_ranking_para_cliente(cliente_socket, payload_data={}):
+    """
+    Responde um RAN com uma página do ranking, já ordenada por vitórias.
+    Payload aceito: 'limit', 'offset' e 'nome' (para incluir a posição do jogador).
+    """
+    offset, limite, nome = _pedido_ranking(payload_data)
+    enviar_comando(cliente_socket, 'RAN', _resposta_ranking(offset, nome, ranking.consultar(offset, limite, nome)))
+
+
+async def enviar_ranking_para_cliente_async(cliente_socket, payload_data={}):
+    """
+    enviar_ranking_para_cliente do motor asyncio quando o ranking está em
+    outro processo (RankingRemoto): a consulta ao coordenador é esperada
+    sem travar o loop, e as outras conexões do trabalhador seguem atendidas.
+    """
+    offset, limite, nome = _pedido_ranking(payload_data)
+    consulta = await ranking.consultar_async(offset, limite, nome)
+    enviar_comando(cliente_socket, 'RAN', _resposta_ranking(offset, nome, consulta))
 
 
 def broadcast_comando(comando_type, payload_data={}):
-    with global_lock:
-        clientes_a_notificar = list(clientes_conectados)
+    clientes_a_notificar = clientes_conectados.copia()
 
     print(f"Enviando '{comando_type}' para {len(clientes_a_notificar)} clientes.")
+    quadros = {}  # Codificado uma vez por codec, não uma vez por cliente
     for sock in clientes_a_notificar:
-        enviar_comando(sock, comando_type, payload_data)
+        if sock.codec.nome not in quadros:
+            quadros[sock.codec.nome] = sock.codec.codificar(comando_type, payload_data)
+        enviar_quadro(sock, quadros[sock.codec.nome], comando_type)
 
 
 # --- Gerenciamento da Lógica ---
+class SlotsJogada:
+    """
+    Slots de jogada de uma partida. A thread de cada cliente registra a
+    jogada e a thread da partida é acordada assim que as duas chegam,
+    sem precisar consultar o estado periodicamente. O prazo da rodada
+    vence na roda de temporizadores, que também acorda a partida.
+    """
+
+    def __init__(self, jogador1_info, jogador2_info):
+        self.jogadores = (jogador1_info, jogador2_info)
+        self.jogadas = [None, None]
+        self.desconectados = [False, False]
+        self.aberta = False
+        self.rodada = 0
+        self.temporizador = None
+        self.condicao = threading.Condition()
+
+    def abrir_rodada(self, prazo):
+        with self.condicao:
+            # Quem já desconectou perde a rodada sem fazer o outro esperar o prazo
+            self.jogadas = ['TIMEOUT' if saiu else None for saiu in self.desconectados]
+            self.aberta = True
+            self.rodada += 1
+        self.temporizador = temporizadores.agendar(prazo, self.expirar, self.rodada)
+
+    def expirar(self, rodada):
+        """Prazo esgotado (thread da roda): quem ainda não jogou fica com 'TIMEOUT'."""
+        with self.condicao:
+            if self.aberta and self.rodada == rodada:
+                self.jogadas = [jogada or 'TIMEOUT' for jogada in self.jogadas]
+                self.condicao.notify()
+
+    def registrar(self, jogador_info, jogada):
+        """Registra a jogada; retorna False se não houver rodada aberta."""
+        with self.condicao:
+            if not self.aberta:
+                return False
+            self.jogadas[self._indice(jogador_info)] = jogada
+            if None not in self.jogadas:
+                self.condicao.notify()
+            return True
+
+    def desconectar(self, jogador_info):
+        """Marca o jogador como desconectado até o fim da partida."""
+        with self.condicao:
+            indice = self._indice(jogador_info)
+            self.desconectados[indice] = True
+            if self.aberta and self.jogadas[indice] is None:
+                self.jogadas[indice] = 'TIMEOUT'
+                if None not in self.jogadas:
+                    self.condicao.notify()
+
+    def _indice(self, jogador_info):
+        return 0 if jogador_info is self.jogadores[0] else 1
+
+    def aguardar(self):
+        """
+        Bloqueia até as duas jogadas chegarem ou o prazo da rodada
+        esgotar. Jogadas ausentes são retornadas como 'TIMEOUT'.
+        """
+        with self.condicao:
+            self.condicao.wait_for(lambda: None not in self.jogadas)
+            self.aberta = False
+            jogadas = tuple(self.jogadas)
+        self.temporizador.cancelar()
+        return jogadas
+
+
+def jogar_partida(jogador1_info, jogador2_info):
+    """Joga uma melhor de 3 completa entre dois jogadores já pareados."""
+    print(f"Iniciando partida entre {jogador1_info['nome']} e {jogador2_info['nome']}")
+    slots = SlotsJogada(jogador1_info, jogador2_info)
+    for info in (jogador1_info, jogador2_info):
+        with info['trava']:
+            info['slots'] = slots
+            if not info['conectado']:
+                slots.desconectar(info)
+
+    # MAT: oponente
+    conn1, conn2 = jogador1_info['socket'], jogador2_info['socket']
+    enviar_quadro(conn1, conn1.codec.quadro_mat(jogador2_info['nome']), 'MAT')
+    enviar_quadro(conn2, conn2.codec.quadro_mat(jogador1_info['nome']), 'MAT')
+    time.sleep(0.5)
+
+    pontos = {jogador1_info['nome']: 0, jogador2_info['nome']: 0}
+    with ExitStack() as lote:
+        for rodada in range(1, 4):
+            if rodada > 1:
+                time.sleep(2)  # Tempo para os jogadores verem o resultado anterior
+            print(f"Partida {jogador1_info['nome']} vs {jogador2_info['nome']} - Rodada {rodada}")
+            slots.abrir_rodada(tempo_limite_rodada)
+            inicio_rodada = time.perf_counter()
+            # PLA: payload vazio
+            enviar_quadro(conn1, conn1.codec.quadro_pla, 'PLA')
+            enviar_quadro(conn2, conn2.codec.quadro_pla, 'PLA')
+
+            jogada1, jogada2 = slots.aguardar()
+            LATENCIA_RODADA.observar(time.perf_counter() - inicio_rodada)
+
+            vencedor_info, perdedor_info = determinar_vencedor(jogada1, jogador1_info, jogada2, jogador2_info)
+
+            if rodada == 3:
+                # O resultado da última rodada e o END saem juntos, em uma escrita por conexão
+                lote.enter_context(agrupar(conn1, conn2))
+
+            if not vencedor_info:
+                # Empate: envia a jogada do oponente (que é a mesma)
+                enviar_quadro(conn1, conn1.codec.quadro_resultado('TIE', jogada2), 'TIE')
+                enviar_quadro(conn2, conn2.codec.quadro_resultado('TIE', jogada1), 'TIE')
+            else:
+                # Vitória/Derrota
+                if vencedor_info == jogador1_info:
+                    enviar_quadro(conn1, conn1.codec.quadro_resultado('WIN', jogada2), 'WIN')
+                    enviar_quadro(conn2, conn2.codec.quadro_resultado('LOS', jogada1), 'LOS')
+                else:  # vencedor_info == jogador2_info
+                    enviar_quadro(conn2, conn2.codec.quadro_resultado('WIN', jogada1), 'WIN')
+                    enviar_quadro(conn1, conn1.codec.quadro_resultado('LOS', jogada2), 'LOS')
+
+                pontos[vencedor_info['nome']] += 1
+                ranking.incrementar(vencedor_info['nome'])
+
+        vencedor_final_nome = None
+        if pontos[jogador1_info['nome']] > pontos[jogador2_info['nome']]:
+            vencedor_final_nome = jogador1_info['nome']
+        elif pontos[jogador2_info['nome']] > pontos[jogador1_info['nome']]:
+            vencedor_final_nome = jogador2_info['nome']
+
+        msg_final = "A partida terminou em empate!" if not vencedor_final_nome else f"O vencedor da partida foi {vencedor_final_nome}!"
+
+        for info in (jogador1_info, jogador2_info):
+            with info['trava']:
+                info['slots'] = None
+
+        # END: mensagem
+        quadro_final = conn1.codec.quadro_end(msg_final)
+        enviar_quadro(conn1, quadro_final, 'END')
+        # Mesmo quadro para os dois jogadores quando usam o mesmo codec
+        enviar_quadro(conn2, quadro_final if conn2.codec is conn1.codec else conn2.codec.quadro_end(msg_final), 'END')
+    print(f"Partida entre {jogador1_info['nome']} e {jogador2_info['nome']} finalizada.")
+
+
+def _jogar_partida_e_liberar(jogador1_info, jogador2_info):
+    PARTIDAS_ATIVAS.incrementar()
+    try:
+        jogar_partida(jogador1_info, jogador2_info)
+    except Exception as e:
+        print(f"ERRO na partida {jogador1_info['nome']} vs {jogador2_info['nome']}: {e}")
+    finally:
+        PARTIDAS_ATIVAS.decrementar()
+        PARTIDAS_CONCLUIDAS.incrementar()
+        vagas_partidas.release()
+        aviso_partidas.set()
+
+
+def _hospedar_partida(jogador1_info, jogador2_info, canal):
+    """
+    Partida pareada pelo coordenador (modo multiprocesso), jogada neste
+    trabalhador. O fim é avisado pelo canal em que ela chegou: se o broker
+    caiu e o nó voltou a ele no meio da partida, o canal novo não a conhece.
+    """
+    vagas_partidas.acquire()
+    try:
+        _jogar_partida_e_liberar(jogador1_info, jogador2_info)
+    finally:
+        for info in (jogador1_info, jogador2_info):
+            jogadores_remotos.pop(info['jid'], None)
+        canal.enviar(('fim_partida', jogador1_info['jid'], jogador2_info['jid']))
+
+
 def gerenciar_partida():
-    while True:
-        jogador1_info, jogador2_info = None, None
-        with global_lock:
-            if len(jogadores_em_espera) >= 2:
-                jogador1_info = jogadores_em_espera.pop(0)
-                jogador2_info = jogadores_em_espera.pop(0)
-
-        if jogador1_info and jogador2_info:
-            print(f"Iniciando partida entre {jogador1_info['nome']} e {jogador2_info['nome']}")
-            # MAT: oponente
-            enviar_comando(jogador1_info['socket'], 'MAT', {"oponente": jogador2_info['nome']})
-            enviar_comando(jogador2_info['socket'], 'MAT', {"oponente": jogador1_info['nome']})
-            time.sleep(0.5)
-
-            pontos = {jogador1_info['nome']: 0, jogador2_info['nome']: 0}
-            for rodada in range(1, 4):
-                print(f"Partida {jogador1_info['nome']} vs {jogador2_info['nome']} - Rodada {rodada}")
-                # PLA: payload vazio
-                enviar_comando(jogador1_info['socket'], 'PLA')
-                enviar_comando(jogador2_info['socket'], 'PLA')
-
-                tempo_limite = time.time() + 300  # 5 minutos
-                while (jogador1_info.get('jogada_atual') is None or jogador2_info.get(
-                        'jogada_atual') is None) and time.time() < tempo_limite:
-                    time.sleep(0.1)
-
-                jogada1 = jogador1_info.get('jogada_atual', 'TIMEOUT')
-                jogada2 = jogador2_info.get('jogada_atual', 'TIMEOUT')
-
-                vencedor_info, perdedor_info = determinar_vencedor(jogada1, jogador1_info, jogada2, jogador2_info)
-
-                if not vencedor_info:
-                    # Empate: envia a jogada do oponente (que é a mesma)
-                    enviar_comando(jogador1_info['socket'], 'TIE', {"jogada_oponente": jogada2})
-                    enviar_comando(jogador2_info['socket'], 'TIE', {"jogada_oponente": jogada1})
-                else:
-                    # Vitória/Derrota
-                    if vencedor_info == jogador1_info:
-                        enviar_comando(jogador1_info['socket'], 'WIN', {"jogada_oponente": jogada2})
-                        enviar_comando(jogador2_info['socket'], 'LOS', {"jogada_oponente": jogada1})
-                    else:  # vencedor_info == jogador2_info
-                        enviar_comando(jogador2_info['socket'], 'WIN', {"jogada_oponente": jogada1})
-                        enviar_comando(jogador1_info['socket'], 'LOS', {"jogada_oponente": jogada2})
-
-                    pontos[vencedor_info['nome']] += 1
-                    with global_lock:
-                        ranking[vencedor_info['nome']] = ranking.get(vencedor_info['nome'], 0) + 1
-
-                jogador1_info['jogada_atual'] = None
-                jogador2_info['jogada_atual'] = None
-                time.sleep(2)
-
-            vencedor_final_nome = None
-            if pontos[jogador1_info['nome']] > pontos[jogador2_info['nome']]:
-                vencedor_final_nome = jogador1_info['nome']
-            elif pontos[jogador2_info['nome']] > pontos[jogador1_info['nome']]:
-                vencedor_final_nome = jogador2_info['nome']
-
-            msg_final = "A partida terminou em empate!" if not vencedor_final_nome else f"O vencedor da partida foi {vencedor_final_nome}!"
-
-            # END: mensagem
-            enviar_comando(jogador1_info['socket'], 'END', {"mensagem": msg_final})
-            enviar_comando(jogador2_info['socket'], 'END', {"mensagem": msg_final})
-            print(f"Partida entre {jogador1_info['nome']} e {jogador2_info['nome']} finalizada.")
-
-        time.sleep(1)
+    """
+    Escalonador de partidas: retira pares da fila de espera e entrega cada
+    um a um pool de threads, até o limite de partidas simultâneas.
+    Enquanto o limite estiver ocupado, os jogadores continuam na fila.
+
+    Entre uma tentativa e outra, espera aviso_partidas, ligado quando um
+    jogador entra na fila e quando uma partida libera a vaga. A espera tem
+    um limite só para a fila por faixas, em que um par pode surgir sem
+    evento nenhum, quando a janela de faixas alarga com o tempo.
+    """
+    with ThreadPoolExecutor(max_workers=max_partidas_simultaneas,
+                            thread_name_prefix='partida') as executor:
+        while True:
+            aviso_partidas.clear()  # Antes de olhar a fila: um aviso que chegar depois não se perde
+            while vagas_partidas.acquire(blocking=False):
+                par = jogadores_em_espera.retirar_par()
+                if not par:
+                    vagas_partidas.release()
+                    break
+                executor.submit(_jogar_partida_e_liberar, *par)
+
+            aviso_partidas.wait(REVISAO_FILA if jogadores_em_espera.avaliacao else None)
+
+
+def processar_mensagens(conn, addr, jogador_info, mensagens):
+    """
+    Trata as mensagens (comando, payload) decodificadas por um LeitorQuadros.
+    Compartilhada pelos dois motores (threads e asyncio).
+    Retorna (jogador_info, encerrar), onde encerrar indica um QUI.
+    """
+    for comando, payload in mensagens:
+        if comando is None:
+            print(f"ERRO: Mensagem JSON inválida recebida de {addr}: {payload}")
+            continue  # Ignora a mensagem inválida e continua
+        jogador_info, encerrar = processar_mensagem(conn, addr, jogador_info, comando, payload)
+        if encerrar:
+            return jogador_info, True
+    return jogador_info, False
+
+
+def negociar_codec(conn, payload):
+    """
+    Atende o campo opcional 'codec' do CON. Se o cliente pediu um codec
+    suportado, confirma com COD (ainda no formato antigo) e passa a usá-lo
+    em tudo o que enviar a ele. O servidor aceita os dois formatos na
+    entrada, então o cliente pode trocar de formato ao receber o COD.
+    """
+    codec = CODECS.get(payload.get('codec', CODEC_JSON.nome))
+    if codec and codec is not conn.codec:
+        enviar_comando(conn, 'COD', {"codec": codec.nome})
+        conn.codec = codec
+
+
+def processar_mensagem(conn, addr, jogador_info, comando, payload):
+    if comando == 'CON' and not jogador_info:
+        nome_jogador = payload.get('nome')
+        if nome_jogador:
+            negociar_codec(conn, payload)
+            jogador_info = {
+                'socket': conn, 'addr': addr, 'nome': nome_jogador,
+                'slots': None, 'conectado': True, 'trava': threading.Lock()
+            }
+            ranking.registrar(nome_jogador)
+            jogadores_em_espera.entrar(jogador_info)
+            armar_ociosidade(conn, jogador_info)
+            print(f"Jogador '{nome_jogador}' associado à conexão {addr}.")
+        else:
+            print(f"ERRO: Comando CON sem nome de jogador de {addr}.")
+
+    elif comando in ['ROC', 'PAP', 'SCI']:
+        if jogador_info:
+            print(f"Recebida jogada '{comando}' de {jogador_info['nome']}")
+            slots = jogador_info['slots']
+            if not slots or not slots.registrar(jogador_info, comando.lower()):
+                print(f"AVISO: Jogada de {jogador_info['nome']} fora de uma rodada aberta foi ignorada.")
+        else:
+            print(f"AVISO: Jogada '{comando}' recebida de cliente não identificado ({addr}).")
+
+    elif comando == 'RAN':
+        if isinstance(conn, ConexaoAsync) and hasattr(ranking, 'consultar_async'):
+            tarefa = conn.loop.create_task(enviar_ranking_para_cliente_async(conn, payload))
+            consultas_ranking.add(tarefa)  # O loop só guarda referências fracas às tarefas
+            tarefa.add_done_callback(consultas_ranking.discard)
+        else:
+            enviar_ranking_para_cliente(conn, payload)
+
+    elif comando == 'QUI':
+        print(
+            f"Cliente {addr} ({jogador_info['nome'] if jogador_info else 'Desconhecido'}) solicitou desconexão.")
+        return jogador_info, True  # Sai do loop para fechar a conexão
+    else:
+        print(f"Comando desconhecido '{comando}' de {addr}.")
+
+    return jogador_info, False
+
+
+# --- Prazos de conexão ---
+def aceitar_conexao(conn, sock, addr):
+    """Opções de socket e prazo de identificação de uma conexão recém-aceita (nos dois motores)."""
+    configurar_nodelay(sock, tcp_nodelay)
+    if keepalive:
+        configurar_keepalive(sock, keepalive)
+    if prazo_identificacao:
+        conn.temporizador = temporizadores.agendar(prazo_identificacao, expirar_conexao, conn, addr,
+                                                     "não enviou o CON")
+
+
+def armar_ociosidade(conn, jogador_info, atraso=None):
+    """Troca o prazo de identificação pelo de ociosidade, depois do CON."""
+    if conn.temporizador:
+        conn.temporizador.cancelar()
+    conn.temporizador = None
+    if prazo_ocioso:
+        conn.temporizador = temporizadores.agendar(atraso or prazo_ocioso, verificar_ociosidade, conn, jogador_info)
+
+
+def verificar_ociosidade(conn, jogador_info):
+    """
+    Vencimento do prazo de ociosidade (thread da roda). A atividade não
+    reagenda o prazo a cada mensagem: ela só atualiza ultima_atividade, e
+    aqui o prazo é reagendado pelo tempo que falta. Quem está na fila ou
+    em uma partida espera pelo servidor, não está ocioso.
+    """
+    if conn.fechada:
+        return
+    parado = time.monotonic() - conn.ultima_atividade
+    ocupado = (jogador_info['slots'] is not None or jogador_info in jogadores_em_espera
+               or (fila_coordenador is not None and jogador_info in fila_coordenador))
+    if ocupado or parado < prazo_ocioso:
+        armar_ociosidade(conn, jogador_info, prazo_ocioso - parado if not ocupado else None)
+    else:
+        expirar_conexao(conn, jogador_info['addr'], f"ficou {parado:.0f} s sem enviar nada")
+
+
+def expirar_conexao(conn, addr, motivo):
+    """Derruba a conexão; a thread (ou tarefa) do cliente faz o resto em liberar_conexao."""
+    if conn.fechada:
+        return
+    CONEXOES_EXPIRADAS.incrementar()
+    print(f"AVISO: Conexão {addr} derrubada: {motivo}.")
+    conn.abortar()
+
+
+def liberar_conexao(conn, addr, jogador_info):
+    """Remove a conexão do estado global e a fecha."""
+    if conn.temporizador:
+        conn.temporizador.cancelar()
+    clientes_conectados.remover(conn)
+    if jogador_info:
+        jogadores_em_espera.cancelar(jogador_info)
+        with jogador_info['trava']:
+            jogador_info['conectado'] = False
+            if jogador_info['slots']:
+                jogador_info['slots'].desconectar(jogador_info)
+        if fila_coordenador is not None:
+            # Depois de 'conectado' ser desligado: exportar_para_broker não o reenvia mais
+            fila_coordenador.cancelar(jogador_info)
+    conn.close()
+    print(f"[CONEXÃO FECHADA] {addr} - Clientes online: {len(clientes_conectados)}")
 
 
 def lidar_com_cliente(conn, addr):
     print(f"[NOVA CONEXÃO] {addr} conectado.")
     jogador_info = None
-    buffer = ""
+    leitor = LeitorQuadros()
     try:
         while True:
-            dados = conn.recv(4096).decode('utf-8')
-            if not dados: break
+            mensagens = leitor.receber(conn)  # recv_into direto no buffer do leitor
+            if mensagens is None: break
+
+            jogador_info, encerrar = processar_mensagens(conn, addr, jogador_info, mensagens)
+            if encerrar: break
+
+    except (OSError, IndexError, ValueError) as e:  # OSError: reset, keepalive esgotado, socket já fechado
+        print(f"Erro com o cliente {addr}: {e}")
+    finally:
+        liberar_conexao(conn, addr, jogador_info)
 
-            buffer += dados
-            while '\n' in buffer:
-                linha, buffer = buffer.split('\n', 1)
-
-                try:
-                    mensagem_json = json.loads(linha)
-                    comando = mensagem_json.get('type', '').upper()
-                    payload = mensagem_json.get('payload', {})
-                except json.JSONDecodeError:
-                    print(f"ERRO: Mensagem JSON inválida recebida de {addr}: {linha}")
-                    continue  # Ignora a mensagem inválida e continua
-
-                if comando == 'CON' and not jogador_info:
-                    nome_jogador = payload.get('nome')
-                    if nome_jogador:
-                        jogador_info = {
-                            'socket': conn, 'addr': addr, 'nome': nome_jogador, 'jogada_atual': None
-                        }
-                        with global_lock:
-                            jogadores_em_espera.append(jogador_info)
-                            if nome_jogador not in ranking: ranking[nome_jogador] = 0
-                        print(f"Jogador '{nome_jogador}' associado à conexão {addr}.")
-                    else:
-                        print(f"ERRO: Comando CON sem nome de jogador de {addr}.")
-
-                elif comando in ['ROC', 'PAP', 'SCI']:
-                    if jogador_info:
-                        print(f"Recebida jogada '{comando}' de {jogador_info['nome']}")
-                        jogador_info['jogada_atual'] = comando.lower()
-                    else:
-                        print(f"AVISO: Jogada '{comando}' recebida de cliente não identificado ({addr}).")
-
-                elif comando == 'RAN':
-                    enviar_ranking_para_cliente(conn)
-
-                elif comando == 'QUI':
-                    print(
-                        f"Cliente {addr} ({jogador_info['nome'] if jogador_info else 'Desconhecido'}) solicitou desconexão.")
-                    break  # Sai do loop para fechar a conexão
-                else:
-                    print(f"Comando desconhecido '{comando}' de {addr}.")
 
+# --- Motor asyncio ---
+async def lidar_com_cliente_async(reader, writer):
+    addr = writer.get_extra_info('peername')
+    conn = ConexaoAsync(writer, asyncio.get_running_loop(), limite_saida)
+    aceitar_conexao(conn, writer.get_extra_info('socket'), addr)
+    clientes_conectados.adicionar(conn)
+    CONEXOES_ACEITAS.incrementar()
+    print(f"[NOVA CONEXÃO] {addr} conectado. Clientes online: {len(clientes_conectados)}")
+    jogador_info = None
+    leitor = LeitorQuadros()
+    try:
+        while True:
+            dados = await reader.read(4096)
+            if not dados: break
+            BYTES_RECEBIDOS.incrementar(len(dados))
+            conn.ultima_atividade = time.monotonic()
+            jogador_info, encerrar = processar_mensagens(conn, addr, jogador_info, leitor.alimentar(dados))
+            if encerrar: break
     except (ConnectionResetError, IndexError, ValueError) as e:
         print(f"Erro com o cliente {addr}: {e}")
     finally:
-        with global_lock:
-            if conn in clientes_conectados:
-                clientes_conectados.remove(conn)
-            if jogador_info and jogador_info in jogadores_em_espera:
-                jogadores_em_espera.remove(jogador_info)
-        conn.close()
-        print(f"[CONEXÃO FECHADA] {addr} - Clientes online: {len(clientes_conectados)}")
+        liberar_conexao(conn, addr, jogador_info)
+
+
+async def servir_async(servidor_socket):
+    perfilador.loop = asyncio.get_running_loop()
+    servidor = await asyncio.start_server(lidar_com_cliente_async, sock=servidor_socket)
+    async with servidor:
+        await servidor.serve_forever()
+
+
+def servir_threads(servidor_socket):
+    while True:
+        sock, addr = servidor_socket.accept()
+        conn = ConexaoSaida(sock, addr, limite_saida)
+        aceitar_conexao(conn, sock, addr)
+        clientes_conectados.adicionar(conn)
+        CONEXOES_ACEITAS.incrementar()
+        print(f"Nova conexão aceita de {addr}. Clientes online: {len(clientes_conectados)}")
+        thread_cliente = threading.Thread(target=lidar_com_cliente, args=(conn, addr))
+        thread_cliente.start()
+
+
+def servir(servidor_socket, modo):
+    temporizadores.iniciar()
+    try:
+        if modo == 'asyncio':
+            asyncio.run(servir_async(servidor_socket))
+        else:
+            servir_threads(servidor_socket)
+    except OSError:
+        print("Socket do servidor foi fechado. Encerrando...")
+
+
+# --- Modo multiprocesso ---
+def servir_processos(args):
+    """
+    Cria os trabalhadores (cada um aceita conexões na mesma porta, com
+    SO_REUSEPORT, e o kernel distribui as conexões entre eles) e passa a
+    coordenar a fila de pareamento e o ranking, que ficam neste processo.
+    Precisa ser chamada antes de qualquer thread ser criada: os
+    trabalhadores são criados com fork.
+    """
+    global coordenador, jogadores_em_espera
+    contexto = multiprocessing.get_context('fork')
+    canais, herdadas = {}, []
+    for indice in range(args.processos):
+        ponta_coordenador, ponta_trabalhador = contexto.Pipe()
+        herdadas.append(ponta_coordenador)
+        contexto.Process(target=executar_trabalhador, name=f'trabalhador-{indice}', daemon=True,
+                         args=(indice, ponta_trabalhador, list(herdadas), args)).start()
+        ponta_trabalhador.close()  # Só o trabalhador fica com a ponta dele, para o EOF chegar quando ele morrer
+        canais[indice] = ponta_coordenador
+
+    if args.ranking_arquivo:
+        configurar_persistencia(args.ranking_arquivo, args.intervalo_fsync)
+    if args.porta_metricas:
+        configurar_metricas(args.porta_metricas)
+    if args.pareamento == 'vitorias':
+        def criar_fila():
+            return FilaPareamento(ranking.get, args.faixa_vitorias, args.espera_alargamento)
+    else:
+        criar_fila = FilaPareamento
+    coordenador = Coordenador(canais, ranking, criar_fila)
+    jogadores_em_espera = coordenador  # Só para a métrica de jogadores na fila
+
+    print("=" * 40)
+    print(f"[*] Servidor (protocolo JSON) iniciado com {args.processos} processos no modo '{args.modo}'.")
+    print(f"[*] Escutando em todas as interfaces: {HOST}:{args.porta}")
+    print(f"[*] IP local para conexão na rede: {get_local_ip()}:{args.porta}")
+    if args.porta_metricas:
+        print(f"[*] Métricas dos trabalhadores nas portas {args.porta_metricas + 1} a "
+              f"{args.porta_metricas + args.processos}")
+    print("=" * 40)
+
+    threading.Thread(target=gerenciar_servidor_input, args=(None,), daemon=True).start()
+    try:
+        coordenador.executar()
+    finally:
+        if persistencia:
+            persistencia.fechar()
+        print("Coordenador finalizado.")
+
+
+def executar_trabalhador(indice, conexao, herdadas, args):
+    """Processo trabalhador: atende seus clientes e joga as partidas que o coordenador hospedar nele."""
+    global ranking, jogadores_em_espera, canal_coordenador, fila_coordenador, executor_partidas
+    for ponta in herdadas:
+        ponta.close()  # Pontas do coordenador herdadas no fork
+
+    def coordenador_encerrado():
+        print(f"[Trabalhador {indice}] Coordenador encerrado. Saindo...")
+        os._exit(0)
+    canal_coordenador = CanalIPC(conexao, tratar_mensagem_coordenador, coordenador_encerrado)
+    ranking = RankingRemoto(canal_coordenador)
+    jogadores_em_espera = fila_coordenador = FilaRemota(canal_coordenador, indice)
+    executor_partidas = ThreadPoolExecutor(max_workers=max_partidas_simultaneas, thread_name_prefix='partida')
+    if args.modo == 'asyncio':
+        elevar_limite_descritores()
+    if args.porta_metricas:
+        configurar_metricas(args.porta_metricas + 1 + indice)
+
+    servidor_socket = criar_socket_servidor(args.porta, reuse_port=True)
+    canal_coordenador.iniciar()
+    servir(servidor_socket, args.modo)
+
+
+def _info_partida(jid, nome, nome_codec):
+    """jogador_info de um jogador da partida hospedada neste trabalhador."""
+    if jid[0] == fila_coordenador.indice:
+        info = fila_coordenador.pareado(jid)
+        if info:
+            return info
+        # Desconectou enquanto era pareado: entra na partida já desconectado
+        conectado = False
+    else:
+        conectado = True
+    info = {'socket': ConexaoRemota(canal_coordenador, jid, nome_codec), 'addr': None, 'nome': nome,
+            'slots': None, 'conectado': conectado, 'trava': threading.Lock(), 'jid': jid}
+    if conectado:
+        jogadores_remotos[jid] = info
+    return info
+
+
+def tratar_mensagem_coordenador(mensagem):
+    """Mensagens do coordenador para este trabalhador (ver o protocolo em ser_processos)."""
+    tipo = mensagem[0]
+    if tipo == 'partida':
+        jogador1_info, jogador2_info = _info_partida(*mensagem[1]), _info_partida(*mensagem[2])
+        executor_partidas.submit(_hospedar_partida, jogador1_info, jogador2_info, canal_coordenador)
+    elif tipo == 'partida_remota':
+        # A partida deste jogador roda em outro trabalhador: jogadas e desconexão vão para lá
+        jid = mensagem[1]
+        info = fila_coordenador.pareado(jid)
+        if info:
+            with info['trava']:
+                if info['conectado']:
+                    info['slots'] = SlotsRemotos(canal_coordenador, jid)
+                    return
+        canal_coordenador.enviar(('desconectado', jid))
+    elif tipo == 'quadro':
+        info = fila_coordenador.locais.get(mensagem[1])
+        if info:
+            enviar_quadro(info['socket'], mensagem[2], 'relay')
+    elif tipo == 'fim_partida':
+        info = fila_coordenador.locais.get(mensagem[1])
+        if info:
+            with info['trava']:
+                info['slots'] = None
+    elif tipo in ('jogada', 'desconectado'):
+        info = jogadores_remotos.get(mensagem[1])
+        if not info:
+            return
+        with info['trava']:
+            if tipo == 'desconectado':
+                info['conectado'] = False
+            slots = info['slots']
+        if slots:
+            if tipo == 'jogada':
+                slots.registrar(info, mensagem[2])
+            else:
+                slots.desconectar(info)
+    elif tipo == 'registrar':
+        ranking.local.registrar(mensagem[1])  # Jogador novo em outro nó (só com --broker)
+    elif tipo == 'incrementar':
+        ranking.local.incrementar(mensagem[1], mensagem[2])
+    elif tipo == 'end':
+        broadcast_comando("END", {"mensagem": mensagem[1]})
+        time.sleep(1)  # Dá um tempo para as mensagens serem enviadas
+        os._exit(0)
+
+
+# --- Federação (--broker) ---
+def configurar_broker(endereco, chave, espera):
+    """
+    Registra este servidor no broker (ver ser_broker) e mescla os rankings.
+    Os jogadores continuam sendo pareados aqui; quem esperar `espera`
+    segundos na fila local passa para a fila do broker.
+    """
+    global federacao, executor_partidas
+    federacao = (endereco, chave)
+    executor_partidas = ThreadPoolExecutor(max_workers=max_partidas_simultaneas, thread_name_prefix='partida-broker')
+    registrar_no_broker(*conectar_broker(endereco, chave))
+    threading.Thread(target=exportar_para_broker, args=(espera,), name='exportar-broker', daemon=True).start()
+
+
+def registrar_no_broker(conexao, indice, pares):
+    """Passa a usar a conexão (nova) com o broker: mescla os rankings e troca o canal e a fila remota."""
+    global ranking, canal_coordenador, fila_coordenador
+    canal = CanalIPC(conexao, tratar_mensagem_coordenador, broker_perdido)
+    if isinstance(ranking, RankingFederado):
+        ranking.canal = canal  # Reconexão: as vitórias daqui em diante vão pelo canal novo
+    else:
+        ranking = RankingFederado(ranking, canal)
+    ranking.local.mesclar(pares)
+    with ranking.local.travado():
+        pares = list(ranking.local.itens())
+    canal.enviar(('mesclar', pares))
+    fila_coordenador = FilaRemota(canal, indice)
+    canal_coordenador = canal
+    canal.iniciar()
+    print(f"[*] Registrado no broker {federacao[0][0]}:{federacao[0][1]} como nó {indice}.")
+
+
+def exportar_para_broker(espera):
+    """Passa para a fila do broker os jogadores que esperaram demais na fila local."""
+    while True:
+        if not canal_coordenador.fechado:  # Sem broker, todos ficam na fila local
+            for jogador_info in jogadores_em_espera.retirar_antigos(espera):
+                with jogador_info['trava']:
+                    if jogador_info['conectado']:
+                        fila_coordenador.entrar(jogador_info)
+        time.sleep(min(espera, 1.0) / 2)
+
+
+def reconectar_broker():
+    """
+    Tenta voltar ao broker até conseguir, dobrando a espera a cada falha
+    (até RECONEXAO_BROKER_MAXIMA) e sorteando parte dela, para os nós de
+    um broker reiniciado não voltarem todos ao mesmo tempo.
+    """
+    espera = RECONEXAO_BROKER_INICIAL
+    while True:
+        time.sleep(random.uniform(espera / 2, espera))
+        try:
+            registrar_no_broker(*conectar_broker(*federacao))
+            return
+        except (OSError, EOFError, multiprocessing.AuthenticationError) as e:
+            espera = min(espera * 2, RECONEXAO_BROKER_MAXIMA)
+            print(f"AVISO: Broker inacessível ({e or type(e).__name__}); nova tentativa em até {espera:.0f} s.")
+
+
+def broker_perdido():
+    """
+    A conexão com o broker caiu: quem aguardava na fila dele volta para a fila
+    local, e as partidas com jogadores de outros nós são interrompidas (o
+    jogador remoto perde as rodadas restantes por TIMEOUT). Uma thread
+    fica tentando voltar ao broker (ver reconectar_broker).
+    """
+    print("AVISO: Conexão com o broker perdida; o pareamento continua só neste servidor até ele voltar.")
+    for jid in list(fila_coordenador.aguardando):
+        jogador_info = fila_coordenador.pareado(jid)
+        if jogador_info:
+            jogadores_em_espera.entrar(jogador_info)
+    for jogador_info in list(fila_coordenador.locais.values()):
+        with jogador_info['trava']:
+            if not isinstance(jogador_info['slots'], SlotsRemotos):
+                continue
+            jogador_info['slots'] = None
+        enviar_comando(jogador_info['socket'], 'END',
+                       {"mensagem": "A partida foi interrompida: o servidor do oponente ficou inacessível."})
+    for info in list(jogadores_remotos.values()):
+        tratar_mensagem_coordenador(('desconectado', info['jid']))
+    threading.Thread(target=reconectar_broker, name='reconectar-broker', daemon=True).start()
 
 
 def gerenciar_servidor_input(servidor_socket):
     """Thread para ler comandos do administrador no console do servidor."""
-    print("Console do servidor iniciado. Digite 'end <mensagem>' para encerrar.")
+    print("Console do servidor iniciado. Digite 'end <mensagem>' para encerrar, "
+          "'travas' para ver a contenção ou 'metricas' para ver as métricas.")
     for linha in sys.stdin:
         partes = linha.strip().split(' ', 1)
         comando = partes[0].lower()
@@ -216,15 +838,61 @@ def gerenciar_servidor_input(servidor_socket):
 
         if comando == "end":
             print("Comando de encerramento recebido...")
-            broadcast_comando("END", {"mensagem": payload_msg})  # Adiciona a mensagem ao payload
+            if coordenador is not None:
+                coordenador.encerrar(payload_msg)  # Cada trabalhador envia o END aos seus clientes
+            else:
+                broadcast_comando("END", {"mensagem": payload_msg})  # Adiciona a mensagem ao payload
             time.sleep(1)  # Dá um tempo para as mensagens serem enviadas
-            servidor_socket.close()
+            if servidor_socket:
+                servidor_socket.close()
+            if persistencia:
+                persistencia.fechar()
             print("Servidor encerrado.")
             os._exit(0)  # Força o encerramento de todas as threads
+        elif comando == "travas":
+            # Contenção de cada trava instrumentada, da mais disputada para a menos
+            for estatistica in relatorio_travas():
+                print(f"{estatistica['nome']:<14} aquisições={estatistica['aquisicoes']:<10} "
+                      f"contenções={estatistica['contencoes']:<8} espera={estatistica['espera_total'] * 1000:.1f} ms")
+        elif comando == "metricas":
+            print(exposicao(), end='')
+        elif comando == "perfil":
+            comando_perfil(partes[1].split() if len(partes) > 1 else [])
+        elif comando == "memoria":
+            print(memoria(partes[1].strip() if len(partes) > 1 else 'diff'))
+        elif comando == "pilhas":
+            if len(partes) > 1 and partes[1].strip() == 'tarefas':
+                print(pilhas_tarefas(perfilador.loop) if perfilador.loop else "[pilhas] O servidor não está no modo asyncio.")
+            else:
+                print(pilhas_threads())
         else:
             print(f"Comando '{comando}' desconhecido.")
 
 
+def comando_perfil(argumentos):
+    """perfil cprofile|amostras <segundos> [arquivo] | perfil parar"""
+    if argumentos[:1] == ['parar']:
+        print("[perfil] Parando..." if perfilador.parar() else "[perfil] Nenhum perfil em andamento.")
+        return
+    if len(argumentos) < 2 or argumentos[0] not in ('cprofile', 'amostras'):
+        print("Uso: perfil cprofile|amostras <segundos> [arquivo]  |  perfil parar")
+        return
+    tipo = argumentos[0]
+    try:
+        segundos = float(argumentos[1])
+    except ValueError:
+        print(f"[perfil] Duração inválida: '{argumentos[1]}'.")
+        return
+    extensao = 'prof' if tipo == 'cprofile' else 'txt'
+    arquivo = argumentos[2] if len(argumentos) > 2 else f"perfil-{tipo}-{time.strftime('%Y%m%d-%H%M%S')}.{extensao}"
+    try:
+        perfilador.iniciar(tipo, segundos, arquivo)
+    except RuntimeError as e:
+        print(f"[perfil] {e}")
+        return
+    print(f"[perfil] '{tipo}' por {segundos:g} s; o resultado será gravado em '{arquivo}'.")
+
+
 def get_local_ip():
     """Função para obter o endereço de IP local da máquina."""
     s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -239,17 +907,137 @@ def get_local_ip():
     return IP
 
 
-def main():
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor de Pedra, Papel e Tesoura (protocolo JSON).")
+    parser.add_argument('--modo', choices=MODOS_SERVIDOR, default='threads',
+                        help="motor de conexões: uma thread por cliente ou um único loop asyncio")
+    parser.add_argument('--porta', type=int, default=PORT)
+    parser.add_argument('--processos', type=int, default=1,
+                        help="processos trabalhadores aceitando na mesma porta (SO_REUSEPORT), "
+                             "com fila e ranking em um processo coordenador")
+    parser.add_argument('--max-partidas', type=int, default=MAX_PARTIDAS_SIMULTANEAS,
+                        help="número máximo de partidas jogadas simultaneamente")
+    parser.add_argument('--prazo-rodada', type=float, default=TEMPO_LIMITE_RODADA,
+                        help="segundos para os dois jogadores enviarem a jogada de uma rodada")
+    parser.add_argument('--prazo-identificacao', type=float, default=PRAZO_IDENTIFICACAO,
+                        help="segundos para uma conexão nova enviar o CON antes de ser derrubada (0 desliga)")
+    parser.add_argument('--prazo-ocioso', type=float, default=PRAZO_OCIOSO,
+                        help="segundos sem receber nada de um jogador fora da fila e de partidas "
+                             "antes de derrubá-lo (0 desliga)")
+    parser.add_argument('--keepalive', type=int, default=KEEPALIVE,
+                        help="segundos sem tráfego antes de o TCP sondar o cliente (0 desliga)")
+    parser.add_argument('--pareamento', choices=MODOS_PAREAMENTO, default='fifo',
+                        help="ordem de chegada ou faixas de vitórias do ranking")
+    parser.add_argument('--faixa-vitorias', type=int, default=5,
+                        help="largura, em vitórias, de cada faixa do pareamento por vitórias")
+    parser.add_argument('--espera-alargamento', type=float, default=10.0,
+                        help="segundos de espera para a janela de faixas crescer uma faixa")
+    parser.add_argument('--limite-saida', type=int, default=LIMITE_SAIDA_PADRAO,
+                        help="bytes pendentes de envio a partir dos quais um cliente lento é desconectado")
+    parser.add_argument('--tcp-nodelay', action=argparse.BooleanOptionalAction, default=True,
+                        help="desliga o algoritmo de Nagle nas conexões dos clientes (--no-tcp-nodelay o mantém)")
+    parser.add_argument('--porta-metricas', type=int, default=None,
+                        help="serve as métricas em http://127.0.0.1:PORTA/metrics (desligado por padrão)")
+    parser.add_argument('--ranking-arquivo', default=None,
+                        help="caminho base dos arquivos do ranking em disco (sem ele, o ranking fica só em memória)")
+    parser.add_argument('--intervalo-fsync', type=float, default=1.0,
+                        help="segundos entre gravações em lote do ranking em disco")
+    parser.add_argument('--broker', type=endereco_broker, default=None, metavar='HOST:PORTA',
+                        help="registra o servidor em um ser_broker, para parear jogadores com outros servidores")
+    parser.add_argument('--chave-broker', default=None,
+                        help="chave compartilhada com o broker (ou a variável SER_BROKER_CHAVE)")
+    parser.add_argument('--espera-broker', type=float, default=2.0,
+                        help="segundos na fila local antes de o jogador passar para a fila do broker")
+    args = parser.parse_args(argv)
+    if args.processos > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        parser.error("--processos exige SO_REUSEPORT, indisponível nesta plataforma")
+    if args.broker:
+        if args.processos > 1:
+            parser.error("--broker não pode ser combinado com --processos")
+        args.chave_broker = ler_chave(args.chave_broker)
+        if not args.chave_broker:
+            parser.error("--broker exige --chave-broker (ou a variável SER_BROKER_CHAVE)")
+    return args
+
+
+def configurar_saida(limite, nodelay=True):
+    global limite_saida, tcp_nodelay
+    limite_saida = limite
+    tcp_nodelay = nodelay
+
+
+def configurar_prazos(identificacao=PRAZO_IDENTIFICACAO, ocioso=PRAZO_OCIOSO, segundos_keepalive=KEEPALIVE):
+    global prazo_identificacao, prazo_ocioso, keepalive
+    prazo_identificacao = identificacao
+    prazo_ocioso = ocioso
+    keepalive = segundos_keepalive
+
+
+def configurar_partidas(maximo, prazo_rodada=TEMPO_LIMITE_RODADA):
+    global max_partidas_simultaneas, vagas_partidas, tempo_limite_rodada
+    max_partidas_simultaneas = maximo
+    vagas_partidas = threading.BoundedSemaphore(maximo)
+    tempo_limite_rodada = prazo_rodada
+
+
+def configurar_pareamento(largura_faixa, espera_alargamento):
+    """Troca a fila FIFO por uma fila que pareia por faixas de vitórias."""
+    global jogadores_em_espera
+    jogadores_em_espera = FilaPareamento(ranking.get, largura_faixa, espera_alargamento, aviso_partidas)
+
+
+def configurar_persistencia(base, intervalo_fsync):
+    """Carrega o ranking salvo em disco e passa a gravar cada vitória nele."""
+    global persistencia
+    persistencia = RankingDuravel(base, intervalo_fsync)
+    persistencia.carregar(ranking)
+    ranking.persistencia = persistencia
+    persistencia.iniciar(ranking)
+    print(f"[*] Ranking carregado de '{base}': {len(ranking)} jogadores.")
+
+
+def configurar_metricas(porta):
+    """Abre o endpoint de métricas, acessível apenas pela própria máquina."""
+    iniciar_endpoint(porta)
+    print(f"[*] Métricas em http://127.0.0.1:{porta}/metrics")
+
+
+def criar_socket_servidor(porta, reuse_port=False):
     servidor_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     servidor_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-    servidor_socket.bind((HOST, PORT))
-    servidor_socket.listen(5)
+    if reuse_port:
+        servidor_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    servidor_socket.bind((HOST, porta))
+    servidor_socket.listen(BACKLOG)
+    return servidor_socket
+
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    configurar_partidas(args.max_partidas, args.prazo_rodada)
+    configurar_saida(args.limite_saida, args.tcp_nodelay)
+    configurar_prazos(args.prazo_identificacao, args.prazo_ocioso, args.keepalive)
+    if args.processos > 1:
+        servir_processos(args)
+        return
+    if args.pareamento == 'vitorias':
+        configurar_pareamento(args.faixa_vitorias, args.espera_alargamento)
+    if args.ranking_arquivo:
+        configurar_persistencia(args.ranking_arquivo, args.intervalo_fsync)
+    if args.modo == 'asyncio':
+        elevar_limite_descritores()
+    if args.porta_metricas:
+        configurar_metricas(args.porta_metricas)
+    if args.broker:
+        configurar_broker(args.broker, args.chave_broker, args.espera_broker)
+
+    servidor_socket = criar_socket_servidor(args.porta)
 
     local_ip = get_local_ip()
     print("=" * 40)
-    print(f"[*] Servidor (protocolo JSON) iniciado.")
-    print(f"[*] Escutando em todas as interfaces: {HOST}:{PORT}")
-    print(f"[*] IP local para conexão na rede: {local_ip}:{PORT}")
+    print(f"[*] Servidor (protocolo JSON) iniciado no modo '{args.modo}'.")
+    print(f"[*] Escutando em todas as interfaces: {HOST}:{args.porta}")
+    print(f"[*] IP local para conexão na rede: {local_ip}:{args.porta}")
     print("=" * 40)
 
     # Thread para gerenciar o início das partidas
@@ -261,18 +1049,12 @@ def main():
     thread_input_servidor.start()
 
     try:
-        while True:
-            conn, addr = servidor_socket.accept()
-            with global_lock:
-                clientes_conectados.append(conn)
-            print(f"Nova conexão aceita de {addr}. Clientes online: {len(clientes_conectados)}")
-            thread_cliente = threading.Thread(target=lidar_com_cliente, args=(conn, addr))
-            thread_cliente.start()
-    except OSError:
-        print("Socket do servidor foi fechado. Encerrando...")
+        servir(servidor_socket, args.modo)
     finally:
+        if persistencia:
+            persistencia.fechar()
         print("Loop principal do servidor finalizado.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,15 @@
+# ser_sistema.py (Ajustes do sistema operacional usados pelo servidor e pelo gerador de carga)
+
+
+def elevar_limite_descritores():
+    """Eleva o limite de descritores abertos ao máximo permitido (apenas Unix)."""
+    try:
+        import resource
+    except ImportError:
+        return
+    suave, rigido = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if suave < rigido:
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (rigido, rigido))
+        except (ValueError, OSError):
+            pass
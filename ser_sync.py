@@ -0,0 +1,68 @@
+# ser_sync.py (Travas instrumentadas do servidor)
+
+import threading
+import time
+import weakref
+
+# Travas instrumentadas ainda em uso, para relatórios de contenção. Referências fracas: a trava de
+# uma estrutura descartada (ex.: a fila de um nó que saiu do broker) some do relatório junto com ela
+TRAVAS = weakref.WeakSet()
+_trava_registro = threading.Lock()
+
+
+class TravaInstrumentada:
+    """
+    threading.Lock que conta aquisições, contenções (quando a trava já estava
+    ocupada) e o tempo total esperado por ela. A primeira tentativa é sem
+    bloqueio, então o caminho sem disputa custa quase o mesmo que um Lock.
+    Os contadores só são alterados por quem detém a trava.
+    """
+
+    def __init__(self, nome):
+        self.nome = nome
+        self._trava = threading.Lock()
+        self.aquisicoes = 0
+        self.contencoes = 0
+        self.espera_total = 0.0
+        with _trava_registro:
+            TRAVAS.add(self)
+
+    def acquire(self, blocking=True, timeout=-1):
+        if self._trava.acquire(False):
+            self.aquisicoes += 1
+            return True
+        if not blocking:
+            return False
+        inicio = time.perf_counter()
+        if not self._trava.acquire(True, timeout):
+            return False
+        self.aquisicoes += 1
+        self.contencoes += 1
+        self.espera_total += time.perf_counter() - inicio
+        return True
+
+    def release(self):
+        self._trava.release()
+
+    def locked(self):
+        return self._trava.locked()
+
+    __enter__ = acquire
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def estatisticas(self):
+        return {
+            'nome': self.nome,
+            'aquisicoes': self.aquisicoes,
+            'contencoes': self.contencoes,
+            'espera_total': self.espera_total,
+        }
+
+
+def relatorio_travas():
+    """Estatísticas de todas as travas instrumentadas, da mais disputada para a menos."""
+    with _trava_registro:
+        travas = list(TRAVAS)
+    return sorted((trava.estatisticas() for trava in travas), key=lambda e: e['espera_total'], reverse=True)
@@ -0,0 +1,133 @@
+# ser_temporizador.py (Roda de temporizadores hierárquica do servidor)
+
+import threading
+import time
+
+RESOLUCAO_PADRAO = 0.1  # Segundos por tique: precisão de todos os prazos
+BITS_NIVEIS = (8, 6, 6, 6)  # 256 tiques no primeiro nível e 64 posições em cada nível seguinte
+
+
+class Temporizador:
+    """Um prazo agendado na roda; cancelar() custa O(1) e pode ser chamado mais de uma vez."""
+    __slots__ = ('roda', 'expira', 'funcao', 'args', 'balde')
+
+    def __init__(self, roda, expira, funcao, args):
+        self.roda = roda
+        self.expira = expira  # Tique em que o temporizador vence
+        self.funcao = funcao
+        self.args = args
+        self.balde = None  # Posição (dict) da roda onde ele está, ou None se venceu ou foi cancelado
+
+    def cancelar(self):
+        self.roda.cancelar(self)
+
+    @property
+    def ativo(self):
+        return self.balde is not None
+
+
+class RodaTemporizadores:
+    """
+    Roda de temporizadores hierárquica: todos os prazos do servidor (rodada,
+    identificação, ociosidade) ficam aqui, e uma única thread os vence.
+
+    O nível 0 tem uma posição por tique; cada nível seguinte tem posições
+    que cobrem uma volta inteira do nível anterior. Um temporizador é
+    guardado no nível mais baixo que alcança o seu vencimento e desce de
+    nível (no máximo uma vez por nível) quando a volta de baixo se
+    completa. Agendar, cancelar e vencer custam O(1), independente de
+    quantos prazos existem. Cada posição é um dict, para cancelar sem busca.
+
+    As funções vencidas são chamadas na thread da roda, fora da trava, e
+    devem ser rápidas (acordar uma thread, fechar um socket).
+    """
+
+    def __init__(self, resolucao=RESOLUCAO_PADRAO, bits_niveis=BITS_NIVEIS):
+        self.resolucao = resolucao
+        self.bits = bits_niveis
+        self.deslocamentos = [sum(bits_niveis[:nivel]) for nivel in range(len(bits_niveis))]
+        self.niveis = [[{} for _ in range(1 << bits)] for bits in bits_niveis]
+        self.alcance = 1 << sum(bits_niveis)  # Tiques cobertos pela roda inteira
+        self.tique = 0  # Último tique processado
+        self.inicio = time.monotonic()
+        self.quantidade = 0
+        self.trava = threading.Lock()
+        self.thread = None
+
+    def __len__(self):
+        return self.quantidade
+
+    def iniciar(self):
+        """Inicia a thread da roda (uma vez por processo)."""
+        with self.trava:
+            if self.thread:
+                return
+            self.inicio = time.monotonic() - self.tique * self.resolucao
+            self.thread = threading.Thread(target=self._girar, name='temporizadores', daemon=True)
+        self.thread.start()
+
+    def agendar(self, atraso, funcao, *args):
+        """Chama funcao(*args) daqui a `atraso` segundos (arredondado para cima, no mínimo um tique)."""
+        tiques = max(1, -int(-atraso // self.resolucao))
+        with self.trava:
+            temporizador = Temporizador(self, self.tique + tiques, funcao, args)
+            self._inserir(temporizador)
+            self.quantidade += 1
+        return temporizador
+
+    def cancelar(self, temporizador):
+        with self.trava:
+            if temporizador.balde is not None:
+                del temporizador.balde[temporizador]
+                temporizador.balde = None
+                self.quantidade -= 1
+
+    def _inserir(self, temporizador):
+        # Chamado com a trava adquirida
+        restante = min(temporizador.expira - self.tique, self.alcance - 1)
+        ultimo = len(self.bits) - 1
+        for nivel, (bits, deslocamento) in enumerate(zip(self.bits, self.deslocamentos)):
+            if restante < 1 << (deslocamento + bits) or nivel == ultimo:
+                # Prazos além do alcance ficam na última posição e são reinseridos ao descer
+                posicao = ((self.tique + restante) >> deslocamento) & ((1 << bits) - 1)
+                balde = self.niveis[nivel][posicao]
+                balde[temporizador] = None
+                temporizador.balde = balde
+                return
+
+    def _avancar(self):
+        """Avança um tique e retorna os temporizadores vencidos nele."""
+        with self.trava:
+            self.tique += 1
+            # Ao completar uma volta de um nível, a posição atual do nível de cima desce
+            for nivel in range(1, len(self.bits)):
+                if self.tique & ((1 << self.deslocamentos[nivel]) - 1):
+                    break
+                posicao = (self.tique >> self.deslocamentos[nivel]) & ((1 << self.bits[nivel]) - 1)
+                balde = self.niveis[nivel][posicao]
+                self.niveis[nivel][posicao] = {}
+                for temporizador in balde:
+                    self._inserir(temporizador)
+            posicao = self.tique & ((1 << self.bits[0]) - 1)
+            vencidos = self.niveis[0][posicao]
+            if not vencidos:
+                return ()
+            self.niveis[0][posicao] = {}
+            for temporizador in vencidos:
+                temporizador.balde = None
+            self.quantidade -= len(vencidos)
+            return list(vencidos)
+
+    def _girar(self):
+        while True:
+            proximo = self.inicio + (self.tique + 1) * self.resolucao
+            espera = proximo - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            # Se a thread atrasou (ex.: GC, carga), processa os tiques atrasados em sequência
+            while self.inicio + (self.tique + 1) * self.resolucao <= time.monotonic():
+                for temporizador in self._avancar():
+                    try:
+                        temporizador.funcao(*temporizador.args)
+                    except Exception as e:
+                        print(f"ERRO em temporizador {getattr(temporizador.funcao, '__name__', temporizador.funcao)}: {e}")
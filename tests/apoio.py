@@ -0,0 +1,97 @@
+# Apoio aos testes que sobem o servidor (e o broker) em outros processos, em portas de localhost
+
+import os
+import socket
+import subprocess
+import sys
+import time
+
+from ser_protocolo import CODECS, CODEC_JSON, LeitorQuadros
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PRAZO = 15.0
+
+
+def porta_livre():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Processo:
+    """Um ser_broker ou ser_server rodando em outro processo, com a saída em um arquivo."""
+
+    def __init__(self, diretorio, nome, argumentos, pronto):
+        self.saida = diretorio / f'{nome}.log'
+        with open(self.saida, 'w') as arquivo:
+            self.processo = subprocess.Popen([sys.executable, *argumentos], cwd=RAIZ, stdin=subprocess.PIPE,
+                                             stdout=arquivo, stderr=subprocess.STDOUT,
+                                             env=dict(os.environ, PYTHONUNBUFFERED='1'))
+        self.esperar(pronto)
+
+    def texto(self):
+        return self.saida.read_text()
+
+    def esperar(self, trecho, vezes=1):
+        limite = time.monotonic() + PRAZO
+        while self.texto().count(trecho) < vezes:
+            assert self.processo.poll() is None, self.texto()
+            assert time.monotonic() < limite, f"'{trecho}' não apareceu:\n{self.texto()}"
+            time.sleep(0.05)
+
+    def parar(self):
+        self.processo.kill()
+        self.processo.wait()
+
+
+class Cliente:
+    """Cliente mínimo e síncrono do ser_server (JSON, ou binário depois do COD)."""
+
+    def __init__(self, porta, nome, codec=None):
+        self.sock = socket.create_connection(('127.0.0.1', porta), timeout=PRAZO)
+        self.codec = CODEC_JSON
+        self.leitor = LeitorQuadros()
+        self.pendentes = []
+        self.enviar('CON', {'nome': nome, 'codec': codec} if codec else {'nome': nome})
+
+    def enviar(self, comando, payload=None):
+        self.sock.sendall(self.codec.codificar(comando, payload))
+
+    def receber(self):
+        while not self.pendentes:
+            dados = self.sock.recv(65536)
+            assert dados, "o servidor fechou a conexão"
+            self.pendentes.extend(self.leitor.alimentar(dados))
+        comando, payload = self.pendentes.pop(0)
+        if comando == 'COD':
+            self.codec = CODECS[payload['codec']]
+        return comando, payload
+
+    def esperar(self, comando):
+        while True:
+            recebido, payload = self.receber()
+            if recebido == comando:
+                return payload
+
+    def jogar(self, jogada):
+        """
+        Joga sempre a mesma jogada até o END (com jogada None, não responde
+        os PLA); retorna os (resultado, jogada do oponente) das rodadas.
+        """
+        resultados = []
+        while True:
+            comando, payload = self.receber()
+            if comando == 'PLA' and jogada:
+                self.enviar(jogada)
+            elif comando in ('WIN', 'LOS', 'TIE'):
+                resultados.append((comando, payload['jogada_oponente']))
+            elif comando == 'END':
+                return resultados
+
+    def vitorias(self, nome):
+        self.enviar('RAN', {'nome': nome, 'limit': 10})
+        pagina = self.esperar('RAN')
+        return next((item['vitorias'] for item in pagina['ranking'] if item['nome'] == nome), 0)
+
+    def fechar(self):
+        self.sock.close()
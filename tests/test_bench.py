@@ -0,0 +1,30 @@
+# Testes dos cenários do bench.py (os benchmarks comparados precisam fazer o mesmo trabalho)
+
+import bench
+
+
+def test_rodada_e_partida_em_cache_geram_os_mesmos_quadros_que_o_json():
+    assert bench._rodada_cache() == bench._rodada_json()
+    assert bench._partida_cache() == bench._partida_json()
+    assert len(bench._partida_json()) == 2 + 3 * 4 + 1
+
+
+def test_cenario_do_ranking_restaura_o_ranking_global():
+    import ser_server
+    original = ser_server.ranking
+    medidos = []
+
+    def medicao(funcao):
+        assert ser_server.ranking is not original  # Durante a medição, vale o ranking do cenário
+        funcao()
+        medidos.append(funcao)
+        return 1.0
+
+    assert bench.medir_cenario(bench._preparar_ranking(100), medicao) == 1.0
+    assert medidos and ser_server.ranking is original
+
+
+def test_nome_do_resolve_rounds_nao_depende_do_backend():
+    assert 'game.resolve_rounds.1000000_rodadas' in bench.BENCHMARKS
+    assert bench.BACKEND_RODADAS in ('numpy', 'python')
+    assert not [nome for nome in bench.BENCHMARKS if 'numpy' in nome or '.python.' in nome]
@@ -0,0 +1,79 @@
+# Testes da lógica das rodadas (game)
+
+import itertools
+
+import pytest
+
+import game
+from game import (OUTCOME_TABLE, ROCK, PAPER, SCISSORS, TIMEOUT, determine_winner, encode_moves,
+                  resolve_moves, resolve_round, resolve_rounds)
+
+LETRAS = ('P', 'A', 'T')
+NOMES = ('roc', 'pap', 'sci')
+VENCE = {'P': 'T', 'A': 'P', 'T': 'A'}
+
+
+def _regra_original(jogada1, jogada2):
+    """A regra do determine_winner antes da tabela, para jogadas válidas."""
+    if jogada1 == jogada2:
+        return 0
+    return 1 if VENCE[jogada1] == jogada2 else -1
+
+
+@pytest.mark.parametrize('jogada1, jogada2', list(itertools.product(LETRAS, repeat=2)))
+def test_jogadas_validas_seguem_a_regra_original(jogada1, jogada2):
+    esperado = _regra_original(jogada1, jogada2)
+    assert determine_winner(jogada1, jogada2) == esperado
+    nome1, nome2 = NOMES[LETRAS.index(jogada1)], NOMES[LETRAS.index(jogada2)]
+    assert resolve_moves(nome1, nome2) == esperado
+
+
+@pytest.mark.parametrize('jogada', LETRAS + NOMES)
+def test_timeout_perde_para_qualquer_jogada_e_empata_consigo(jogada):
+    assert resolve_moves(jogada, 'TIMEOUT') == 1
+    assert resolve_moves('TIMEOUT', jogada) == -1
+    assert resolve_moves('TIMEOUT', 'TIMEOUT') == 0
+
+
+@pytest.mark.parametrize('desconhecida', [None, '', 'xyz', 'p', 'Pedra', 42])
+def test_jogada_desconhecida_conta_como_timeout_dos_dois_lados(desconhecida):
+    for jogada in LETRAS + NOMES:
+        assert resolve_moves(jogada, desconhecida) == 1
+        assert resolve_moves(desconhecida, jogada) == -1
+        assert determine_winner(jogada, desconhecida) == 1
+    assert resolve_moves(desconhecida, 'TIMEOUT') == 0
+    assert resolve_moves(desconhecida, 'outra') == 0
+
+
+def test_determine_winner_passa_por_resolve_moves(monkeypatch):
+    chamadas = []
+    monkeypatch.setattr(game, 'resolve_moves', lambda *jogadas: chamadas.append(jogadas) or 7)
+    assert determine_winner('P', 'A') == 7
+    assert chamadas == [('P', 'A')]
+
+
+def test_tabela_e_antissimetrica():
+    for codigo1, codigo2 in itertools.product((ROCK, PAPER, SCISSORS, TIMEOUT), repeat=2):
+        assert resolve_round(codigo1, codigo2) == -resolve_round(codigo2, codigo1)
+
+
+def test_resolve_rounds_confere_com_a_rodada_a_rodada():
+    jogadas = list(itertools.product(NOMES + ('TIMEOUT', None), repeat=2)) * 3
+    jogadas1 = encode_moves(jogada1 for jogada1, _ in jogadas)
+    jogadas2 = encode_moves(jogada2 for _, jogada2 in jogadas)
+    resultados = resolve_rounds(jogadas1, jogadas2)
+    assert list(resultados) == [resolve_moves(jogada1, jogada2) for jogada1, jogada2 in jogadas]
+    assert list(resolve_rounds(list(jogadas1), bytearray(jogadas2))) == list(resultados)
+
+
+def test_resolve_rounds_sem_numpy(monkeypatch):
+    monkeypatch.setattr(game, 'numpy', None)
+    codigos = list(itertools.product(range(4), repeat=2))
+    resultados = resolve_rounds(bytes(c1 for c1, _ in codigos), bytes(c2 for _, c2 in codigos))
+    assert list(resultados) == [OUTCOME_TABLE[c1 << 2 | c2] for c1, c2 in codigos]
+    assert list(resolve_rounds(b'', b'')) == []
+
+
+def test_resolve_rounds_exige_o_mesmo_tamanho():
+    with pytest.raises(ValueError):
+        resolve_rounds(b'\0\1', b'\0')
@@ -0,0 +1,81 @@
+# Testes da cifragem autenticada dos quadros P2P (p2p_crypto)
+
+import pytest
+
+from p2p_crypto import (MODP_2048_PRIME, PUBLIC_KEY_SIZE, AuthenticationError, SessionCipher, decode_public,
+                        encode_public, generate_keypair)
+
+
+def _sessao(psk1=b'chave', psk2=b'chave'):
+    """As duas pontas de uma sessão, cada uma com a sua chave pré-compartilhada."""
+    privada1, publica1 = generate_keypair()
+    privada2, publica2 = generate_keypair()
+    return SessionCipher(privada1, publica1, publica2, psk1), SessionCipher(privada2, publica2, publica1, psk2)
+
+
+@pytest.mark.parametrize('tamanho', [0, 1, 63, 64, 65, 1500, 5000])
+def test_ida_e_volta_nos_dois_sentidos(tamanho):
+    ponta1, ponta2 = _sessao()
+    texto = bytes(range(256)) * (tamanho // 256) + bytes(tamanho % 256)
+    for origem, destino in ((ponta1, ponta2), (ponta2, ponta1), (ponta1, ponta2)):
+        quadro = origem.seal(texto)
+        assert len(quadro) == 8 + tamanho + 16
+        assert destino.open(quadro) == texto
+
+
+def test_texto_cifrado_muda_a_cada_quadro():
+    ponta1, _ = _sessao()
+    texto = b'P' * 32
+    quadro1, quadro2 = ponta1.seal(texto), ponta1.seal(texto)
+    assert texto not in quadro1 and quadro1[8:-16] != quadro2[8:-16]
+
+
+def test_qualquer_byte_adulterado_e_rejeitado():
+    ponta1, ponta2 = _sessao()
+    quadro = ponta1.seal(b'reveal rodada 1')
+    for posicao in range(len(quadro)):
+        adulterado = bytearray(quadro)
+        adulterado[posicao] ^= 0x01
+        with pytest.raises(AuthenticationError):
+            ponta2.open(bytes(adulterado))
+    assert ponta2.open(quadro) == b'reveal rodada 1'  # O original continua valendo
+    with pytest.raises(AuthenticationError):
+        ponta2.open(quadro[:20])
+
+
+def test_reenvio_reordenacao_e_supressao_sao_rejeitados():
+    ponta1, ponta2 = _sessao()
+    quadros = [ponta1.seal(bytes((numero,))) for numero in range(4)]
+    assert ponta2.open(quadros[0]) == b'\x00'
+    with pytest.raises(AuthenticationError):
+        ponta2.open(quadros[0])  # Reenviado
+    with pytest.raises(AuthenticationError):
+        ponta2.open(quadros[2])  # O 1 foi suprimido
+    assert ponta2.open(quadros[1]) == b'\x01'
+
+
+def test_quadro_nao_volta_para_quem_enviou():
+    ponta1, _ = _sessao()
+    with pytest.raises(AuthenticationError):
+        ponta1.open(ponta1.seal(b'eco'))
+
+
+def test_chave_pre_compartilhada_diferente_falha_no_primeiro_quadro():
+    ponta1, ponta2 = _sessao(b'chave', b'outra')
+    with pytest.raises(AuthenticationError):
+        ponta2.open(ponta1.seal(b'commit'))
+
+
+@pytest.mark.parametrize('publica', [0, 1, MODP_2048_PRIME - 1, MODP_2048_PRIME])
+def test_chaves_publicas_triviais_sao_recusadas(publica):
+    with pytest.raises(AuthenticationError):
+        decode_public(publica.to_bytes(PUBLIC_KEY_SIZE, 'big'))
+
+
+def test_chave_publica_de_tamanho_errado_ou_refletida_e_recusada():
+    privada, publica = generate_keypair()
+    assert decode_public(encode_public(publica)) == publica
+    with pytest.raises(AuthenticationError):
+        decode_public(encode_public(publica)[1:])
+    with pytest.raises(AuthenticationError):
+        SessionCipher(privada, publica, publica)
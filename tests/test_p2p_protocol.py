@@ -0,0 +1,120 @@
+# Testes do protocolo P2P com commit-reveal (p2p_protocol), sobre TCP em localhost
+
+import socket
+import threading
+
+import pytest
+
+from p2p_crypto import AuthenticationError
+from p2p_protocol import (FRAME_HEADER, MAX_FRAME_SIZE, Channel, CommitRevealSession, ProtocolError,
+                          StreamTransport, commitment, decode_message, encode_message, recv_frame)
+
+PRAZO = 10.0
+
+
+def _canais(chave1='chave', chave2='chave'):
+    """Dois canais ligados por uma conexão TCP de loopback, já com as chaves da sessão."""
+    with socket.create_server(('127.0.0.1', 0)) as ouvinte:
+        cliente = socket.create_connection(ouvinte.getsockname())
+        servidor, _ = ouvinte.accept()
+    canais = [Channel(StreamTransport(cliente), chave1), Channel(StreamTransport(servidor), chave2)]
+    threads = [threading.Thread(target=canal.handshake) for canal in canais]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(PRAZO)
+    return canais
+
+
+def _rodar(sessao):
+    thread = threading.Thread(target=sessao.run, daemon=True)
+    thread.start()
+    return thread
+
+
+@pytest.mark.parametrize('mensagem', [
+    {'type': 'commit', 'round': 7, 'hash': commitment(7, 'P', 'ab' * 16)},
+    {'type': 'reveal', 'round': 7, 'choice': 'T', 'nonce': 'cd' * 16},
+    {'type': 'quit'},
+])
+def test_mensagens_ida_e_volta(mensagem):
+    assert decode_message(encode_message(mensagem)) == mensagem
+
+
+@pytest.mark.parametrize('dados', [b'', b'\x01' + bytes(10), b'\x03\x00', b'\x09'])
+def test_mensagem_mal_formada_e_erro_de_protocolo(dados):
+    with pytest.raises(ProtocolError):
+        decode_message(dados)
+
+
+def test_quadro_acima_do_limite_e_recusado():
+    a, b = socket.socketpair()
+    with a, b:
+        a.sendall(FRAME_HEADER.pack(MAX_FRAME_SIZE + 1))
+        with pytest.raises(ProtocolError):
+            recv_frame(b)
+
+
+def test_rodadas_em_paralelo_resolvidas_em_ordem():
+    canais = _canais()
+    resultados = [[], []]
+    sessoes = [CommitRevealSession(canal, window=4, on_result=lambda *args, lado=lado: resultados[lado].append(args))
+               for lado, canal in enumerate(canais)]
+    for sessao in sessoes:
+        _rodar(sessao)
+    jogadores = [threading.Thread(target=lambda s=s, j=j: [s.play(j) for _ in range(20)])
+                 for s, j in zip(sessoes, 'PT')]
+    for jogador in jogadores:
+        jogador.start()
+    for jogador in jogadores:
+        jogador.join(PRAZO)
+    sessoes[0].quit()
+    assert sessoes[1].finished.wait(PRAZO)
+    assert [rodada for rodada, *_ in resultados[0]] == list(range(1, 21))
+    assert resultados[0][0] == (1, 'P', 'T', 1) and resultados[1][0] == (1, 'T', 'P', -1)
+    assert (sessoes[0].player_score, sessoes[0].opponent_score) == (20, 0)
+    assert (sessoes[1].player_score, sessoes[1].opponent_score) == (0, 20)
+    assert sessoes[1].reason == "O oponente encerrou o jogo."
+
+
+def test_revelacao_diferente_do_compromisso_encerra_a_sessao():
+    honesto, trapaceiro = _canais()
+    sessao = CommitRevealSession(honesto)
+    thread = _rodar(sessao)
+    sessao.play('T')
+    nonce = 'ab' * 16
+    trapaceiro.send({'type': 'commit', 'round': 1, 'hash': commitment(1, 'A', nonce)})
+    # Espera a revelação do honesto e troca a própria jogada pela que vence a dele
+    assert trapaceiro.receive()['type'] == 'commit'
+    assert trapaceiro.receive() == {'type': 'reveal', 'round': 1, 'choice': 'T', 'nonce': sessao.own[1][1]}
+    trapaceiro.send({'type': 'reveal', 'round': 1, 'choice': 'P', 'nonce': nonce})
+    thread.join(PRAZO)
+    assert sessao.finished.is_set() and 'não corresponde ao compromisso' in sessao.reason
+    assert sessao.resolved == 0 and sessao.opponent_score == 0
+
+
+def test_revelacao_antes_do_compromisso_encerra_a_sessao():
+    honesto, trapaceiro = _canais()
+    sessao = CommitRevealSession(honesto)
+    thread = _rodar(sessao)
+    sessao.play('P')
+    # Sem o compromisso do oponente, o honesto ainda não revelou: a revelação vem fora de ordem
+    trapaceiro.send({'type': 'reveal', 'round': 1, 'choice': 'A', 'nonce': 'ab' * 16})
+    thread.join(PRAZO)
+    assert 'fora de ordem' in sessao.reason
+
+
+def test_compromisso_alem_da_janela_encerra_a_sessao():
+    honesto, trapaceiro = _canais()
+    sessao = CommitRevealSession(honesto, window=2)
+    thread = _rodar(sessao)
+    trapaceiro.send({'type': 'commit', 'round': 3, 'hash': commitment(3, 'P', 'ab' * 16)})
+    thread.join(PRAZO)
+    assert 'compromisso inesperado' in sessao.reason
+
+
+def test_chaves_pre_compartilhadas_diferentes_nao_trocam_mensagens():
+    canal1, canal2 = _canais('chave', 'outra')
+    canal1.send({'type': 'quit'})
+    with pytest.raises(AuthenticationError):
+        canal2.receive()
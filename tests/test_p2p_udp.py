@@ -0,0 +1,82 @@
+# Testes do transporte UDP do modo P2P (p2p_udp)
+
+import socket
+import threading
+import time
+
+import p2p_udp
+from p2p_udp import DatagramTransport, TimerQueue
+
+QUADROS = 300
+
+
+def _par(perda, variacao):
+    """Dois transportes ligados em loopback, com perdas independentes em cada sentido."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    listener.bind(('127.0.0.1', 0))
+    accepted = {}
+    accepting = threading.Thread(target=lambda: accepted.update(transport=DatagramTransport.accept(
+        listener, loss=perda, jitter=variacao, seed=2)[0]))
+    accepting.start()
+    initiator = DatagramTransport.connect(listener.getsockname(), loss=perda, jitter=variacao, seed=1)
+    initiator.send_frame(b'ola')  # O ouvinte só conhece o oponente pelo primeiro quadro
+    accepting.join(10)
+    listener_side = accepted['transport']
+    assert listener_side.recv_frame() == b'ola'
+    return initiator, listener_side
+
+
+def _trocar(envio, recebimento, prefixo, recebidos):
+    def enviar():
+        for numero in range(QUADROS):
+            envio.send_frame(b'%s%d' % (prefixo, numero))
+    thread = threading.Thread(target=enviar)
+    thread.start()
+    for _ in range(QUADROS):
+        recebidos.append(recebimento.recv_frame())
+    thread.join()
+
+
+def test_entrega_em_ordem_e_uma_vez_com_perda_nos_dois_sentidos():
+    a, b = _par(perda=0.25, variacao=0.005)
+    de_a, de_b = [], []
+    threads = [threading.Thread(target=_trocar, args=(a, b, b'a', de_a)),
+               threading.Thread(target=_trocar, args=(b, a, b'b', de_b))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(60)
+    assert de_a == [b'a%d' % numero for numero in range(QUADROS)]
+    assert de_b == [b'b%d' % numero for numero in range(QUADROS)]
+    # Nada além do esperado ficou para ser entregue
+    assert a.inbox.empty() and b.inbox.empty()
+    assert a.dropped and b.dropped and a.retransmissions and b.retransmissions
+    # Com perdas independentes, acks se perdem com o datagrama entregue: o reenvio chega como duplicado
+    assert a.duplicates + b.duplicates > 0
+    for transport in (a, b):
+        transport.close()
+        assert transport.recv_frame() is None
+
+
+def test_sessao_commit_reveal_com_perda():
+    assert p2p_udp.main(['--rodadas', '150', '--perda', '0.2', '--atraso', '0.002',
+                         '--variacao', '0.004', '--semente', '11']) == 0
+
+
+def test_fila_de_temporizadores_vence_em_ordem_e_respeita_cancelamento():
+    fila = TimerQueue()
+    fila.start()
+    vencidos = []
+    pronto = threading.Event()
+    fila.schedule(0.06, vencidos.append, 'terceiro')
+    fila.schedule(0.02, vencidos.append, 'primeiro')
+    fila.schedule(0.04, vencidos.append, 'cancelado').cancel()
+    fila.schedule(0.03, vencidos.append, 'segundo')
+    fila.schedule(0.08, pronto.set)
+    assert pronto.wait(2)
+    assert vencidos == ['primeiro', 'segundo', 'terceiro']
+    inicio = time.monotonic()
+    fila.schedule(0.05, pronto.clear)
+    while pronto.is_set() and time.monotonic() - inicio < 2:
+        time.sleep(0.005)
+    assert time.monotonic() - inicio >= 0.05
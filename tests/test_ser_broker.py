@@ -0,0 +1,128 @@
+# Testes do broker de pareamento (ser_broker), com o broker e os nós em portas de localhost
+
+import socket
+import threading
+import time
+
+import pytest
+
+from apoio import PRAZO, Cliente, Processo, porta_livre
+from ser_broker import Broker, conectar
+
+CHAVE = 'teste'
+
+
+class _Federacao:
+    """Um broker e dois servidores registrados nele, cada um na sua porta."""
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.porta_broker = porta_livre()
+        self.broker = self.iniciar_broker()
+        self.portas = [porta_livre(), porta_livre()]
+        self.nos = [Processo(diretorio, f'no{indice}',
+                             ['ser_server.py', '--porta', str(porta), '--broker', f'127.0.0.1:{self.porta_broker}',
+                              '--chave-broker', CHAVE, '--espera-broker', '0.2'],
+                             'Escutando em')
+                    for indice, porta in enumerate(self.portas)]
+
+    def iniciar_broker(self):
+        return Processo(self.diretorio, 'broker', ['ser_broker.py', '--porta', str(self.porta_broker),
+                                                   '--chave', CHAVE], 'Broker escutando')
+
+    def parar(self):
+        for processo in [self.broker] + self.nos:
+            processo.parar()
+
+
+@pytest.fixture
+def federacao(tmp_path):
+    federacao = _Federacao(tmp_path)
+    yield federacao
+    federacao.parar()
+
+
+def _partida_entre_nos(federacao, nome1, nome2):
+    """Um jogador em cada nó: só o broker pode pareá-los."""
+    clientes = [Cliente(federacao.portas[0], nome1), Cliente(federacao.portas[1], nome2)]
+    assert clientes[0].esperar('MAT')['oponente'] == nome2
+    assert clientes[1].esperar('MAT')['oponente'] == nome1
+    resultados = {}
+    threads = [threading.Thread(target=lambda c=c, j=j: resultados.setdefault(j, c.jogar(j)))
+               for c, j in zip(clientes, ('ROC', 'SCI'))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(PRAZO)
+    assert resultados['ROC'] == [('WIN', 'sci')] * 3
+    assert resultados['SCI'] == [('LOS', 'roc')] * 3
+    return clientes
+
+
+def test_pareia_jogadores_de_nos_diferentes_e_mescla_o_ranking(federacao):
+    clientes = _partida_entre_nos(federacao, 'ana', 'bia')
+    # A vitória da ana chega ao nó da bia pelo broker, seja qual for o nó que hospedou a partida
+    limite = time.monotonic() + PRAZO
+    while clientes[1].vitorias('ana') == 0:
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+    assert clientes[0].vitorias('ana') == clientes[1].vitorias('ana')
+    for cliente in clientes:
+        cliente.fechar()
+
+
+def test_nos_voltam_ao_broker_reiniciado(federacao):
+    federacao.broker.parar()
+    for no in federacao.nos:
+        no.esperar('Conexão com o broker perdida')
+    federacao.broker = federacao.iniciar_broker()
+    for no in federacao.nos:
+        no.esperar('Registrado no broker', vezes=2)
+    for cliente in _partida_entre_nos(federacao, 'caio', 'duda'):
+        cliente.fechar()
+
+
+def test_no_que_nao_le_nao_atrasa_os_outros():
+    broker = Broker(('127.0.0.1', 0), CHAVE.encode(), limite_fila=20)
+    threading.Thread(target=broker.executar, daemon=True).start()
+    try:
+        parado, indice_parado, _ = conectar(broker.ouvinte.address, CHAVE.encode())
+        ativo, _, _ = conectar(broker.ouvinte.address, CHAVE.encode())
+        # Cada vitória é repassada ao nó parado, até encher o socket e a fila dele
+        nome = 'x' * 65536
+        for _ in range(1000):
+            ativo.send(('incrementar', nome, 1))
+        ativo.send(('pedido', 1, 'consultar', (0, 10, None)))
+        assert ativo.poll(PRAZO)
+        tipo, identificador, (total, *_) = ativo.recv()
+        assert (tipo, identificador, total) == ('resposta', 1, 1)
+        limite = time.monotonic() + PRAZO
+        while indice_parado in broker.canais:
+            assert time.monotonic() < limite
+            time.sleep(0.05)
+        parado.close()
+        ativo.close()
+    finally:
+        broker.ouvinte.close()
+
+
+def test_conexao_que_nao_autentica_nao_segura_o_registro_dos_nos():
+    broker = Broker(('127.0.0.1', 0), CHAVE.encode(), prazo_autenticacao=0.5)
+    threading.Thread(target=broker.executar, daemon=True).start()
+    try:
+        muda = socket.create_connection(broker.ouvinte.address, timeout=PRAZO)
+        registros = []
+        no = threading.Thread(target=lambda: registros.append(conectar(broker.ouvinte.address, CHAVE.encode())),
+                              daemon=True)
+        no.start()
+        no.join(PRAZO)
+        assert registros and registros[0][1] == 0
+        # A conexão muda recebe o desafio e é derrubada quando o prazo acaba
+        inicio = time.monotonic()
+        while muda.recv(4096):
+            pass
+        assert time.monotonic() - inicio < PRAZO
+        muda.close()
+        registros[0][0].close()
+    finally:
+        broker.ouvinte.close()
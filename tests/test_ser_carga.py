@@ -0,0 +1,42 @@
+# Testes do gerador de carga (ser_carga)
+
+import asyncio
+import subprocess
+import sys
+
+from apoio import RAIZ, Processo, porta_livre
+from ser_carga import ESTRATEGIAS, VENCE, executar, ler_argumentos, percentis
+
+
+def test_nao_importa_o_servidor():
+    # O gerador roda em outro processo que o servidor: não deve montar o estado global dele
+    codigo = "import sys, ser_carga; print(','.join(sorted(m for m in sys.modules if m.startswith('ser_'))))"
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=RAIZ, capture_output=True, text=True, check=True)
+    modulos = saida.stdout.strip().split(',')
+    assert 'ser_server' not in modulos and 'ser_metricas' not in modulos
+    assert 'ser_sistema' in modulos
+
+
+def test_estrategia_contra_vence_a_jogada_anterior():
+    for jogada in VENCE:
+        assert VENCE[ESTRATEGIAS['contra'](2, jogada)] == jogada
+
+
+def test_percentis_nearest_rank():
+    assert percentis([]) == {}
+    assert percentis(list(range(1, 101))) == {'p50': 50, 'p90': 90, 'p99': 99, 'max': 100}
+
+
+def test_bots_jogam_contra_o_servidor_sem_erros(tmp_path):
+    porta = porta_livre()
+    servidor = Processo(tmp_path, 'servidor', ['ser_server.py', '--modo', 'asyncio', '--porta', str(porta)],
+                        'Escutando em')
+    try:
+        config = ler_argumentos(['--porta', str(porta), '--bots', '6', '--duracao', '7', '--rampa', '0.2',
+                                 '--codec', 'misto', '--ranking', '1', '--intervalo', '0'])
+        relatorio = asyncio.run(executar(config))
+    finally:
+        servidor.parar()
+    assert relatorio['erros'] == {} and relatorio['abandonos'] == 0
+    assert relatorio['partidas'] >= 3 and relatorio['rodadas'] >= 9
+    assert set(relatorio['latencia_ms']['pla_resultado']) == {'p50', 'p90', 'p99', 'max'}
@@ -0,0 +1,102 @@
+# Testes do cliente gráfico (ser_client_gui): entrega das mensagens da rede e esvaziamento da fila por lote
+
+import socket
+import time
+from types import SimpleNamespace
+
+import pytest
+
+tk = pytest.importorskip('tkinter')
+
+import ser_client_gui
+from ser_client_gui import App, GameScreen, NetworkClient, move_name
+from ser_protocolo import CODEC_BINARIO, CODEC_JSON
+
+PRAZO = 5.0
+
+
+def _esperar(condicao):
+    limite = time.monotonic() + PRAZO
+    while not condicao():
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+def test_um_aviso_por_rajada_e_troca_de_codec():
+    avisos = []
+    cliente = NetworkClient(notify=lambda: avisos.append(cliente.message_queue.qsize()))
+    cliente.client_socket, servidor = socket.socketpair()
+    cliente.start_listening()
+    servidor.sendall(CODEC_JSON.codificar('MAT', {'oponente': 'bia'}) + CODEC_JSON.codificar('PLA'))
+    _esperar(lambda: cliente.message_queue.qsize() == 2)
+    servidor.sendall(CODEC_JSON.codificar('COD', {'codec': CODEC_BINARIO.nome}))
+    servidor.sendall(CODEC_BINARIO.codificar('WIN', {'jogada_oponente': 'sci'}))
+    _esperar(lambda: cliente.message_queue.qsize() == 3)
+    assert len(avisos) == 1  # A interface ainda não esvaziou a fila desde o primeiro aviso
+    assert cliente.codec is CODEC_BINARIO
+    recebidas = [cliente.message_queue.get_nowait()[0] for _ in range(3)]
+    assert recebidas == ['MAT', 'PLA', 'WIN']
+    cliente.notified = False
+    servidor.close()
+    _esperar(lambda: len(avisos) == 2)
+    assert cliente.message_queue.get_nowait()[0] == 'ERROR'
+
+
+def _app_falso(mensagens, tratar=None):
+    """Só o que process_queue usa do App, sem abrir uma janela."""
+    cliente = NetworkClient()
+    for mensagem in mensagens:
+        cliente.message_queue.put(mensagem)
+    cliente.notified = True
+    app = SimpleNamespace(network_client=cliente, tratadas=[], agendadas=[])
+    app.handle_message = tratar or (lambda comando, payload: app.tratadas.append(comando) or True)
+    app.after = lambda atraso, funcao: app.agendadas.append(funcao)
+    app.process_queue = lambda: App.process_queue(app)
+    return app
+
+
+def test_esvazia_a_fila_inteira_de_uma_vez():
+    app = _app_falso([('WIN', {})] * 100 + [('END', {})])
+    App.process_queue(app)
+    assert len(app.tratadas) == 101 and not app.agendadas
+    assert not app.network_client.notified
+
+
+def test_rajada_maior_que_o_orcamento_continua_na_proxima_volta(monkeypatch):
+    monkeypatch.setattr(ser_client_gui, 'ORCAMENTO_LOTE', 0.02)
+    tratadas = []
+
+    def devagar(comando, payload):
+        tratadas.append(comando)
+        time.sleep(0.005)
+        return True
+    app = _app_falso([('RAN', {})] * 50, devagar)
+    App.process_queue(app)
+    assert 0 < len(tratadas) < 50 and len(app.agendadas) == 1
+
+
+def test_janela_fechada_para_de_tratar():
+    app = _app_falso([('END', {}), ('WIN', {})], lambda comando, payload: False)
+    App.process_queue(app)
+    assert app.network_client.message_queue.qsize() == 1 and not app.agendadas
+
+
+def test_nome_da_jogada_do_oponente():
+    assert move_name({'jogada_oponente': 'roc'}) == 'Pedra'
+    assert move_name({}) == 'Tempo Esgotado'
+
+
+def test_log_do_jogo_guarda_so_as_ultimas_linhas(monkeypatch):
+    try:
+        raiz = tk.Tk()
+    except tk.TclError:
+        pytest.skip("sem display para o Tk")
+    try:
+        monkeypatch.setattr(ser_client_gui, 'MAX_LINHAS_LOG', 10)
+        tela = GameScreen(raiz, SimpleNamespace(request_ranking=lambda: None))
+        for indice in range(25):
+            tela.add_message(f'linha {indice}')
+        linhas = tela.log_text.get('1.0', 'end-1c').splitlines()
+        assert linhas == [f'linha {indice}' for indice in range(15, 25)]
+    finally:
+        raiz.destroy()
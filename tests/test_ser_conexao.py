@@ -0,0 +1,134 @@
+# Testes da saída das conexões (ser_conexao): fila do motor de threads, agrupamento nos dois motores e TCP_NODELAY
+
+import asyncio
+import socket
+import threading
+import time
+
+import pytest
+
+from ser_conexao import ClienteLento, ConexaoAsync, ConexaoSaida, agrupar, configurar_nodelay
+
+
+def _par(limite=256 * 1024):
+    servidor, cliente = socket.socketpair()
+    return ConexaoSaida(servidor, 'teste', limite), cliente
+
+
+def _ler(sock, tamanho, prazo=5.0):
+    sock.settimeout(prazo)
+    recebido = bytearray()
+    while len(recebido) < tamanho:
+        parte = sock.recv(65536)
+        if not parte:
+            break
+        recebido += parte
+    return bytes(recebido)
+
+
+def test_entrega_tudo_em_ordem():
+    conn, cliente = _par()
+    quadros = [b'%05d\n' % numero for numero in range(2000)]
+    for quadro in quadros:
+        conn.sendall(quadro)
+    assert _ler(cliente, 6 * len(quadros)) == b''.join(quadros)
+    conn.close()
+    assert cliente.recv(1) == b''
+
+
+def test_uma_thread_escritora_para_todas_as_conexoes():
+    _par()  # Garante que a escritora compartilhada já existe
+    antes = threading.active_count()
+    pares = [_par() for _ in range(50)]
+    assert threading.active_count() == antes
+    for conn, cliente in pares:
+        conn.sendall(b'oi\n')
+    for conn, cliente in pares:
+        assert _ler(cliente, 3) == b'oi\n'
+        conn.close()
+        cliente.close()
+
+
+def test_cliente_que_nao_le_nao_atrasa_os_outros_e_e_expulso():
+    lento, cliente_lento = _par(limite=4 * 1024 * 1024)
+    rapido, cliente_rapido = _par()
+    bloco = b'x' * 65536
+    # Bem mais do que cabe nos buffers do socket: o resto fica pendente na fila do lento
+    for _ in range(40):
+        lento.sendall(bloco)
+    inicio = time.monotonic()
+    rapido.sendall(b'PLA\n')
+    assert _ler(cliente_rapido, 4, prazo=2.0) == b'PLA\n'
+    assert time.monotonic() - inicio < 0.5
+    with pytest.raises(ClienteLento):
+        for _ in range(40):
+            lento.sendall(bloco)
+    with pytest.raises(BrokenPipeError):
+        lento.sendall(b'x')
+    rapido.close()
+    cliente_lento.close()
+    cliente_rapido.close()
+
+
+def test_agrupar_junta_os_quadros_em_uma_escrita():
+    conn, cliente = _par()
+    conn.sendall(b'a\n')
+    assert _ler(cliente, 2) == b'a\n'
+    escritas = conn.escritas
+    with agrupar(conn):
+        conn.sendall(b'WIN\n')
+        conn.sendall(b'END\n')
+        time.sleep(0.05)  # A escritora não escreve nada enquanto o bloco está aberto
+        assert conn.escritas == escritas
+    assert _ler(cliente, 8) == b'WIN\nEND\n'
+    assert conn.escritas == escritas + 1
+    conn.close()
+
+
+def test_agrupar_no_motor_asyncio_junta_os_quadros_em_uma_escrita():
+    servidor, cliente = socket.socketpair()
+
+    async def enviar():
+        _, writer = await asyncio.open_connection(sock=servidor)
+        conn = ConexaoAsync(writer, asyncio.get_running_loop())
+        with agrupar(conn):
+            conn.sendall(b'WIN\n')
+            conn.sendall(b'END\n')
+            await asyncio.sleep(0.05)
+            assert conn.escritas == 0
+        await asyncio.sleep(0.05)
+        assert conn.escritas == 1
+        writer.close()
+        await writer.wait_closed()
+    asyncio.run(enviar())
+    assert _ler(cliente, 9) == b'WIN\nEND\n'
+    cliente.close()
+
+
+def test_configurar_nodelay():
+    with socket.create_server(('127.0.0.1', 0)) as ouvinte:
+        with socket.create_connection(ouvinte.getsockname()) as sock:
+            configurar_nodelay(sock, True)
+            assert sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+            configurar_nodelay(sock, False)
+            assert not sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+
+
+def test_close_drena_a_fila_antes_de_fechar():
+    conn, cliente = _par(limite=8 * 1024 * 1024)
+    dados = b'y' * (2 * 1024 * 1024)
+    conn.sendall(dados)
+    leitura = {}
+    leitor = threading.Thread(target=lambda: leitura.update(dados=_ler(cliente, len(dados) + 1)))
+    leitor.start()
+    conn.close()
+    leitor.join(5)
+    assert leitura['dados'] == dados  # Tudo chegou, seguido do fim da conexão
+
+
+def test_abortar_descarta_a_fila():
+    conn, cliente = _par()
+    with agrupar(conn):
+        conn.sendall(b'nunca sai\n')
+        conn.abortar()
+    assert cliente.recv(100) == b''
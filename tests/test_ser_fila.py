@@ -0,0 +1,118 @@
+# Testes da fila de pareamento (ser_fila)
+
+import threading
+
+import pytest
+
+import ser_fila
+from ser_fila import FilaPareamento
+
+
+class _Relogio:
+    """Substitui o time do ser_fila: o tempo só anda quando o teste manda."""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def monotonic(self):
+        return self.agora
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = _Relogio()
+    monkeypatch.setattr(ser_fila, 'time', relogio)
+    return relogio
+
+
+def _jogador(nome):
+    return {'socket': object(), 'nome': nome}
+
+
+def test_devolver_mantem_a_ordem_e_o_instante_de_entrada(relogio):
+    fila = FilaPareamento()
+    a, b, c = _jogador('a'), _jogador('b'), _jogador('c')
+    fila.entrar(a)
+    fila.entrar(b)
+    relogio.agora += 0.02
+    fila.entrar(c)
+    entradas = {id(info): fila.espera(info) for info in (a, b)}
+    antigos = fila.retirar_antigos(0.01, observar=False)
+    assert antigos == [a, b]
+    agora = relogio.monotonic()
+    for info in reversed(antigos):
+        fila.devolver(info, agora - entradas[id(info)])
+    assert fila.espera(a) == pytest.approx(0.02)
+    assert fila.retirar_par() == (a, b)
+    assert fila.retirar_par() is None and c in fila
+
+
+def test_fifo_pareia_por_ordem_de_chegada():
+    fila = FilaPareamento()
+    jogadores = [_jogador(nome) for nome in 'abcde']
+    for info in jogadores:
+        fila.entrar(info)
+    fila.entrar(jogadores[0])  # Entrar de novo não duplica nem muda a posição
+    assert len(fila) == 5
+    assert fila.retirar_par() == (jogadores[0], jogadores[1])
+    assert fila.retirar_par() == (jogadores[2], jogadores[3])
+    assert fila.retirar_par() is None
+    assert len(fila) == 1 and jogadores[4] in fila
+
+
+def test_cancelar_remove_de_qualquer_posicao():
+    fila = FilaPareamento()
+    a, b, c = _jogador('a'), _jogador('b'), _jogador('c')
+    for info in (a, b, c):
+        fila.entrar(info)
+    assert fila.cancelar(b)
+    assert not fila.cancelar(b)
+    assert b not in fila and fila.espera(b) is None
+    assert fila.retirar_par() == (a, c)
+    assert not fila.faixas and not fila.indice
+
+
+def test_faixas_so_pareiam_entre_si_antes_de_alargar(relogio):
+    vitorias = {'a': 0, 'b': 12, 'c': 1, 'd': 14}
+    fila = FilaPareamento(vitorias.get, largura_faixa=5, espera_alargamento=10.0)
+    a, b, c, d = (_jogador(nome) for nome in 'abcd')
+    for info in (a, b, c, d):
+        fila.entrar(info)
+    assert fila.retirar_par() == (a, c)  # Faixa 0
+    assert fila.retirar_par() == (b, d)  # Faixa 2
+
+
+def test_janela_cresce_uma_faixa_a_cada_espera_alargamento(relogio):
+    vitorias = {'a': 0, 'b': 12}
+    fila = FilaPareamento(vitorias.get, largura_faixa=5, espera_alargamento=10.0)
+    a, b = _jogador('a'), _jogador('b')
+    fila.entrar(a)
+    fila.entrar(b)
+    relogio.agora += 10.0
+    assert fila.retirar_par() is None  # Janela de uma faixa: 0 e 2 ainda não se alcançam
+    relogio.agora += 10.0
+    assert fila.retirar_par() == (a, b)
+
+
+def test_retirar_antigos_respeita_a_espera_minima(relogio):
+    fila = FilaPareamento()
+    a, b = _jogador('a'), _jogador('b')
+    fila.entrar(a)
+    relogio.agora += 5.0
+    fila.entrar(b)
+    relogio.agora += 1.0
+    assert fila.retirar_antigos(2.0) == [a]
+    assert b in fila and a not in fila
+
+
+def test_entrar_e_devolver_ligam_o_aviso():
+    aviso = threading.Event()
+    fila = FilaPareamento(aviso=aviso)
+    ana = _jogador('ana')
+    fila.entrar(ana)
+    assert aviso.is_set()
+    aviso.clear()
+    assert fila.retirar_antigos(0, observar=False) == [ana]
+    assert not aviso.is_set()
+    fila.devolver(ana, 0.0)
+    assert aviso.is_set()
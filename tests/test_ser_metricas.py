@@ -0,0 +1,73 @@
+# Testes das métricas do servidor (ser_metricas): valores, formato de exposição e endpoint HTTP
+
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from ser_metricas import Contador, Histograma, Medidor, exposicao, iniciar_endpoint
+
+
+def test_contador_soma_de_varias_threads():
+    contador = Contador('teste_contador_total', 'Contador de teste.')
+    threads = [threading.Thread(target=lambda: [contador.incrementar() for _ in range(1000)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    contador.incrementar(5)
+    assert contador.amostras() == [('teste_contador_total', 4005)]
+
+
+def test_nome_repetido_e_recusado():
+    Contador('teste_repetido', 'Primeiro.')
+    with pytest.raises(ValueError):
+        Medidor('teste_repetido', 'Segundo.')
+
+
+def test_medidor_com_funcao_e_lido_na_coleta():
+    fila = []
+    medidor = Medidor('teste_fila', 'Tamanho da fila.', lambda: len(fila))
+    fila.extend('abc')
+    assert medidor.amostras() == [('teste_fila', 3)]
+    manual = Medidor('teste_ativas', 'Partidas ativas.')
+    manual.incrementar(3)
+    manual.decrementar()
+    assert manual.amostras() == [('teste_ativas', 2)]
+
+
+def test_histograma_acumula_as_faixas():
+    histograma = Histograma('teste_latencia_segundos', 'Latência.', limites=(0.1, 1.0))
+    for valor in (0.05, 0.1, 0.5, 2.0):
+        histograma.observar(valor)
+    assert histograma.amostras() == [
+        ('teste_latencia_segundos_bucket{le="0.1"}', 2),  # O limite é inclusivo
+        ('teste_latencia_segundos_bucket{le="1"}', 3),
+        ('teste_latencia_segundos_bucket{le="+Inf"}', 4),
+        ('teste_latencia_segundos_sum', 2.65),
+        ('teste_latencia_segundos_count', 4),
+    ]
+
+
+def test_exposicao_traz_ajuda_tipo_e_amostras():
+    Contador('teste_exposto_total', 'Exposto.').incrementar(2)
+    linhas = exposicao().splitlines()
+    indice = linhas.index('# HELP teste_exposto_total Exposto.')
+    assert linhas[indice + 1:indice + 3] == ['# TYPE teste_exposto_total counter', 'teste_exposto_total 2']
+
+
+def test_endpoint_serve_metrics_e_recusa_outros_caminhos():
+    Medidor('teste_endpoint', 'Servido por HTTP.').definir(7)
+    servidor = iniciar_endpoint(0)
+    try:
+        host, porta = servidor.server_address
+        with urllib.request.urlopen(f'http://{host}:{porta}/metrics', timeout=10) as resposta:
+            assert resposta.headers['Content-Type'].startswith('text/plain')
+            assert 'teste_endpoint 7' in resposta.read().decode('utf-8').splitlines()
+        with pytest.raises(urllib.error.HTTPError) as erro:
+            urllib.request.urlopen(f'http://{host}:{porta}/outro', timeout=10)
+        assert erro.value.code == 404
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,144 @@
+# Testes do perfilamento sob demanda (ser_perfil)
+
+import asyncio
+import pstats
+import sys
+import threading
+import time
+
+import pytest
+
+import ser_perfil
+from ser_perfil import Perfilador, memoria, pilhas_tarefas, pilhas_threads
+
+PRAZO = 10.0
+
+
+def _girar(parar):
+    while not parar.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def ocupada():
+    """Uma thread chamada 'ocupada' girando em _girar até o fim do teste."""
+    parar = threading.Event()
+    thread = threading.Thread(target=_girar, args=(parar,), name='ocupada', daemon=True)
+    thread.start()
+    yield thread
+    parar.set()
+    thread.join(PRAZO)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(PRAZO)
+    loop.close()
+
+
+def _esperar_fim(perfilador):
+    limite = time.monotonic() + PRAZO
+    while perfilador.ativo:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+
+
+def test_amostras_gravam_pilhas_colapsadas_por_thread(tmp_path, ocupada, capsys):
+    perfilador = Perfilador()
+    arquivo = tmp_path / 'amostras.txt'
+    perfilador.iniciar('amostras', 0.2, str(arquivo))
+    _esperar_fim(perfilador)
+    linhas = arquivo.read_text(encoding='utf-8').splitlines()
+    assert any(linha.startswith('ocupada;') and '_girar' in linha for linha in linhas)
+    assert int(linhas[0].rsplit(' ', 1)[1]) > 0
+    assert 'amostras de' in capsys.readouterr().out
+
+
+def test_uma_sessao_por_vez_e_parar_encerra_antes_do_prazo(tmp_path):
+    perfilador = Perfilador()
+    perfilador.iniciar('amostras', 60, str(tmp_path / 'a.txt'))
+    with pytest.raises(RuntimeError):
+        perfilador.iniciar('amostras', 1, str(tmp_path / 'b.txt'))
+    inicio = time.monotonic()
+    assert perfilador.parar()
+    _esperar_fim(perfilador)
+    assert time.monotonic() - inicio < 5
+    assert not perfilador.parar()
+
+
+def test_cprofile_exige_o_loop_asyncio(tmp_path):
+    with pytest.raises(RuntimeError):
+        Perfilador().iniciar('cprofile', 1, str(tmp_path / 'perfil.prof'))
+
+
+def test_cprofile_mede_o_loop(tmp_path, loop):
+    perfilador = Perfilador()
+    perfilador.loop = loop
+    arquivo = tmp_path / 'perfil.prof'
+    perfilador.iniciar('cprofile', 0.2, str(arquivo))
+    for _ in range(20):
+        loop.call_soon_threadsafe(sum, range(1000))
+        time.sleep(0.005)
+    _esperar_fim(perfilador)
+    assert pstats.Stats(str(arquivo)).total_calls > 0
+
+
+def test_cprofile_com_o_loop_bloqueado_avisa_e_nao_fica_ligado(tmp_path, loop, monkeypatch, capsys):
+    monkeypatch.setattr(ser_perfil, 'PRAZO_LOOP', 0.2)
+    liberar = threading.Event()
+    loop.call_soon_threadsafe(liberar.wait, PRAZO)
+    perfilador = Perfilador()
+    perfilador.loop = loop
+    arquivo = tmp_path / 'perfil.prof'
+    perfilador.iniciar('cprofile', 0.1, str(arquivo))
+    _esperar_fim(perfilador)
+    assert 'não respondeu' in capsys.readouterr().out and not arquivo.exists()
+    liberar.set()
+
+    async def perfil_do_loop():
+        return sys.getprofile()
+    # O enable que ficou na fila do loop não é executado quando ele volta
+    assert asyncio.run_coroutine_threadsafe(perfil_do_loop(), loop).result(PRAZO) is None
+
+
+def test_cprofile_com_o_loop_fechado_avisa(tmp_path, capsys):
+    perfilador = Perfilador()
+    perfilador.loop = asyncio.new_event_loop()
+    perfilador.loop.close()
+    perfilador.iniciar('cprofile', 0.1, str(tmp_path / 'perfil.prof'))
+    _esperar_fim(perfilador)
+    assert 'não está mais rodando' in capsys.readouterr().out
+
+
+def test_memoria_mostra_o_crescimento_entre_snapshots():
+    assert 'desligado' in memoria('diff')
+    try:
+        memoria('iniciar')
+        retidos = [bytearray(1024) for _ in range(1000)]
+        relatorio = memoria('diff')
+        assert 'em uso' in relatorio and __file__ in relatorio
+        del retidos
+    finally:
+        memoria('parar')
+    assert 'desconhecida' in memoria('outra')
+
+
+def test_pilhas_de_threads_e_de_tarefas(ocupada, loop):
+    assert 'ocupada' in pilhas_threads() and '_girar' in pilhas_threads()
+
+    acordar = threading.Event()
+
+    async def dormir():
+        while not acordar.is_set():
+            await asyncio.sleep(0.01)
+    tarefa = asyncio.run_coroutine_threadsafe(dormir(), loop)
+    time.sleep(0.05)
+    resumo = pilhas_tarefas(loop)
+    acordar.set()
+    tarefa.result(PRAZO)
+    assert 'dormir' in resumo
@@ -0,0 +1,122 @@
+# Testes do canal com o coordenador e do pareamento entre trabalhadores (ser_processos)
+
+import asyncio
+import multiprocessing
+import threading
+import time
+
+from ser_processos import CanalIPC, FilaRemota
+from ser_protocolo import CODEC_JSON
+
+
+def _coordenador_lento(conexao, atraso):
+    """Responde cada pedido depois de `atraso` segundos, como um coordenador ocupado."""
+    while True:
+        try:
+            mensagem = conexao.recv()
+        except (EOFError, OSError):
+            return
+        if mensagem[0] == 'pedido':
+            time.sleep(atraso)
+            conexao.send(('resposta', mensagem[1], ('ok', mensagem[3])))
+
+
+def _canal(atraso):
+    ponta_trabalhador, ponta_coordenador = multiprocessing.Pipe()
+    threading.Thread(target=_coordenador_lento, args=(ponta_coordenador, atraso), daemon=True).start()
+    canal = CanalIPC(ponta_trabalhador, lambda mensagem: None)
+    canal.iniciar()
+    return canal
+
+
+def test_pedir_bloqueante_recebe_a_resposta():
+    canal = _canal(0.0)
+    assert canal.pedir('consultar', 0, 10, None) == ('ok', (0, 10, None))
+    assert not canal.pedidos
+
+
+def test_pedir_async_nao_trava_o_loop():
+    canal = _canal(0.3)
+
+    async def cenario():
+        batidas = 0
+
+        async def outra_conexao():
+            nonlocal batidas
+            while True:
+                await asyncio.sleep(0.01)
+                batidas += 1
+
+        tarefa = asyncio.get_running_loop().create_task(outra_conexao())
+        resultado = await canal.pedir_async('consultar', 5, 2, 'ana')
+        tarefa.cancel()
+        return resultado, batidas
+
+    resultado, batidas = asyncio.run(cenario())
+    assert resultado == ('ok', (5, 2, 'ana'))
+    assert batidas >= 10  # O loop seguiu atendendo enquanto o coordenador respondia
+    assert not canal.pedidos
+
+
+class _Trabalhador:
+    """Ponta de Pipe falsa: guarda o que o coordenador envia ao trabalhador."""
+
+    def __init__(self):
+        self.recebidas = []
+
+    def send(self, mensagem):
+        self.recebidas.append(mensagem)
+
+
+def test_pareamento_cruzado_usa_quem_nao_tem_par_local():
+    from ser_fila import FilaPareamento
+    from ser_processos import ESPERA_CRUZADA, Coordenador
+    from ser_ranking import RankingFragmentado
+
+    ranking = RankingFragmentado(4)
+    for nome, vitorias in (('ana', 0), ('bia', 50), ('caio', 1)):
+        ranking.registrar(nome)
+        ranking.incrementar(nome, vitorias)
+    canais = {0: _Trabalhador(), 1: _Trabalhador()}
+    coordenador = Coordenador(canais, ranking, lambda: FilaPareamento(ranking.get, 5, 3600))
+    # Dois jogadores no trabalhador 0, em faixas que nunca se pareiam ali, e um sozinho no 1
+    coordenador.tratar(0, ('entrar', (0, 0), 'ana', 'json'))
+    coordenador.tratar(0, ('entrar', (0, 1), 'bia', 'json'))
+    coordenador.tratar(1, ('entrar', (1, 0), 'caio', 'json'))
+    coordenador.parear()
+    assert not canais[0].recebidas and not canais[1].recebidas  # Ainda esperando um par local
+
+    time.sleep(ESPERA_CRUZADA + 0.02)
+    coordenador.parear()
+    partidas = [m for canal in canais.values() for m in canal.recebidas if m[0] == 'partida']
+    assert len(partidas) == 1
+    assert {partidas[0][1][1], partidas[0][2][1]} == {'ana', 'caio'}
+    # Quem sobrou volta para a fila do seu trabalhador, e não é pareado de novo com ninguém
+    assert len(coordenador.filas[0]) == 1 and len(coordenador.filas[1]) == 0
+    assert coordenador.filas[0].retirar_antigos(0)[0]['nome'] == 'bia'
+
+
+class _CanalAnotado:
+    def __init__(self):
+        self.enviadas = []
+
+    def enviar(self, mensagem):
+        self.enviadas.append(mensagem)
+
+
+class _Socket:
+    codec = CODEC_JSON
+
+
+def test_fila_remota_troca_o_jid_de_outro_indice():
+    # Depois de o nó voltar ao broker com outro índice, os jids antigos não chegam ao jogador certo
+    jogador_info = {'socket': _Socket(), 'nome': 'ana'}
+    antiga = FilaRemota(_CanalAnotado(), 0)
+    antiga.entrar(jogador_info)
+    antiga.pareado(jogador_info['jid'])
+    antiga.entrar(jogador_info)
+    assert jogador_info['jid'] == (0, 0)
+    nova = FilaRemota(_CanalAnotado(), 3)
+    nova.entrar(jogador_info)
+    assert jogador_info['jid'][0] == 3 and jogador_info in nova
+    assert nova.canal.enviadas == [('entrar', jogador_info['jid'], 'ana', 'json')]
@@ -0,0 +1,113 @@
+# Testes dos codecs e do LeitorQuadros (ser_protocolo)
+
+import socket
+
+import pytest
+
+from ser_protocolo import (CABECALHO_BINARIO, CODEC_BINARIO, CODEC_JSON, FLAG_PAYLOAD_JSON, JOGADAS,
+                           MARCADOR_BINARIO, TAMANHO_LEITURA, LeitorQuadros, QuadroGrandeDemais, QuadroInvalido,
+                           codificar_binario)
+
+MENSAGENS = [
+    ('CON', {'nome': 'ana'}),
+    ('CON', {'nome': 'ana', 'codec': 'bin'}),
+    ('PLA', {}),
+    ('ROC', {}),
+    ('WIN', {'jogada_oponente': 'pap'}),
+    ('TIE', {'jogada_oponente': 'TIMEOUT'}),
+    ('MAT', {'oponente': 'Zoë 🦊'}),
+    ('RAN', {'total': 2, 'offset': 0, 'ranking': [{'nome': 'ana', 'vitorias': 3}]}),
+    ('END', {'mensagem': 'fim'}),
+]
+
+
+def _quadro(comando, corpo, flags=0):
+    return CABECALHO_BINARIO.pack(MARCADOR_BINARIO, comando, flags, len(corpo)) + corpo
+
+
+@pytest.mark.parametrize('codec', [CODEC_JSON, CODEC_BINARIO])
+def test_ida_e_volta(codec):
+    fluxo = b''.join(codec.codificar(comando, payload) for comando, payload in MENSAGENS)
+    assert LeitorQuadros().alimentar(fluxo) == MENSAGENS
+
+
+def test_quadros_em_cache_iguais_aos_codificados():
+    for codec in (CODEC_JSON, CODEC_BINARIO):
+        assert codec.quadro_pla == codec.codificar('PLA')
+        for jogada in JOGADAS:
+            assert codec.quadro_resultado('LOS', jogada) == codec.codificar('LOS', {'jogada_oponente': jogada})
+        assert codec.quadro_mat('bia "b"') == codec.codificar('MAT', {'oponente': 'bia "b"'})
+        assert codec.quadro_end('até') == codec.codificar('END', {'mensagem': 'até'})
+
+
+def test_formatos_misturados_e_fragmentados():
+    fluxo = CODEC_JSON.codificar('CON', {'nome': 'ana'}) + codificar_binario('SCI') + CODEC_JSON.codificar('QUI')
+    leitor = LeitorQuadros(capacidade_inicial=16)
+    mensagens = []
+    for byte in range(len(fluxo)):
+        mensagens += leitor.alimentar(fluxo[byte:byte + 1])
+    assert mensagens == [('CON', {'nome': 'ana'}), ('SCI', {}), ('QUI', {})]
+
+
+@pytest.mark.parametrize('quadro', [
+    _quadro(b'WIN', bytes((len(JOGADAS),))),  # Código de jogada fora da tabela
+    _quadro(b'LOS', b''),
+    _quadro(b'TIE', b'\x00\x01'),
+    _quadro(b'ROC', b'x'),
+    _quadro(b'RAN', b'[1, 2]', FLAG_PAYLOAD_JSON),
+    _quadro(b'RAN', b'{nao e json', FLAG_PAYLOAD_JSON),
+    _quadro(b'MAT', b'\xff\xfe'),
+    _quadro(b'\xff\xff\xff', b''),
+])
+def test_quadro_binario_mal_formado_levanta_value_error(quadro):
+    # Os dois motores do servidor tratam ValueError como erro do cliente e fecham a conexão
+    with pytest.raises(ValueError):
+        LeitorQuadros().alimentar(quadro)
+
+
+def test_codigo_de_jogada_invalido_e_quadro_invalido():
+    with pytest.raises(QuadroInvalido):
+        LeitorQuadros().alimentar(_quadro(b'WIN', b'\x09'))
+
+
+def test_linha_json_invalida_e_entregue_para_registro():
+    linhas = [b'nao e json\n', b'{"type": "RAN", "payload": [1]}\n', b'[1]\n']
+    for linha in linhas:
+        assert LeitorQuadros().alimentar(linha) == [(None, linha[:-1].decode())]
+
+
+def test_receber_le_do_socket_com_recv_into():
+    servidor, cliente = socket.socketpair()
+    with servidor, cliente:
+        leitor = LeitorQuadros()
+        cliente.sendall(CODEC_JSON.codificar('CON', {'nome': 'ana'}) + codificar_binario('PAP')[:2])
+        assert leitor.receber(servidor) == [('CON', {'nome': 'ana'})]
+        cliente.sendall(codificar_binario('PAP')[2:])
+        assert leitor.receber(servidor) == [('PAP', {})]
+        cliente.close()
+        assert leitor.receber(servidor) is None
+
+
+def test_buffer_nao_cresce_com_muitos_quadros_pequenos():
+    leitor = LeitorQuadros()
+    capacidade = len(leitor.buffer)
+    quadro = CODEC_JSON.codificar('ROC') + codificar_binario('SCI')
+    for _ in range(5000):
+        assert leitor.alimentar(quadro) == [('ROC', {}), ('SCI', {})]
+    assert len(leitor.buffer) == capacidade
+
+
+def test_buffer_cresce_ate_caber_um_quadro_grande():
+    leitor = LeitorQuadros(tamanho_maximo=100000, capacidade_inicial=64)
+    nome = 'n' * 50000
+    assert leitor.alimentar(CODEC_JSON.codificar('CON', {'nome': nome})) == [('CON', {'nome': nome})]
+    assert 50000 <= len(leitor.buffer) <= 100000 + TAMANHO_LEITURA
+
+
+def test_quadros_acima_do_maximo_sao_recusados():
+    with pytest.raises(QuadroGrandeDemais):
+        LeitorQuadros(tamanho_maximo=1000).alimentar(_quadro(b'MAT', b'x' * 2000))
+    leitor = LeitorQuadros(tamanho_maximo=1000)
+    with pytest.raises(QuadroGrandeDemais):
+        leitor.alimentar(b'{"type": "CON", "payload": {"nome": "' + b'x' * 5000)  # Sem quebra de linha
+    assert len(leitor.buffer) <= 1000 + TAMANHO_LEITURA
@@ -0,0 +1,184 @@
+# Testes do ranking (ser_ranking): ordem e páginas do Placar e do RankingFragmentado, persistência em disco
+
+import itertools
+import os
+import random
+import shutil
+
+import pytest
+
+from ser_ranking import Placar, RankingDuravel, RankingFragmentado
+
+
+class _Referencia:
+    """O mesmo ranking, ordenado do jeito ingênuo a cada consulta."""
+
+    def __init__(self):
+        self.vitorias = {}
+        self.chegada = {}  # nome -> quando chegou ao nível atual
+        self.relogio = itertools.count()
+
+    def incrementar(self, nome, delta=1):
+        self.vitorias[nome] = self.vitorias.get(nome, 0) + delta
+        self.chegada[nome] = next(self.relogio)
+
+    def ordenado(self):
+        return sorted(self.vitorias, key=lambda nome: (-self.vitorias[nome], self.chegada[nome]))
+
+    def posicao(self, nome):
+        return 1 + sum(vitorias > self.vitorias[nome] for vitorias in self.vitorias.values())
+
+
+def _sortear(ranking, referencia, operacoes, jogadores=60, semente=5):
+    gerador = random.Random(semente)
+    for _ in range(operacoes):
+        nome = f'j{gerador.randrange(jogadores)}'
+        delta = gerador.choice((1, 1, 1, 3, 40))  # Às vezes passa do tamanho inicial da árvore
+        ranking.incrementar(nome, delta)
+        referencia.incrementar(nome, delta)
+
+
+def test_placar_pagina_e_posicao_conferem_com_a_ordenacao():
+    placar, referencia = Placar(), _Referencia()
+    _sortear(placar, referencia, 2000)
+    ordenado = referencia.ordenado()
+    assert [nome for nome, _ in placar.pagina(0, len(ordenado))] == ordenado
+    for offset, limite in [(0, 10), (7, 5), (25, 100), (len(ordenado) - 1, 10)]:
+        esperado = [(nome, referencia.vitorias[nome]) for nome in ordenado[offset:offset + limite]]
+        assert placar.pagina(offset, limite) == esperado
+    for nome in ordenado:
+        assert placar.posicao(nome) == referencia.posicao(nome)
+    assert placar.posicao('ninguem') is None
+
+
+@pytest.mark.parametrize('offset, limite', [(-1, 10), (0, 0), (10, 5)])
+def test_pagina_fora_dos_limites_e_vazia(offset, limite):
+    placar = Placar()
+    for nome in 'abcdefghij':
+        placar.registrar(nome)
+    assert placar.pagina(offset, limite) == []
+
+
+def test_empatados_dividem_a_posicao_e_seguem_a_ordem_de_chegada():
+    placar = Placar()
+    for nome in ('a', 'b', 'c'):
+        placar.incrementar(nome, 2)
+    placar.incrementar('d', 5)
+    assert placar.pagina() == [('d', 5), ('a', 2), ('b', 2), ('c', 2)]
+    assert [placar.posicao(nome) for nome in 'dabc'] == [1, 2, 2, 2]
+
+
+def test_carregar_reconstroi_o_indice():
+    placar = Placar()
+    placar.carregar([('a', 3), ('b', 100), ('c', 0), ('a', 7)])
+    assert placar.pagina() == [('b', 100), ('a', 7), ('c', 0)]
+    assert placar.posicao('c') == 3
+
+
+def test_fragmentado_pagina_em_ordem_e_sem_repetir():
+    ranking, referencia = RankingFragmentado(8), _Referencia()
+    _sortear(ranking, referencia, 2000, semente=9)
+    total = len(referencia.vitorias)
+    paginas = [ranking.pagina(offset, 7) for offset in range(0, total, 7)]
+    itens = [item for pagina in paginas for item in pagina]
+    assert sorted(itens) == sorted(referencia.vitorias.items())
+    vitorias = [valor for _, valor in itens]
+    assert vitorias == sorted(vitorias, reverse=True)
+    for nome in referencia.vitorias:
+        assert ranking.posicao(nome) == referencia.posicao(nome)
+
+
+def test_consultar_e_mesclar():
+    ranking = RankingFragmentado(4)
+    ranking.incrementar('ana', 3)
+    assert ranking.registrar('bia') and not ranking.registrar('bia')
+    assert sorted(ranking.mesclar([('ana', 1), ('bia', 2), ('caio', 0)])) == [('bia', 2), ('caio', 0)]
+    total, pagina, posicao, vitorias = ranking.consultar(0, 2, 'bia')
+    assert (total, pagina, posicao, vitorias) == (3, [('ana', 3), ('bia', 2)], 2, 2)
+    assert ranking.consultar(0, 1) == (3, [('ana', 3)], None, None)
+
+
+# --- RankingDuravel ---
+
+def _abrir(base, **opcoes):
+    """Carrega o ranking salvo em `base` e liga a persistência, como configurar_persistencia."""
+    ranking = RankingFragmentado(4)
+    persistencia = RankingDuravel(str(base), intervalo_fsync=3600, **opcoes)
+    persistencia.carregar(ranking)
+    ranking.persistencia = persistencia
+    return ranking, persistencia
+
+
+def _estado(ranking):
+    with ranking.travado():
+        return dict(ranking.itens())
+
+
+def _recarregar(base):
+    """Estado que um servidor novo carregaria de `base`."""
+    ranking, persistencia = _abrir(base)
+    persistencia.fechar()
+    return _estado(ranking)
+
+
+def test_reabrir_recupera_vitorias_e_nomes(tmp_path):
+    base = tmp_path / 'dados' / 'ranking'
+    ranking, persistencia = _abrir(base)
+    ranking.registrar('ana')
+    ranking.incrementar('bia', 2)
+    ranking.incrementar('ana')
+    persistencia.fechar()
+    recarregado, persistencia = _abrir(base)
+    assert _estado(recarregado) == {'ana': 1, 'bia': 2}
+    recarregado.incrementar('ana', 4)
+    persistencia.fechar()
+    assert _recarregar(base) == {'ana': 5, 'bia': 2}
+
+
+def test_registro_incompleto_no_fim_do_log_e_descartado(tmp_path):
+    base = tmp_path / 'ranking'
+    ranking, persistencia = _abrir(base)
+    ranking.incrementar('ana', 3)
+    ranking.incrementar('bia', 1)
+    persistencia.fechar()
+    log = persistencia.caminho_log(0)
+    tamanho = os.path.getsize(log)
+    with open(log, 'r+b') as arquivo:
+        arquivo.truncate(tamanho - 2)  # Queda no meio da gravação do último registro
+    recarregado, persistencia = _abrir(base)
+    assert _estado(recarregado) == {'ana': 3}
+    recarregado.incrementar('caio')
+    persistencia.fechar()
+    assert _recarregar(base) == {'ana': 3, 'caio': 1}
+
+
+def test_compactar_gera_snapshot_e_log_novo(tmp_path):
+    base = tmp_path / 'ranking'
+    ranking, persistencia = _abrir(base, limite_compactacao=0)
+    for indice in range(50):
+        ranking.incrementar(f'j{indice % 7}', indice)
+    persistencia.descarregar()
+    assert persistencia.precisa_compactar()
+    persistencia.compactar(ranking)
+    assert persistencia.geracao == 1 and not os.path.exists(persistencia.caminho_log(0))
+    ranking.incrementar('j0', 1000)
+    persistencia.fechar()
+    esperado = _estado(ranking)
+    assert _recarregar(base) == esperado
+
+
+def test_queda_antes_de_apagar_o_log_antigo_nao_conta_duas_vezes(tmp_path):
+    base = tmp_path / 'ranking'
+    ranking, persistencia = _abrir(base)
+    ranking.incrementar('ana', 2)
+    persistencia.descarregar()
+    antigo = persistencia.caminho_log(0)
+    copia = tmp_path / 'copia.log'
+    shutil.copy(antigo, copia)
+    persistencia.compactar(ranking)
+    persistencia.fechar()
+    shutil.copy(copia, antigo)  # O log já incluído no snapshot sobreviveu à queda
+    recarregado, persistencia = _abrir(base)
+    assert _estado(recarregado) == {'ana': 2}
+    assert not os.path.exists(antigo)
+    persistencia.fechar()
@@ -0,0 +1,181 @@
+# Testes do servidor (ser_server): slots de jogada, limite de partidas e partidas completas nos dois motores de conexão
+
+import socket
+import threading
+import time
+
+import pytest
+
+import ser_server
+from apoio import PRAZO, Cliente, Processo, porta_livre
+from ser_conexao import ClienteLento, ConexaoSaida
+from ser_fila import FilaPareamento
+from ser_server import SlotsJogada, determinar_vencedor
+
+
+def _jogadores():
+    return {'nome': 'ana'}, {'nome': 'bia'}
+
+
+def test_rodada_resolve_assim_que_as_duas_jogadas_chegam():
+    ana, bia = _jogadores()
+    slots = SlotsJogada(ana, bia)
+    assert not slots.registrar(ana, 'roc')  # Nenhuma rodada aberta
+    slots.abrir_rodada(60)
+    threading.Timer(0.05, slots.registrar, (bia, 'sci')).start()
+    slots.registrar(ana, 'pap')
+    inicio = time.monotonic()
+    assert slots.aguardar() == ('pap', 'sci')
+    assert time.monotonic() - inicio < 5
+    assert not slots.temporizador.ativo
+
+
+def test_prazo_esgotado_vira_timeout_so_para_quem_nao_jogou():
+    ana, bia = _jogadores()
+    slots = SlotsJogada(ana, bia)
+    slots.abrir_rodada(60)
+    slots.registrar(bia, 'roc')
+    slots.expirar(slots.rodada - 1)  # Prazo de uma rodada anterior: ignorado
+    assert slots.jogadas == [None, 'roc']
+    slots.expirar(slots.rodada)
+    assert slots.aguardar() == ('TIMEOUT', 'roc')
+
+
+def test_quem_desconectou_perde_as_rodadas_seguintes_sem_esperar_o_prazo():
+    ana, bia = _jogadores()
+    slots = SlotsJogada(ana, bia)
+    slots.abrir_rodada(60)
+    slots.desconectar(bia)
+    slots.registrar(ana, 'sci')
+    assert slots.aguardar() == ('sci', 'TIMEOUT')
+    slots.abrir_rodada(60)
+    slots.registrar(ana, 'roc')
+    assert slots.aguardar() == ('roc', 'TIMEOUT')
+
+
+def test_determinar_vencedor():
+    ana, bia = _jogadores()
+    assert determinar_vencedor('roc', ana, 'sci', bia) == (ana, bia)
+    assert determinar_vencedor('roc', ana, 'pap', bia) == (bia, ana)
+    assert determinar_vencedor('TIMEOUT', ana, 'sci', bia) == (bia, ana)
+    assert determinar_vencedor('pap', ana, 'pap', bia) == (None, None)
+    assert determinar_vencedor('TIMEOUT', ana, 'TIMEOUT', bia) == (None, None)
+
+
+class _Escalonador:
+    """gerenciar_partida rodando com `vagas` vagas, uma fila nova e partidas que só acabam quando liberadas."""
+
+    def __init__(self, monkeypatch, vagas):
+        monkeypatch.setattr(ser_server, 'max_partidas_simultaneas', vagas)
+        monkeypatch.setattr(ser_server, 'vagas_partidas', threading.BoundedSemaphore(vagas))
+        aviso = threading.Event()
+        monkeypatch.setattr(ser_server, 'aviso_partidas', aviso)
+        self.fila = FilaPareamento(aviso=aviso)
+        monkeypatch.setattr(ser_server, 'jogadores_em_espera', self.fila)
+        monkeypatch.setattr(ser_server, 'jogar_partida', self.jogar_partida)
+        self.liberar = threading.Event()
+        self.trava = threading.Lock()
+        self.jogadas, self.ativas, self.maximo = [], 0, 0
+        threading.Thread(target=ser_server.gerenciar_partida, daemon=True).start()
+
+    def jogar_partida(self, jogador1_info, jogador2_info):
+        with self.trava:
+            self.jogadas.append((jogador1_info['nome'], jogador2_info['nome']))
+            self.ativas += 1
+            self.maximo = max(self.maximo, self.ativas)
+        self.liberar.wait(PRAZO)
+        with self.trava:
+            self.ativas -= 1
+
+    def entrar(self, *nomes):
+        for nome in nomes:
+            self.fila.entrar({'nome': nome, 'socket': object()})
+
+    def esperar(self, condicao, prazo=PRAZO):
+        limite = time.monotonic() + prazo
+        while not condicao():
+            assert time.monotonic() < limite
+            time.sleep(0.005)
+
+
+def test_par_completo_comeca_sem_esperar_uma_volta_do_escalonador(monkeypatch):
+    escalonador = _Escalonador(monkeypatch, 4)
+    time.sleep(0.1)  # Escalonador já parado à espera de jogadores
+    for indice in range(3):
+        escalonador.entrar(f'a{indice}')
+        time.sleep(0.05)
+        escalonador.entrar(f'b{indice}')
+        escalonador.esperar(lambda: len(escalonador.jogadas) == indice + 1, prazo=0.3)
+    escalonador.liberar.set()
+
+
+def test_partidas_alem_do_limite_esperam_na_fila(monkeypatch):
+    escalonador = _Escalonador(monkeypatch, 2)
+    escalonador.entrar(*(f'j{indice}' for indice in range(6)))
+    escalonador.esperar(lambda: len(escalonador.jogadas) == 2)
+    time.sleep(0.2)
+    # Com as duas vagas ocupadas, o terceiro par continua na fila
+    assert len(escalonador.jogadas) == 2 and len(escalonador.fila) == 2
+    escalonador.liberar.set()
+    # A vaga liberada é usada logo, não na próxima volta do escalonador
+    escalonador.esperar(lambda: len(escalonador.jogadas) == 3, prazo=0.3)
+    escalonador.esperar(lambda: not escalonador.ativas)
+    assert escalonador.jogadas == [('j0', 'j1'), ('j2', 'j3'), ('j4', 'j5')]
+    assert escalonador.maximo == 2 and len(escalonador.fila) == 0
+
+
+def test_leitura_de_cliente_expulso_termina_sem_erro(monkeypatch):
+    erros = []
+    monkeypatch.setattr(threading, 'excepthook', erros.append)
+    servidor, cliente = socket.socketpair()
+    conn = ConexaoSaida(servidor, ('127.0.0.1', 0), limite_bytes=1024)
+    with pytest.raises(ClienteLento):
+        conn.sendall(b'x' * 2048)
+    # A escritora fecha o socket expulso; a leitura volta a ele depois disso
+    limite = time.monotonic() + PRAZO
+    while servidor.fileno() != -1:
+        assert time.monotonic() < limite
+        time.sleep(0.01)
+    leitora = threading.Thread(target=ser_server.lidar_com_cliente, args=(conn, ('127.0.0.1', 0)))
+    leitora.start()
+    leitora.join(PRAZO)
+    assert not leitora.is_alive() and erros == []
+    cliente.close()
+
+
+@pytest.mark.parametrize('modo', ser_server.MODOS_SERVIDOR)
+def test_partidas_simultaneas(tmp_path, modo):
+    porta = porta_livre()
+    servidor = Processo(tmp_path, 'servidor', ['ser_server.py', '--modo', modo, '--porta', str(porta),
+                                               '--max-partidas', '2', '--prazo-rodada', '1'], 'Escutando em')
+    try:
+        # Dois pares (o segundo conecta depois de o primeiro ser pareado): um em JSON, que joga, e
+        # um com o codec binário, em que um dos dois nunca joga e perde cada rodada pelo prazo
+        jogadas = {'ana': 'ROC', 'bia': 'SCI', 'caio': 'PAP', 'duda': None}
+        clientes, oponentes, resultados, threads = {}, {}, {}, []
+        inicio = time.monotonic()
+        for par in ([('ana', None), ('bia', None)], [('caio', 'bin'), ('duda', 'bin')]):
+            for nome, codec in par:
+                clientes[nome] = Cliente(porta, nome, codec)
+            for nome, _ in par:
+                oponentes[nome] = clientes[nome].esperar('MAT')['oponente']
+                threads.append(threading.Thread(target=lambda nome=nome: resultados.setdefault(
+                    nome, clientes[nome].jogar(jogadas[nome]))))
+                threads[-1].start()
+        for thread in threads:
+            thread.join(PRAZO)
+        # Em sequência, as partidas levariam uns 4,5 s e 7,5 s (pausas entre as rodadas e prazos)
+        assert time.monotonic() - inicio < 10
+        assert oponentes == {'ana': 'bia', 'bia': 'ana', 'caio': 'duda', 'duda': 'caio'}
+        for nome, oponente in oponentes.items():
+            assert len(resultados[nome]) == 3
+            espelho = [{'WIN': 'LOS', 'LOS': 'WIN', 'TIE': 'TIE'}[resultado] for resultado, _ in resultados[nome]]
+            assert espelho == [resultado for resultado, _ in resultados[oponente]]
+            jogada_oponente = jogadas[oponente].lower() if jogadas[oponente] else 'TIMEOUT'
+            assert {jogada for _, jogada in resultados[nome]} == {jogada_oponente}
+        assert resultados['ana'] == [('WIN', 'sci')] * 3 and resultados['caio'] == [('WIN', 'TIMEOUT')] * 3
+        assert clientes['bia'].vitorias('ana') == 3 and clientes['duda'].vitorias('caio') == 3
+        for cliente in clientes.values():
+            cliente.fechar()
+    finally:
+        servidor.parar()
@@ -0,0 +1,67 @@
+# Testes das travas instrumentadas (ser_sync)
+
+import gc
+import threading
+
+from ser_fila import FilaPareamento
+from ser_ranking import RankingFragmentado
+from ser_sync import TravaInstrumentada, relatorio_travas
+
+
+def test_caminho_sem_disputa_nao_conta_contencao():
+    trava = TravaInstrumentada('livre')
+    for _ in range(3):
+        with trava:
+            assert trava.locked()
+    assert not trava.locked()
+    assert trava.estatisticas() == {'nome': 'livre', 'aquisicoes': 3, 'contencoes': 0, 'espera_total': 0.0}
+
+
+def test_trava_ocupada_conta_contencao_e_espera():
+    trava = TravaInstrumentada('disputada')
+    trava.acquire()
+    assert not trava.acquire(blocking=False)
+    assert not trava.acquire(timeout=0.05)
+    threading.Timer(0.1, trava.release).start()
+    assert trava.acquire(timeout=5)
+    trava.release()
+    estatisticas = trava.estatisticas()
+    assert (estatisticas['aquisicoes'], estatisticas['contencoes']) == (2, 1)
+    assert estatisticas['espera_total'] > 0.05
+
+
+def test_relatorio_ordena_pela_espera():
+    calma, agitada = TravaInstrumentada('calma'), TravaInstrumentada('agitada')
+    calma.espera_total, agitada.espera_total = 1e6, 2e6
+    nomes = [estatisticas['nome'] for estatisticas in relatorio_travas()]
+    assert nomes[:2] == ['agitada', 'calma']
+    calma.espera_total = agitada.espera_total = 0.0
+
+
+def test_trava_descartada_sai_do_relatorio():
+    def filas():
+        return sum(estatisticas['nome'] == 'fila' for estatisticas in relatorio_travas())
+    antes = filas()
+    temporarias = [FilaPareamento() for _ in range(5)]
+    assert filas() == antes + 5
+    del temporarias
+    gc.collect()
+    assert filas() == antes
+
+
+def test_incrementos_concorrentes_em_fragmentos_diferentes_nao_se_perdem():
+    ranking = RankingFragmentado(4)
+    nomes = [f'j{indice}' for indice in range(16)]
+
+    def incrementar():
+        for _ in range(500):
+            for nome in nomes:
+                ranking.incrementar(nome)
+
+    threads = [threading.Thread(target=incrementar) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total, pagina, _, _ = ranking.consultar(0, len(nomes))
+    assert total == len(nomes) and all(vitorias == 2000 for _, vitorias in pagina)
@@ -0,0 +1,60 @@
+# Testes da roda de temporizadores hierárquica (ser_temporizador)
+
+import threading
+
+import pytest
+
+from ser_temporizador import RodaTemporizadores
+
+
+def _roda():
+    # Níveis pequenos (4 posições cada, 64 tiques ao todo) para cruzar todos em poucos tiques
+    return RodaTemporizadores(resolucao=1.0, bits_niveis=(2, 2, 2))
+
+
+def _girar(roda, tiques, vencidos):
+    for _ in range(tiques):
+        for temporizador in roda._avancar():
+            temporizador.funcao(*temporizador.args)
+            vencidos.append((roda.tique, *temporizador.args))
+
+
+@pytest.mark.parametrize('inicio', [0, 3, 17])
+def test_cada_prazo_vence_no_seu_tique_em_qualquer_nivel(inicio):
+    roda, vencidos = _roda(), []
+    _girar(roda, inicio, vencidos)
+    atrasos = list(range(1, 64)) + [64, 100, 200]  # Os últimos passam do alcance da roda
+    for atraso in atrasos:
+        roda.agendar(atraso, lambda atraso: None, atraso)
+    assert len(roda) == len(atrasos)
+    _girar(roda, 250, vencidos)
+    assert vencidos == [(inicio + atraso, atraso) for atraso in atrasos]
+    assert len(roda) == 0
+
+
+def test_atraso_e_arredondado_para_cima_com_minimo_de_um_tique():
+    roda = RodaTemporizadores(resolucao=0.1)
+    assert roda.agendar(0, print).expira == 1
+    assert roda.agendar(0.25, print).expira == 3
+    assert roda.agendar(0.3, print).expira == 3
+
+
+def test_cancelar_depois_de_descer_de_nivel():
+    roda, vencidos = _roda(), []
+    cancelado = roda.agendar(40, lambda: None)
+    mantido = roda.agendar(41, lambda: None)
+    _girar(roda, 35, vencidos)  # Os dois já desceram para os níveis de baixo
+    cancelado.cancelar()
+    cancelado.cancelar()
+    assert not cancelado.ativo and mantido.ativo and len(roda) == 1
+    _girar(roda, 10, vencidos)
+    assert vencidos == [(41,)]
+    assert not mantido.ativo
+
+
+def test_thread_da_roda_chama_a_funcao():
+    roda = RodaTemporizadores(resolucao=0.01)
+    roda.iniciar()
+    evento = threading.Event()
+    roda.agendar(0.05, evento.set)
+    assert evento.wait(2.0)
@@ -0,0 +1,75 @@
+# Testes do simulador de torneios (torneio): partidas em lote, pareamento suíço e o pool de processos
+
+import random
+
+import pytest
+
+import game
+import torneio
+from torneio import Torneio, distribuir_estrategias, jogar_lote, lotes, pares_suico
+
+
+def test_lote_soma_os_totais_de_cada_bot(monkeypatch):
+    monkeypatch.setattr(torneio, '_estrategias_bots', [torneio._pedra, torneio._ciclo, torneio._contra])
+    # Pedra contra ciclo: empate, derrota e vitória. Contra vence pedra a partir da 2ª rodada.
+    totais = jogar_lote([(0, 1), (2, 0)], 'semente')
+    assert totais[1] == [1, 0, 0, 1, 1]
+    assert totais[2][:3] == [1, 1, 0] and totais[2][4] >= 2
+    assert totais[0][:4] == [2, 0, 1, 1]
+
+
+def test_lotes_nao_passam_do_tamanho():
+    assert list(lotes(iter(range(5)), 2)) == [[0, 1], [2, 3], [4]]
+    assert list(lotes([], 2)) == []
+
+
+def test_suico_evita_repetir_confrontos_e_deixa_um_de_folga():
+    gerador, jogados = random.Random(1), set()
+    confrontos = []
+    for _ in range(4):
+        pares, folga = pares_suico([0] * 9, jogados, gerador)
+        assert len(pares) == 4 and folga is not None
+        assert sorted([bot for par in pares for bot in par] + [folga]) == list(range(9))
+        confrontos += [tuple(sorted(par)) for par in pares]
+    assert len(set(confrontos)) == len(confrontos)
+
+
+def test_distribuir_estrategias_por_peso():
+    assert distribuir_estrategias('pedra:2, ciclo', 5) == ['pedra', 'pedra', 'ciclo', 'pedra', 'pedra']
+    assert distribuir_estrategias('torneio:_imitar', 2) == ['torneio:_imitar'] * 2
+    with pytest.raises(ValueError):
+        distribuir_estrategias('pedra,desconhecida', 2)
+
+
+def _executar(formato, bots=13, **opcoes):
+    publicados = []
+    jogo = Torneio(distribuir_estrategias('aleatoria,pedra,contra', bots), 2, 7, 3,
+                   ao_terminar=publicados.append, intervalo=0, **opcoes)
+    jogo.executar(formato, rodadas_suico=4)
+    return jogo, publicados
+
+
+def test_todos_contra_todos_publica_cada_bot_uma_vez():
+    jogo, publicados = _executar('todos')
+    assert sorted(resultado['bot'] for resultado in publicados) == list(range(13))
+    assert all(resultado['partidas'] == 12 for resultado in publicados)
+    assert jogo.partidas == 13 * 12 // 2
+    assert sum(total[1] for total in jogo.totais) == sum(total[2] for total in jogo.totais)
+    # A mesma semente dá o mesmo torneio, qualquer que seja a ordem em que os lotes terminam
+    assert _executar('todos')[0].totais == jogo.totais
+
+
+def test_suico_publica_todos_ao_fim_da_ultima_rodada():
+    jogo, publicados = _executar('suico')
+    assert sorted(resultado['bot'] for resultado in publicados) == list(range(13))
+    assert jogo.partidas == 4 * (13 // 2) and sum(jogo.folgas) == 4
+    for resultado in publicados:
+        assert resultado['partidas'] + jogo.folgas[resultado['bot']] == 4
+        assert resultado['pontos'] == jogo.pontos(resultado['bot'])
+
+
+def test_estrategias_retornam_jogadas_codificadas():
+    gerador = random.Random(0)
+    for estrategia in torneio.ESTRATEGIAS.values():
+        for rodada, ultima in [(1, None), (2, game.PAPER), (3, game.SCISSORS)]:
+            assert estrategia(rodada, ultima, gerador) in torneio.JOGADAS
@@ -0,0 +1,356 @@
+# torneio.py (Simulador offline de torneios entre bots, sem sockets)
+
+import argparse
+import importlib
+import itertools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import game
+
+FORMATOS = ('todos', 'suico')
+RODADAS_POR_PARTIDA = 3  # Melhor de 3, como no servidor (as três rodadas são sempre jogadas)
+LOTE_PADRAO = 2000  # Partidas por tarefa enviada ao pool
+JOGADAS = (game.ROCK, game.PAPER, game.SCISSORS)
+PERDE_PARA = {game.ROCK: game.PAPER, game.PAPER: game.SCISSORS, game.SCISSORS: game.ROCK}
+
+
+# --- Estratégias ---
+# Cada estratégia recebe o número da rodada (1 a 3), a última jogada do
+# oponente na partida (None na primeira rodada) e um random.Random, e
+# retorna a jogada codificada (game.ROCK, game.PAPER ou game.SCISSORS).
+# Estratégias externas são passadas como 'modulo:funcao'.
+def _aleatoria(rodada, ultima_oponente, gerador):
+    return gerador.choice(JOGADAS)
+
+
+def _pedra(rodada, ultima_oponente, gerador):
+    return game.ROCK
+
+
+def _ciclo(rodada, ultima_oponente, gerador):
+    return JOGADAS[(rodada - 1) % len(JOGADAS)]
+
+
+def _contra(rodada, ultima_oponente, gerador):
+    # Joga o que venceria a jogada anterior do oponente
+    if ultima_oponente is None:
+        return gerador.choice(JOGADAS)
+    return PERDE_PARA[ultima_oponente]
+
+
+def _imitar(rodada, ultima_oponente, gerador):
+    return gerador.choice(JOGADAS) if ultima_oponente is None else ultima_oponente
+
+
+ESTRATEGIAS = {'aleatoria': _aleatoria, 'pedra': _pedra, 'ciclo': _ciclo, 'contra': _contra, 'imitar': _imitar}
+
+
+def carregar_estrategia(nome):
+    if nome in ESTRATEGIAS:
+        return ESTRATEGIAS[nome]
+    modulo, separador, funcao = nome.partition(':')
+    if not separador:
+        raise ValueError(f"estratégia desconhecida '{nome}' (use {', '.join(ESTRATEGIAS)} ou modulo:funcao)")
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+# --- Processo do pool ---
+# Estratégia de cada bot, carregada uma vez por processo (ver _iniciar_processo)
+_estrategias_bots = None
+
+
+def _iniciar_processo(nomes_estrategias):
+    global _estrategias_bots
+    carregadas = {nome: carregar_estrategia(nome) for nome in set(nomes_estrategias)}
+    _estrategias_bots = [carregadas[nome] for nome in nomes_estrategias]
+
+
+def jogar_lote(pares, semente):
+    """
+    Joga as partidas de `pares` [(bot1, bot2), ...] e retorna só os totais
+    por bot envolvido: {bot: [partidas, vitórias, derrotas, empates,
+    rodadas vencidas]}. Cada rodada das partidas do lote é resolvida de uma
+    vez por game.resolve_rounds.
+    """
+    gerador = random.Random(semente)
+    estrategias = _estrategias_bots
+    ultimas1 = [None] * len(pares)
+    ultimas2 = [None] * len(pares)
+    saldo = [0] * len(pares)  # Rodadas vencidas pelo bot1 menos as vencidas pelo bot2
+    totais = {}
+    for rodada in range(1, RODADAS_POR_PARTIDA + 1):
+        jogadas1 = bytes(estrategias[bot1](rodada, ultima, gerador) for (bot1, _), ultima in zip(pares, ultimas2))
+        jogadas2 = bytes(estrategias[bot2](rodada, ultima, gerador) for (_, bot2), ultima in zip(pares, ultimas1))
+        resultados = game.resolve_rounds(jogadas1, jogadas2)
+        for indice, resultado in enumerate(resultados):
+            if resultado:
+                saldo[indice] += resultado
+                bot = pares[indice][0 if resultado > 0 else 1]
+                totais.setdefault(bot, [0, 0, 0, 0, 0])[4] += 1
+        ultimas1, ultimas2 = list(jogadas1), list(jogadas2)
+
+    for (bot1, bot2), resultado in zip(pares, saldo):
+        total1 = totais.setdefault(bot1, [0, 0, 0, 0, 0])
+        total2 = totais.setdefault(bot2, [0, 0, 0, 0, 0])
+        total1[0] += 1
+        total2[0] += 1
+        if resultado > 0:
+            total1[1] += 1
+            total2[2] += 1
+        elif resultado < 0:
+            total1[2] += 1
+            total2[1] += 1
+        else:
+            total1[3] += 1
+            total2[3] += 1
+    return totais
+
+
+# --- Agendamento ---
+def lotes(pares, tamanho):
+    """Agrupa um iterável de pares em listas de até `tamanho`, sem materializar o resto."""
+    pares = iter(pares)
+    while True:
+        lote = list(itertools.islice(pares, tamanho))
+        if not lote:
+            return
+        yield lote
+
+
+def pares_todos_contra_todos(bots):
+    """Todos os pares (i, j), i < j, gerados sob demanda: o torneio inteiro nunca fica em memória."""
+    return itertools.combinations(range(bots), 2)
+
+
+def pares_suico(pontos, jogados, gerador, candidatos=50):
+    """
+    Pareamento de uma rodada suíça: ordena os bots por pontos (empates em
+    ordem aleatória) e pareia cada um com o próximo livre da lista contra
+    quem ainda não jogou, olhando no máximo `candidatos` à frente (se todos
+    já jogaram com ele, fica o primeiro livre). Com número ímpar de bots, o
+    último fica de folga. Retorna (pares, bot de folga ou None).
+    """
+    ordem = sorted(range(len(pontos)), key=lambda bot: (-pontos[bot], gerador.random()))
+    usados = [False] * len(ordem)
+    pares = []
+    for posicao, bot in enumerate(ordem):
+        if usados[posicao]:
+            continue
+        primeira = escolhida = None
+        vistas = 0
+        for outra in range(posicao + 1, len(ordem)):
+            if usados[outra]:
+                continue
+            if primeira is None:
+                primeira = outra
+            if _par(bot, ordem[outra]) not in jogados:
+                escolhida = outra
+                break
+            vistas += 1
+            if vistas >= candidatos:
+                break
+        if primeira is None:
+            return pares, bot
+        if escolhida is None:
+            escolhida = primeira
+        usados[posicao] = usados[escolhida] = True
+        pares.append((bot, ordem[escolhida]))
+        jogados.add(_par(bot, ordem[escolhida]))
+    return pares, None
+
+
+def _par(bot1, bot2):
+    # Um inteiro por par (e não uma tupla): o conjunto de confrontos ocupa bem menos memória
+    return bot1 << 32 | bot2 if bot1 < bot2 else bot2 << 32 | bot1
+
+
+class Torneio:
+    """
+    Distribui os lotes de partidas por um pool de processos. No máximo
+    2 lotes por processo ficam em andamento: o próximo lote só é gerado
+    quando um termina, então a memória não cresce com o tamanho do
+    torneio, só com o número de bots.
+
+    Os totais de cada bot são somados à medida que os lotes terminam, e um
+    bot é publicado (`ao_terminar`) assim que todas as partidas dele foram
+    jogadas.
+    """
+
+    def __init__(self, estrategias, processos, tamanho_lote, semente, ao_terminar=None, intervalo=2.0):
+        self.estrategias = estrategias  # Nome da estratégia de cada bot
+        self.processos = processos
+        self.tamanho_lote = tamanho_lote
+        self.semente = semente
+        self.ao_terminar = ao_terminar
+        self.intervalo = intervalo
+        self.totais = [[0, 0, 0, 0, 0] for _ in estrategias]
+        self.pendentes = [0] * len(estrategias)  # Partidas ainda não jogadas de cada bot
+        self.folgas = [0] * len(estrategias)
+        self.partidas = 0
+        self.lotes = itertools.count()
+        self.inicio = self.ultimo_progresso = time.perf_counter()
+
+    def pontos(self, bot):
+        """2 por vitória ou folga (torneio suíço) e 1 por empate."""
+        _, vitorias, _, empates, _ = self.totais[bot]
+        return 2 * (vitorias + self.folgas[bot]) + empates
+
+    def executar(self, formato, rodadas_suico=None):
+        with ProcessPoolExecutor(self.processos, initializer=_iniciar_processo,
+                                 initargs=(self.estrategias,)) as pool:
+            if formato == 'todos':
+                bots = len(self.estrategias)
+                self.pendentes = [bots - 1] * bots
+                self._jogar(pool, pares_todos_contra_todos(bots))
+            else:
+                self._suico(pool, rodadas_suico)
+
+    def _suico(self, pool, rodadas):
+        gerador = random.Random(self.semente)
+        jogados = set()  # Pares que já se enfrentaram: cresce com bots x rodadas, não com partidas por lote
+        for rodada in range(rodadas):
+            pares, folga = pares_suico([self.pontos(bot) for bot in range(len(self.estrategias))], jogados, gerador)
+            if folga is not None:
+                self.folgas[folga] += 1
+            ultima = rodada == rodadas - 1
+            if ultima:
+                # Só ao fim da última rodada os resultados de cada bot estão completos
+                for bot1, bot2 in pares:
+                    self.pendentes[bot1] += 1
+                    self.pendentes[bot2] += 1
+                if folga is not None:
+                    self._publicar(folga)
+            self._jogar(pool, pares, contar_pendentes=ultima)
+
+    def _jogar(self, pool, pares, contar_pendentes=True):
+        em_andamento = set()
+        for lote in lotes(pares, self.tamanho_lote):
+            if len(em_andamento) >= 2 * self.processos:
+                prontos, em_andamento = wait(em_andamento, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    self._somar(futuro.result(), contar_pendentes)
+            em_andamento.add(pool.submit(jogar_lote, lote, f'{self.semente}:{next(self.lotes)}'))
+        for futuro in wait(em_andamento).done:
+            self._somar(futuro.result(), contar_pendentes)
+
+    def _somar(self, totais_lote, contar_pendentes):
+        partidas = 0
+        for bot, parcial in totais_lote.items():
+            total = self.totais[bot]
+            for indice, valor in enumerate(parcial):
+                total[indice] += valor
+            partidas += parcial[0]
+            if contar_pendentes:
+                self.pendentes[bot] -= parcial[0]
+                if not self.pendentes[bot]:
+                    self._publicar(bot)
+        self.partidas += partidas // 2  # Cada partida aparece nos totais dos dois bots
+        agora = time.perf_counter()
+        if self.intervalo and agora - self.ultimo_progresso >= self.intervalo:
+            self.ultimo_progresso = agora
+            print(f"[{agora - self.inicio:7.1f}s] {self.partidas} partidas "
+                  f"({self.vazao():,.0f}/s, {self.vazao() / self.processos:,.0f}/s por processo)", file=sys.stderr)
+
+    def _publicar(self, bot):
+        if self.ao_terminar:
+            self.ao_terminar(self.resultado(bot))
+
+    def resultado(self, bot):
+        partidas, vitorias, derrotas, empates, rodadas = self.totais[bot]
+        return {"bot": bot, "estrategia": self.estrategias[bot], "partidas": partidas, "vitorias": vitorias,
+                "derrotas": derrotas, "empates": empates, "rodadas_vencidas": rodadas, "pontos": self.pontos(bot)}
+
+    def vazao(self):
+        """Partidas por segundo desde o início."""
+        return self.partidas / max(time.perf_counter() - self.inicio, 1e-9)
+
+
+# --- Linha de comando ---
+def distribuir_estrategias(especificacao, bots):
+    """'aleatoria,contra:3' -> estratégia de cada bot, em proporção aos pesos (padrão 1)."""
+    pesos = []
+    for item in especificacao.split(','):
+        nome, peso = item.strip(), 1
+        prefixo, _, sufixo = nome.rpartition(':')
+        if prefixo and sufixo.isdigit():
+            nome, peso = prefixo, int(sufixo)
+        carregar_estrategia(nome)  # Falha já aqui, e não dentro do pool, se o nome for inválido
+        pesos.append((nome, peso))
+    roda = [nome for nome, peso in pesos for _ in range(peso)]
+    return [roda[bot % len(roda)] for bot in range(bots)]
+
+
+def ler_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Simulador offline de torneios de Pedra, Papel e Tesoura entre bots.")
+    parser.add_argument('--formato', choices=FORMATOS, default='todos',
+                        help="todos contra todos ou sistema suíço")
+    parser.add_argument('--bots', type=int, default=200)
+    parser.add_argument('--estrategias', default=','.join(ESTRATEGIAS),
+                        help="estratégias distribuídas entre os bots, com peso opcional "
+                             "(ex.: 'aleatoria:3,contra,meu_modulo:minha_funcao')")
+    parser.add_argument('--rodadas-suico', type=int, default=None,
+                        help="rodadas do sistema suíço (padrão: log2 do número de bots, arredondado para cima)")
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--lote', type=int, default=LOTE_PADRAO, help="partidas por tarefa enviada a um processo")
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--saida', default=None,
+                        help="grava o resultado de cada bot (JSON por linha) assim que ele termina; '-' para a saída padrão")
+    parser.add_argument('--top', type=int, default=10, help="bots mostrados na classificação final")
+    parser.add_argument('--intervalo', type=float, default=2.0, help="segundos entre linhas de progresso (0 desliga)")
+    args = parser.parse_args(argv)
+    if args.bots < 2:
+        parser.error("--bots deve ser pelo menos 2")
+    if args.rodadas_suico is None:
+        args.rodadas_suico = max(1, (args.bots - 1).bit_length())
+    return args
+
+
+def main(argv=None):
+    args = ler_argumentos(argv)
+    estrategias = distribuir_estrategias(args.estrategias, args.bots)
+    saida = None
+    if args.saida == '-':
+        saida = sys.stdout
+    elif args.saida:
+        saida = open(args.saida, 'w', encoding='utf-8')
+
+    def publicar(resultado):
+        saida.write(json.dumps(resultado) + '\n')
+        saida.flush()
+
+    torneio = Torneio(estrategias, args.processos, args.lote, args.semente,
+                      publicar if saida else None, args.intervalo)
+    partidas = args.bots * (args.bots - 1) // 2 if args.formato == 'todos' else args.rodadas_suico * (args.bots // 2)
+    print(f"[*] Torneio '{args.formato}' com {args.bots} bots ({partidas:,} partidas) em "
+          f"{args.processos} processos, lotes de {args.lote}.", file=sys.stderr)
+    try:
+        torneio.executar(args.formato, args.rodadas_suico)
+    finally:
+        if saida and saida is not sys.stdout:
+            saida.close()
+
+    decorrido = time.perf_counter() - torneio.inicio
+    print("=" * 60, file=sys.stderr)
+    print(f"Partidas: {torneio.partidas:,} em {decorrido:.2f} s   "
+          f"({torneio.vazao():,.0f}/s, {torneio.vazao() / args.processos:,.0f}/s por processo)", file=sys.stderr)
+    classificacao = sorted(range(args.bots), key=lambda bot: (-torneio.pontos(bot), bot))
+    for posicao, bot in enumerate(classificacao[:args.top], 1):
+        r = torneio.resultado(bot)
+        print(f"  {posicao:>4}. bot {bot:<6} {r['estrategia']:<12} pontos={r['pontos']:<6} "
+              f"V={r['vitorias']} D={r['derrotas']} E={r['empates']}", file=sys.stderr)
+    por_estrategia = {}
+    for bot in range(args.bots):
+        por_estrategia.setdefault(estrategias[bot], []).append(torneio.pontos(bot))
+    print("Média de pontos por estratégia:", file=sys.stderr)
+    for nome, pontos in sorted(por_estrategia.items(), key=lambda item: -sum(item[1]) / len(item[1])):
+        print(f"  {nome:<16} {sum(pontos) / len(pontos):8.1f}  ({len(pontos)} bots)", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()